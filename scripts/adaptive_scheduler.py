@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Adaptive Scheduler - Sliding-window asyncio request scheduler for network TTS
+Keeps up to `limit` requests in flight at all times (no batch barriers) and adapts
+the limit AIMD-style: +1 per window of fast successes, halved on errors or latency
+spikes (isolated errors below a 5% error rate are tolerated). Failed requests are
+retried with jittered exponential backoff, and requests running past the observed p95
+latency get one hedged duplicate when the window has room; the first to finish wins.
+"""
+import time
+import random
+import asyncio
+import contextlib
+from collections import deque
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+LATENCY_WINDOW = 200     # recent latencies used for p50/p95
+MIN_SAMPLES = 20         # no hedging or latency signal until this many successes
+SLOW_FACTOR = 2.0        # recent median latency above 2x the baseline median counts as congestion
+HEDGE_BUDGET = 0.1       # at most ~10% extra requests from hedging
+ERROR_TOLERANCE = 0.05   # recent error rate below which an error doesn't shrink the window
+
+
+def backoff_delay(attempt):
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+class AdaptiveScheduler:
+    """Run async jobs under an AIMD concurrency window with retries and hedging.
+    Create inside the running event loop; jobs are zero-argument coroutine functions
+    that are safe to run twice at once (hedged duplicates).
+    """
+
+    def __init__(self, initial=10, min_limit=1, max_limit=40, max_attempts=MAX_ATTEMPTS, hedge=True):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, initial)
+        self.max_attempts = max_attempts
+        self.hedge = hedge
+        self.inflight = 0
+        self.cond = asyncio.Condition()
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+        self.latencies = []
+        self.baseline = None
+        self.outcomes = deque(maxlen=LATENCY_WINDOW)
+        self.since_decrease = 0
+        self.decrease_guard = 0
+        self.submitted = 0
+        self.retries = 0
+        self.errors = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.limit_range = [self.limit, self.limit]
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        async with self.cond:
+            await self.cond.wait_for(lambda: self.inflight < int(self.limit))
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def try_acquire(self):
+        """Take a window slot if one is free right now (hedged duplicates never wait for one)"""
+        if self.inflight >= int(self.limit):
+            return False
+        self.inflight += 1
+        return True
+
+    async def release(self):
+        async with self.cond:
+            self.inflight -= 1
+            self.cond.notify_all()
+
+    def set_limit(self, limit):
+        self.limit = min(self.max_limit, max(self.min_limit, limit))
+        self.limit_range = [min(self.limit_range[0], self.limit), max(self.limit_range[1], self.limit)]
+
+    def decrease(self):
+        # At most one multiplicative decrease per round trip: requests already in flight when
+        # the window shrank (hedged duplicates included) were sent under the old window and
+        # can't trigger another halving
+        if self.since_decrease >= self.decrease_guard:
+            self.since_decrease = 0
+            self.decrease_guard = self.inflight
+            self.set_limit(self.limit / 2)
+
+    def p50(self):
+        return percentile(sorted(self.recent), 50) if self.recent else None
+
+    def hedge_delay(self):
+        """Seconds after which a request is a straggler worth duplicating, or None"""
+        if not self.hedge or len(self.recent) < MIN_SAMPLES:
+            return None
+        if self.hedges >= HEDGE_BUDGET * self.submitted:
+            return None
+        return percentile(sorted(self.recent), 95)
+
+    def on_success(self, latency):
+        self.since_decrease += 1
+        self.outcomes.append(True)
+        self.recent.append(latency)
+        self.latencies.append(latency)
+        if len(self.latencies) % MIN_SAMPLES == 0:
+            self.baseline = min(self.baseline or float('inf'), self.p50())
+        # Congestion shows as the median of the last window rising, not single stragglers
+        # (those are what hedging is for)
+        last = sorted(list(self.recent)[-max(int(self.limit), 5):])
+        if self.baseline and percentile(last, 50) > SLOW_FACTOR * self.baseline:
+            self.decrease()
+        else:
+            self.set_limit(self.limit + 1 / self.limit)
+
+    def on_error(self):
+        self.since_decrease += 1
+        self.outcomes.append(False)
+        self.errors += 1
+        if self.outcomes.count(False) > ERROR_TOLERANCE * len(self.outcomes):
+            self.decrease()
+
+    async def hedged(self, job, discard=None):
+        """Run job; if it outlives the p95 latency, race it against one duplicate.
+        The duplicate takes its own window slot and is skipped when the window is full.
+        The losing duplicate is cancelled, or passed to discard() if it also finished.
+        """
+        primary = asyncio.ensure_future(job())
+        delay = self.hedge_delay()
+        if delay is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        if not self.try_acquire():
+            return await primary
+
+        self.hedges += 1
+        backup = asyncio.ensure_future(job())
+        pending = {primary, backup}
+        winner = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and winner is None:
+                        winner = task
+                    elif task.exception() is None and discard:
+                        discard(task.result())
+                if winner is not None:
+                    if winner is backup:
+                        self.hedge_wins += 1
+                    return winner.result()
+            raise backup.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if discard and not isinstance(result, BaseException):
+                    discard(result)
+            await self.release()
+
+    async def submit(self, job, discard=None):
+        """Run job under the window with retries; returns its result or raises its last error.
+        discard(result) cleans up the result of a hedged duplicate that lost the race.
+        """
+        self.submitted += 1
+        for attempt in range(self.max_attempts):
+            async with self.slot():
+                t0 = time.monotonic()
+                try:
+                    result = await self.hedged(job, discard)
+                except Exception as e:
+                    self.on_error()
+                    error = e
+                else:
+                    self.on_success(time.monotonic() - t0)
+                    return result
+            if attempt < self.max_attempts - 1:
+                self.retries += 1
+                await asyncio.sleep(backoff_delay(attempt))
+        raise error
+
+    def report(self, label):
+        values = sorted(self.latencies)
+        if not values:
+            return
+        p = {pct: percentile(values, pct) for pct in (50, 90, 95, 99)}
+        print(f"  {label} latency: p50 {p[50]:.2f}s, p90 {p[90]:.2f}s, p95 {p[95]:.2f}s, "
+              f"p99 {p[99]:.2f}s, max {values[-1]:.2f}s over {len(values)} requests")
+        print(f"  {label} window: {self.limit_range[0]:.0f}-{self.limit_range[1]:.0f} in flight "
+              f"(final {self.limit:.0f}), {self.errors} errors, {self.retries} retries, "
+              f"{self.hedges} hedged ({self.hedge_wins} won by the duplicate)")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Batch Runner - Process directories, globs and URL lists with overlapped stages
+Usage: batch_runner.py <mode> <target_lang[,...]> <input> [input...] [options]
+  mode:  translate   transcribe + translate (subtitles only)
+         summary     transcribe + summarize
+         dub         transcribe + translate + TTS + mux (no review step)
+  input: a directory (its media files), a glob ('videos/*.mp4'), a media file or URL,
+         or a text file listing media files / URLs (one per line, # comments)
+
+Every item runs as a chain of stages, and each stage kind has its own worker pool:
+  download   url_helper.download_from_url (audio only for summaries)  --downloads N (default 2)
+  api        video_dubber.py / video_summary.py     --api N (default 2)
+  cpu        generate_tts_and_dub.sh (TTS, stretch, mux)  --cpu N (default 1)
+so the network downloads the next items while earlier ones are synthesized. The
+--rpm/--tpm API limits are split between the api workers.
+
+Items go to <out>/<name>/<mode>-<target_lang>/ (--out, default ./batch_out), with one log
+per stage. Progress is saved to <out>/batch_state.json after every stage, per item, mode and
+target language, so an interrupted batch resumes where it stopped; failed items are retried
+on the next run from the stage that failed.
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from cli_helper import pop_option
+from url_helper import is_url, download_from_url
+from groq_client import DEFAULT_RPM, DEFAULT_TPM
+import tracing
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ('translate', 'summary', 'dub')
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv',
+                    '.mp3', '.m4a', '.wav', '.flac', '.ogg', '.aac')
+STATE_FILE = 'batch_state.json'
+
+
+# ============================================================
+# Inputs
+# ============================================================
+
+def expand_inputs(inputs):
+    """Media files and URLs from directories, globs, files and URL lists, in order, without duplicates"""
+    sources = []
+    for item in inputs:
+        if is_url(item):
+            sources.append(item)
+        elif os.path.isdir(item):
+            sources += sorted(os.path.join(item, name) for name in os.listdir(item)
+                              if name.lower().endswith(MEDIA_EXTENSIONS))
+        elif os.path.isfile(item) and not item.lower().endswith(MEDIA_EXTENSIONS):
+            base = os.path.dirname(os.path.abspath(item))
+            with open(item, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if line and not line.startswith('#'):
+                        sources.append(line if is_url(line) else os.path.join(base, line))
+        elif os.path.isfile(item):
+            sources.append(item)
+        else:
+            sources += sorted(path for path in glob.glob(item) if path.lower().endswith(MEDIA_EXTENSIONS))
+    seen = set()
+    unique = []
+    for source in sources:
+        source = source if is_url(source) else os.path.abspath(source)
+        if source not in seen:
+            seen.add(source)
+            unique.append(source)
+    return unique
+
+
+def job_key(source, mode, target_lang):
+    """State key: the same source in another mode or language is a separate job"""
+    return f"{mode}:{target_lang}:{source}"
+
+
+def item_name(source):
+    """Stable directory name for an item"""
+    digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+    if is_url(source):
+        return f"url-{digest}"
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f"{''.join(c if c.isalnum() or c in '-_.' else '_' for c in stem)[:60]}-{digest}"
+
+
+# ============================================================
+# Durable progress
+# ============================================================
+
+class BatchState:
+    """{job_key: {'source', 'name', 'mode', 'target_lang', 'done': [stage, ...], 'media', 'error'}}
+    saved atomically after every change"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.items = json.load(f)['items']
+        except (FileNotFoundError, ValueError, KeyError):
+            self.items = {}
+
+    def register(self, sources, mode, target_lang):
+        """Entries for this run's jobs; returns their keys in source order"""
+        keys = []
+        with self.lock:
+            for source in sources:
+                key = job_key(source, mode, target_lang)
+                self.items.setdefault(key, {'source': source, 'name': item_name(source), 'mode': mode,
+                                            'target_lang': target_lang, 'done': [], 'media': None,
+                                            'error': None})
+                keys.append(key)
+            self.save()
+        return keys
+
+    def update(self, key, **fields):
+        with self.lock:
+            self.items[key].update(fields)
+            self.save()
+
+    def finish_stage(self, key, stage, **fields):
+        with self.lock:
+            entry = self.items[key]
+            if stage not in entry['done']:
+                entry['done'].append(stage)
+            entry.update(fields, error=None)
+            self.save()
+
+    def save(self):
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'updated': time.strftime('%Y-%m-%dT%H:%M:%S'), 'items': self.items}, f,
+                      ensure_ascii=False, indent=1)
+        os.replace(self.path + '.tmp', self.path)
+
+
+# ============================================================
+# Stages
+# ============================================================
+
+def run_script(cmd, item_dir, stage, env=None):
+    """Run one entry point for an item, logging to <item_dir>/<stage>.log"""
+    log_path = os.path.join(item_dir, f"{stage}.log")
+    with open(log_path, 'w', encoding='utf-8') as log:
+        returncode = subprocess.run(cmd, cwd=item_dir, stdout=log, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL, env=env).returncode
+    if returncode != 0:
+        with open(log_path, encoding='utf-8', errors='replace') as log:
+            tail = log.read().strip().splitlines()[-3:]
+        raise RuntimeError(f"{os.path.basename(cmd[1])} exited with {returncode}: {' | '.join(tail)}")
+
+
+def stage_download(job):
+    try:
+        mode = 'audio' if job['config']['mode'] == 'summary' else 'video'
+        path, _ = download_from_url(job['source'], output_dir=job['dir'], mode=mode)
+    except SystemExit:
+        raise RuntimeError("download failed (see output above)")
+    return {'media': os.path.abspath(path)}
+
+
+def stage_api(job):
+    cfg = job['config']
+    common = ['--rpm', str(cfg['rpm']), '--tpm', str(cfg['tpm'])]
+    if cfg['mode'] == 'summary':
+        cmd = [sys.executable, os.path.join(SCRIPT_DIR, 'video_summary.py'), job['media'],
+               cfg['target_lang']] + common
+    else:
+        cmd = [sys.executable, os.path.join(SCRIPT_DIR, 'video_dubber.py'), job['media'],
+               cfg['target_lang']] + common
+    run_script(cmd, job['dir'], 'api')
+    return {}
+
+
+def stage_cpu(job):
+    base_name = os.path.splitext(os.path.basename(job['media']))[0]
+    with open(os.path.join(job['dir'], f"{base_name}_status.json"), encoding='utf-8') as f:
+        status = json.load(f)
+    cmd = ['bash', os.path.join(SCRIPT_DIR, 'generate_tts_and_dub.sh'), job['media'],
+           status['original_srt'], status['translated_srt'], status['target_lang'], 'none']
+    # The dub's persistent work dirs are named after the file stem; keep them per item so
+    # items with the same stem neither share nor patch each other's state
+    env = dict(os.environ, DUB_WORK_DIR=os.path.join(job['dir'], 'dub'))
+    if status.get('translation_memory'):
+        # Learn review edits into the memory the translation stage used
+        env['TRANSLATION_MEMORY_DB'] = status['translation_memory']
+    run_script(cmd, job['dir'], 'cpu', env=env)
+    return {}
+
+
+STAGES = {'download': stage_download, 'api': stage_api, 'cpu': stage_cpu}
+
+
+def stages_for(source, mode):
+    return (['download'] if is_url(source) else []) + ['api'] + (['cpu'] if mode == 'dub' else [])
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+def run_batch(sources, config, out_dir, limits):
+    """Run every source through its stages; each stage kind has its own pool of limits[kind] workers"""
+    os.makedirs(out_dir, exist_ok=True)
+    state = BatchState(os.path.join(out_dir, STATE_FILE))
+    pools = {kind: ThreadPoolExecutor(max_workers=limits[kind], thread_name_prefix=kind) for kind in STAGES}
+    finished = threading.Event()
+    lock = threading.Lock()
+    counts = {'done': 0, 'failed': 0, 'skipped': 0}
+    remaining = [len(sources)]
+    settled_keys = set()
+    t0 = time.time()
+
+    def report(key, message):
+        with lock:
+            settled = counts['done'] + counts['failed'] + counts['skipped']
+            print(f"  [{settled}/{len(sources)}] {state.items[key]['name']}: {message}", flush=True)
+
+    def settle(key, outcome):
+        with lock:
+            if key in settled_keys:
+                return
+            settled_keys.add(key)
+            counts[outcome] += 1
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                finished.set()
+
+    def item_dir(key):
+        entry = state.items[key]
+        run = f"{entry['mode']}-{entry['target_lang'].replace(',', '+')}"
+        return os.path.join(out_dir, entry['name'], run)
+
+    def advance(key):
+        """Submit the item's next unfinished stage, or settle it"""
+        entry = state.items[key]
+        todo = [stage for stage in stages_for(entry['source'], config['mode']) if stage not in entry['done']]
+        if not todo:
+            settle(key, 'done')
+            report(key, f"done ({time.time() - t0:.0f}s)")
+            return
+        pools[todo[0]].submit(run_stage, key, todo[0])
+
+    def fail(key, stage, e):
+        settle(key, 'failed')
+        try:
+            state.update(key, error=f"{stage}: {e}")
+        except Exception as save_error:
+            print(f"  Could not save batch state: {save_error}", flush=True)
+        report(key, f"FAILED in {stage}: {e}")
+
+    def run_stage(key, stage):
+        # Any error, in the stage or in saving progress, settles the item: the pool would
+        # otherwise swallow it and the batch would wait forever
+        try:
+            entry = state.items[key]
+            source = entry['source']
+            job = {'source': source, 'dir': item_dir(key),
+                   'media': entry['media'] or (None if is_url(source) else source), 'config': config}
+            started = time.time()
+            with tracing.span(stage, 'batch', item=entry['name']):
+                fields = STAGES[stage](job)
+            state.finish_stage(key, stage, **fields)
+            report(key, f"{stage} finished in {time.time() - started:.0f}s")
+            advance(key)
+        except Exception as e:
+            fail(key, stage, e)
+
+    keys = state.register(sources, config['mode'], config['target_lang'])
+    for key in keys:
+        os.makedirs(item_dir(key), exist_ok=True)
+    resumed = sum(bool(state.items[key]['done']) for key in keys)
+    if resumed:
+        print(f"Resuming: {resumed} item(s) already partly or fully processed")
+
+    for key in keys:
+        entry = state.items[key]
+        if all(stage in entry['done'] for stage in stages_for(entry['source'], config['mode'])):
+            settle(key, 'skipped')
+        else:
+            advance(key)
+    if sources:
+        finished.wait()
+    for pool in pools.values():
+        pool.shutdown()
+    return counts
+
+
+def main():
+    args = sys.argv[1:]
+    tracing.setup(args)
+    out_dir = pop_option(args, '--out', 'batch_out')
+    limits = {'download': pop_option(args, '--downloads', '2'),
+              'api': pop_option(args, '--api', '2'),
+              'cpu': pop_option(args, '--cpu', '1')}
+    rpm = pop_option(args, '--rpm', str(DEFAULT_RPM))
+    tpm = pop_option(args, '--tpm', str(DEFAULT_TPM))
+    numeric = list(limits.values()) + [rpm, tpm]
+
+    if len(args) < 3 or args[0] not in MODES or not all(v.isdigit() and int(v) > 0 for v in numeric):
+        print("Usage: batch_runner.py <mode> <target_lang[,...]> <input> [input...] [options]")
+        print(f"  mode: {', '.join(MODES)} (dub skips the review step; summary takes one language)")
+        print("  input: directory, glob, media file, URL, or a text file of media files / URLs")
+        print("  --out DIR: output root, one sub-directory per item (default ./batch_out)")
+        print("  --downloads N / --api N / --cpu N: workers per resource (default 2 / 2 / 1)")
+        print(f"  --rpm N / --tpm N: API limits shared by the api workers (default {DEFAULT_RPM} / {DEFAULT_TPM})")
+        print("  --trace FILE: record a span per stage, export a Chrome trace and print a summary")
+        sys.exit(1)
+    if not os.getenv('GROQ_API_KEY'):
+        print("❌ Error: GROQ_API_KEY not set")
+        sys.exit(1)
+
+    mode, target_lang = args[0], args[1]
+    if mode == 'summary' and ',' in target_lang:
+        print("❌ Error: summary mode takes a single target language")
+        sys.exit(1)
+    limits = {kind: int(n) for kind, n in limits.items()}
+    sources = expand_inputs(args[2:])
+    if not sources:
+        print("No media files or URLs found")
+        sys.exit(1)
+    # Each api worker runs its own rate limiter, so each gets its share of the account limits
+    config = {'mode': mode, 'target_lang': target_lang,
+              'rpm': max(int(rpm) // limits['api'], 1), 'tpm': max(int(tpm) // limits['api'], 1)}
+
+    print(f"Batch: {len(sources)} item(s), mode {mode} ({target_lang}) -> {os.path.abspath(out_dir)}")
+    print(f"Workers: {limits['download']} download, {limits['api']} api, {limits['cpu']} cpu\n")
+    t0 = time.time()
+    counts = run_batch(sources, config, os.path.abspath(out_dir), limits)
+    print(f"\n=== Batch Complete ({time.time() - t0:.0f}s) ===")
+    print(f"  Done: {counts['done']}, already done: {counts['skipped']}, failed: {counts['failed']}")
+    if counts['failed']:
+        print(f"  Failed items are listed in {os.path.join(out_dir, STATE_FILE)}; re-run to retry them")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
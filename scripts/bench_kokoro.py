@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark sharded Kokoro synthesis: segments per second as the worker count grows.
+Usage: bench_kokoro.py [num_segments] [max_workers] [batch_chars] [voice]
+
+Runs tts_engines.generate_kokoro_tts on the same synthetic subtitle lines with
+1, 2, 4, ... max_workers worker processes (each limited to cpu_count / workers
+threads). Workers are warmed up first, so model load time is excluded.
+Requires the kokoro conda env (~/miniconda3/envs/kokoro).
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from tts_engines import generate_kokoro_tts
+
+WORDS = ("the quick brown fox jumps over a lazy dog while we talk about video "
+         "dubbing speech synthesis and subtitles for a long lecture today").split()
+
+
+def make_segments(n, rng):
+    """Subtitle-like lines: mostly short, some long (2-30 words)"""
+    segments = []
+    for i in range(n):
+        words = int(min(30, max(2, rng.lognormal(2.0, 0.6))))
+        text = ' '.join(rng.choice(WORDS, words)).capitalize() + '.'
+        segments.append({'index': i, 'text': text})
+    return segments
+
+
+def run(segments, voice, workers, batch_chars):
+    work_dir = tempfile.mkdtemp(prefix=f'bench_kokoro_{workers}_')
+    try:
+        t0 = time.time()
+        generate_kokoro_tts(segments, work_dir, voice, workers, batch_chars)
+        return time.time() - t0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+    batch_chars = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    voice = sys.argv[4] if len(sys.argv) > 4 else 'am_michael'
+
+    segments = make_segments(n, np.random.default_rng(0))
+    counts = []
+    w = 1
+    while w <= max_workers:
+        counts.append(w)
+        w *= 2
+
+    results = []
+    for workers in counts:
+        print(f"\n=== {workers} worker(s), batch_chars={batch_chars} ===")
+        run(segments[:max(workers, 2)], voice, workers, batch_chars)  # warm up every shard
+        elapsed = run(segments, voice, workers, batch_chars)
+        results.append((workers, elapsed))
+
+    print(f"\n{'workers':>7} {'threads':>7} {'time':>8} {'seg/s':>7} {'speedup':>8}")
+    for workers, elapsed in results:
+        threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else os.cpu_count()
+        print(f"{workers:>7} {threads:>7} {elapsed:>7.1f}s {n / elapsed:>7.1f} {results[0][1] / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Reproducible offline benchmark of the dubbing pipeline, with baseline comparison.
+Usage: bench_pipeline.py [--sizes 10,100,1000,5000] [--jobs N] [--repeat 1] [--tts-latency S]
+                         [--output results.json] [--baseline FILE] [--save-baseline FILE]
+                         [--tolerance 0.25]
+
+For each size a seeded synthetic SRT is written (log-normal cue lengths, mostly short
+gaps with occasional pauses, text length following speaking rate), then each stage
+runs in a fresh child process so wall time, CPU time (including worker processes) and
+peak RSS are measured per stage:
+  parse          segments.read_srt
+  tts            the deterministic "synthetic" engine through the shared scheduler
+  speed_adjust   sync_tts.speed_adjust_all (numpy WSOLA, --jobs workers)
+  timeline       sync_tts.build_numpy_timeline
+  mux            finalize_mux (single-pass trim/gain + ffmpeg mux); without ffmpeg only
+                 the finalize pass is timed, with the PCM going to /dev/null
+
+Results are written as JSON. With --baseline, stages slower (or larger) than the
+baseline by more than --tolerance are flagged and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+
+from cli_helper import pop_option
+
+STAGES = ('parse', 'tts', 'speed_adjust', 'timeline', 'mux')
+DEFAULT_SIZES = '10,100,1000,5000'
+MIN_WALL_DELTA = 0.05   # seconds; smaller differences are noise
+MIN_RSS_DELTA = 20.0    # MB
+
+
+# ============================================================
+# Synthetic input
+# ============================================================
+
+WORDS = ('the', 'video', 'shows', 'how', 'we', 'built', 'this', 'and', 'why', 'it', 'works',
+         'today', 'model', 'audio', 'first', 'second', 'simple', 'really', 'because', 'people')
+
+
+def make_srt(n, path, seed=0):
+    """Write an n-cue SRT with realistic timing; returns its duration in seconds"""
+    from segments import Segments
+
+    rng = np.random.default_rng(seed)
+    durations = np.clip(rng.lognormal(np.log(2.6), 0.45, n), 0.4, 10.0)
+    kind = rng.random(n)
+    gaps = np.where(kind < 0.7, rng.exponential(0.25, n),
+                    np.where(kind < 0.95, rng.uniform(0.5, 2.0, n), rng.uniform(3.0, 10.0, n)))
+    starts = np.concatenate([[0.5], 0.5 + np.cumsum(durations + gaps)[:-1]])
+    texts = []
+    for d in durations:
+        chars = int(d * rng.uniform(12, 17))  # speaking rate
+        words = []
+        while sum(len(w) + 1 for w in words) < chars:
+            words.append(WORDS[rng.integers(len(WORDS))])
+        texts.append(' '.join(words).capitalize() + '.')
+    segments = Segments(starts, starts + durations, texts)
+    segments.write_srt(path)
+    return segments.total_duration()
+
+
+# ============================================================
+# Stages (run in a child process)
+# ============================================================
+
+def reset(stage, work_dir):
+    """Remove a stage's outputs so a repeat measures real work, not resume"""
+    patterns = {'tts': ['raw_*'], 'speed_adjust': ['adj_*'], 'timeline': ['combined.wav', 'timeline.f32'],
+                'mux': ['dubbed.mp4']}.get(stage, [])
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(work_dir, pattern)):
+            os.remove(path)
+
+
+def run_stage(stage, work_dir, jobs, tts_latency):
+    """Run one stage on work_dir; returns a mode note (or None)"""
+    from segments import read_srt
+
+    srt_path = os.path.join(work_dir, 'input.srt')
+    if stage == 'parse':
+        read_srt(srt_path)
+        return None
+    segments = read_srt(srt_path)
+    if stage == 'tts':
+        from tts_engines import create_engine
+        from sync_tts import generate_tts_cached
+        engine = create_engine('synthetic', latency=tts_latency, warmup=0.0)
+        generate_tts_cached(segments, work_dir, engine)
+    elif stage == 'speed_adjust':
+        from sync_tts import speed_adjust_all
+        speed_adjust_all(segments, work_dir, 'numpy', jobs)
+    elif stage == 'timeline':
+        from sync_tts import build_numpy_timeline
+        build_numpy_timeline(segments, work_dir, os.path.join(work_dir, 'combined.wav'))
+    elif stage == 'mux':
+        combined = os.path.join(work_dir, 'combined.wav')
+        if shutil.which('ffmpeg'):
+            from finalize_mux import finalize_and_mux
+            # The timeline stands in for the video (no video stream, same duration)
+            finalize_and_mux(combined, combined, srt_path, 'english', os.path.join(work_dir, 'dubbed.mp4'),
+                             original_srt=srt_path)
+            return None
+        from finalize_mux import audio_blocks, DEFAULT_GAIN
+        from media_probe import duration
+        with open(os.devnull, 'wb') as sink:
+            for block in audio_blocks(combined, duration(combined), DEFAULT_GAIN):
+                sink.write(block.astype('<f4').tobytes())
+        return 'ffmpeg missing: finalize pass only'
+    return None
+
+
+def rss_mb(kb):
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return kb / (1024 * 1024) if sys.platform == 'darwin' else kb / 1024
+
+
+def child_main(args):
+    stage = pop_option(args, '--stage')
+    work_dir = pop_option(args, '--work')
+    jobs = int(pop_option(args, '--jobs', '1'))
+    tts_latency = float(pop_option(args, '--tts-latency', '0'))
+    result_path = pop_option(args, '--result')
+
+    start_rss = rss_mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    cpu0 = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    t0 = time.perf_counter()
+    mode = run_stage(stage, work_dir, jobs, tts_latency)
+    wall = time.perf_counter() - t0
+    self_usage, child_usage = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = sum(u.ru_utime + u.ru_stime for u in (self_usage, child_usage)) \
+        - sum(u.ru_utime + u.ru_stime for u in cpu0)
+    result = {'wall': wall, 'cpu': cpu, 'peak_rss_mb': rss_mb(max(self_usage.ru_maxrss, child_usage.ru_maxrss)),
+              'start_rss_mb': start_rss, 'mode': mode}
+    with open(result_path, 'w') as f:
+        json.dump(result, f)
+
+
+# ============================================================
+# Driver
+# ============================================================
+
+def measure(stage, work_dir, jobs, tts_latency, repeat, verbose):
+    """Best-of-`repeat` wall time for a stage (CPU and RSS from that run)"""
+    best = None
+    for _ in range(repeat):
+        reset(stage, work_dir)
+        result_path = os.path.join(work_dir, f'{stage}.result.json')
+        cmd = [sys.executable, os.path.abspath(__file__), '--stage', stage, '--work', work_dir,
+               '--jobs', str(jobs), '--tts-latency', str(tts_latency), '--result', result_path]
+        proc = subprocess.run(cmd, stdout=None if verbose else subprocess.DEVNULL,
+                              stderr=None if verbose else subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"stage {stage} failed: {(proc.stderr or '').strip()[-1500:]}")
+        with open(result_path) as f:
+            result = json.load(f)
+        if best is None or result['wall'] < best['wall']:
+            best = result
+    return best
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except FileNotFoundError:
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'cpu_count': os.cpu_count(), 'ffmpeg': bool(shutil.which('ffmpeg')), 'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(results, baseline, tolerance):
+    """Print per-stage ratios against the baseline; returns the list of regressions"""
+    base = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    print(f"\nAgainst baseline ({baseline['environment'].get('commit')}, {baseline['environment'].get('time')}):")
+    for r in results:
+        b = base.get((r['size'], r['stage']))
+        if b is None:
+            continue
+        flags = []
+        if r['wall'] > b['wall'] * (1 + tolerance) and r['wall'] - b['wall'] > MIN_WALL_DELTA:
+            flags.append('wall')
+        if r['peak_rss_mb'] > b['peak_rss_mb'] * (1 + tolerance) and r['peak_rss_mb'] - b['peak_rss_mb'] > MIN_RSS_DELTA:
+            flags.append('rss')
+        ratio = r['wall'] / b['wall'] if b['wall'] else float('inf')
+        print(f"  {r['size']:>6} {r['stage']:<13} {b['wall']:>8.3f}s -> {r['wall']:>8.3f}s ({ratio:>5.2f}x)  "
+              f"{b['peak_rss_mb']:>6.0f} -> {r['peak_rss_mb']:>6.0f} MB"
+              + (f"  REGRESSION ({', '.join(flags)})" if flags else ''))
+        if flags:
+            regressions.append((r['size'], r['stage'], flags))
+    return regressions
+
+
+def main():
+    args = sys.argv[1:]
+    if '--stage' in args:
+        child_main(args)
+        return
+    sizes = pop_option(args, '--sizes', DEFAULT_SIZES)
+    jobs = int(pop_option(args, '--jobs', str(os.cpu_count() or 1)))
+    repeat = max(int(pop_option(args, '--repeat', '1')), 1)
+    tts_latency = float(pop_option(args, '--tts-latency', '0'))
+    output = pop_option(args, '--output', 'bench_pipeline_results.json')
+    baseline_path = pop_option(args, '--baseline')
+    save_baseline = pop_option(args, '--save-baseline')
+    tolerance = float(pop_option(args, '--tolerance', '0.25'))
+    verbose = '--verbose' in args
+    sizes = [int(s) for s in sizes.split(',') if s]
+
+    env = environment()
+    print(f"Pipeline benchmark: sizes {sizes}, {jobs} jobs, repeat {repeat}, "
+          f"{env['cpu_count']} CPUs, ffmpeg {'yes' if env['ffmpeg'] else 'no'}")
+    print(f"  {'cues':>6} {'stage':<13} {'wall':>9} {'cpu':>9} {'peak RSS':>10}")
+    results = []
+    for n in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f'bench_pipeline_{n}_')
+        try:
+            audio_seconds = make_srt(n, os.path.join(work_dir, 'input.srt'))
+            for stage in STAGES:
+                r = measure(stage, work_dir, jobs, tts_latency, repeat, verbose)
+                r.update(size=n, stage=stage, audio_seconds=audio_seconds)
+                results.append(r)
+                print(f"  {n:>6} {stage:<13} {r['wall']:>8.3f}s {r['cpu']:>8.3f}s {r['peak_rss_mb']:>7.0f} MB"
+                      + (f"  ({r['mode']})" if r['mode'] else ''))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {'environment': env, 'settings': {'jobs': jobs, 'repeat': repeat, 'tts_latency': tts_latency},
+              'results': results}
+    for path in filter(None, (output, save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"\nResults written to {path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {tolerance:.0%}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark SRT parsing, writing and segment queries on large synthetic files.
+Usage: bench_segments.py [num_cues]
+
+Writes a num_cues SRT (default 100000) in LF and in CRLF-with-extra-blank-lines form,
+then times segments.read_srt / parse_srt against the old split-on-blank-lines parser,
+Segments.write_srt, and the vectorized queries (gaps, overlaps, range lookups).
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+
+from segments import Segments, read_srt, parse_srt
+
+
+def make_segments(n, rng):
+    durations = rng.uniform(0.8, 6.0, n)
+    gaps = rng.uniform(-0.2, 0.8, n)  # a few overlaps, like real transcripts
+    starts = np.concatenate([[0.0], np.cumsum(durations + gaps)[:-1]])
+    words = ['the', 'video', 'shows', 'how', 'we', 'built', 'it', 'and', 'why', 'this', 'works']
+    texts = [' '.join(rng.choice(words, int(k))) for k in rng.integers(3, 14, n)]
+    return Segments(starts, starts + durations, texts)
+
+
+def legacy_parse(content):
+    """The split-on-blank-lines parser each script used to carry (for comparison)"""
+    segments = []
+    for i, block in enumerate(content.strip().split('\n\n')):
+        lines = block.split('\n')
+        if len(lines) >= 3:
+            m = re.match(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})', lines[1])
+            if m:
+                h1, m1, s1, ms1, h2, m2, s2, ms2 = map(int, m.groups())
+                start = h1*3600 + m1*60 + s1 + ms1/1000
+                end = h2*3600 + m2*60 + s2 + ms2/1000
+                segments.append({'index': i, 'text': '\n'.join(lines[2:]).strip(),
+                                 'start': start, 'end': end, 'duration': end - start})
+    return segments
+
+
+def timed(label, fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    print(f"  {label:<38} {best * 1000:>9.1f}ms")
+    return result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    segments = make_segments(n, np.random.default_rng(0))
+    work_dir = tempfile.mkdtemp(prefix='bench_srt_')
+    try:
+        lf_path = os.path.join(work_dir, 'lf.srt')
+        crlf_path = os.path.join(work_dir, 'crlf.srt')
+        print(f"{n} cues")
+        timed("write_srt", lambda: segments.write_srt(lf_path))
+        with open(lf_path, encoding='utf-8') as f:
+            content = f.read()
+        with open(crlf_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(content.replace('\n\n', '\n\n\n').replace('\n', '\r\n'))
+        print(f"  ({os.path.getsize(lf_path) / 1e6:.1f} MB)")
+
+        print("Parsing")
+        legacy = timed("legacy parser (LF)", lambda: legacy_parse(content))
+        parsed = timed("parse_srt (LF, in memory)", lambda: parse_srt(content))
+        timed("read_srt (LF, streamed)", lambda: read_srt(lf_path))
+        crlf = timed("read_srt (CRLF + extra blank lines)", lambda: read_srt(crlf_path))
+        with open(crlf_path, encoding='utf-8', newline='') as f:
+            crlf_content = f.read()
+        broken = timed("legacy parser (CRLF + extra blanks)", lambda: legacy_parse(crlf_content))
+
+        print("Queries")
+        timed("total duration", parsed.total_duration)
+        timed("gaps + overlaps", lambda: (parsed.gaps(), parsed.overlaps()))
+        mid = parsed.total_duration() / 2
+        timed("cues in a 60s range", lambda: parsed.in_range(mid, mid + 60))
+
+        ok = (len(parsed) == len(crlf) == n and parsed.texts == crlf.texts
+              and np.allclose(parsed.starts, segments.starts, atol=5e-4))
+        print(f"\nRound trip: {'ok' if ok else 'MISMATCH'} - {len(parsed)} cues parsed "
+              f"(legacy: {len(legacy)} LF, {len(broken)} CRLF), {len(parsed.overlaps())} overlaps")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
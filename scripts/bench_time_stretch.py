@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark the speed-adjustment engines on identical synthetic inputs.
+Usage: bench_time_stretch.py [num_segments] [format] [jobs]
+
+Generates speech-like raw_XXXX files (harmonic tones with syllable-rate envelope),
+then runs sync_tts.speed_adjust_all with each engine into separate work dirs
+and reports wall time, per-segment cost and output-duration error.
+  format: mp3 (edge-tts output, default) or wav (kokoro/voicebox output)
+  jobs: speed-adjustment worker processes (default 1)
+"""
+import sys
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
+
+from time_stretch import SAMPLE_RATE
+from sync_tts import speed_adjust_all, STRETCH_ENGINES
+
+
+def make_segments(n, rng):
+    """Random subtitle durations (1-6s) with raw TTS 0.6x-2.5x the subtitle length"""
+    segments = []
+    t = 0.0
+    for i in range(n):
+        duration = float(rng.uniform(1.0, 6.0))
+        segments.append({
+            'index': i,
+            'text': f'segment {i}',
+            'start': t,
+            'end': t + duration,
+            'duration': duration,
+            'raw_dur': duration * float(rng.uniform(0.6, 2.5)),
+        })
+        t += duration + float(rng.uniform(0.0, 0.5))
+    return segments
+
+
+def synth_speech(duration, rng):
+    """Speech-like test signal: voiced harmonics under a ~4Hz syllable envelope"""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = rng.uniform(90, 220) * (1 + 0.05 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = 0.5 * (1 - np.cos(2 * np.pi * 4 * t)) ** 2
+    noise = 0.02 * rng.standard_normal(len(t))
+    return (0.3 * voiced * envelope + noise).astype(np.float32)
+
+
+def write_inputs(segments, work_dir, fmt, rng):
+    for seg in segments:
+        audio = synth_speech(seg['raw_dur'], rng)
+        sf.write(os.path.join(work_dir, f"raw_{seg['index']:04d}.{fmt}"), audio, SAMPLE_RATE)
+
+
+def measure(segments, src_dir, engine, jobs):
+    work_dir = tempfile.mkdtemp(prefix=f'bench_{engine}_')
+    try:
+        for name in os.listdir(src_dir):
+            shutil.copy(os.path.join(src_dir, name), work_dir)
+
+        t0 = time.time()
+        speed_adjust_all(segments, work_dir, engine, jobs)
+        elapsed = time.time() - t0
+
+        errors = []
+        for seg in segments:
+            info = sf.info(os.path.join(work_dir, f"adj_{seg['index']:04d}.wav"))
+            expected = seg['raw_dur'] / min(max(seg['raw_dur'] / seg['duration'], 0.5), 4.0)
+            errors.append(abs(info.frames / info.samplerate - expected) * 1000)
+        return elapsed, float(np.mean(errors)), float(np.max(errors))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fmt = sys.argv[2] if len(sys.argv) > 2 else 'mp3'
+    jobs = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+    rng = np.random.default_rng(0)
+    segments = make_segments(n, rng)
+    src_dir = tempfile.mkdtemp(prefix='bench_raw_')
+    try:
+        print(f"Generating {n} synthetic {fmt} segments...")
+        write_inputs(segments, src_dir, fmt, rng)
+
+        results = {}
+        for engine in STRETCH_ENGINES:
+            if engine == 'ffmpeg' and not (shutil.which('ffmpeg') and shutil.which('ffprobe')):
+                print("\nffmpeg/ffprobe not found, skipping ffmpeg engine")
+                continue
+            print(f"\n=== {engine} ({jobs} jobs) ===")
+            results[engine] = measure(segments, src_dir, engine, jobs)
+
+        print(f"\n{'engine':<8} {'total':>8} {'per seg':>9} {'mean err':>9} {'max err':>9}")
+        for engine, (elapsed, mean_err, max_err) in results.items():
+            print(f"{engine:<8} {elapsed:>7.2f}s {elapsed / n * 1000:>7.1f}ms "
+                  f"{mean_err:>7.1f}ms {max_err:>7.1f}ms")
+        if len(results) == 2:
+            print(f"\nSpeedup: {results['ffmpeg'][0] / results['numpy'][0]:.1f}x")
+    finally:
+        shutil.rmtree(src_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
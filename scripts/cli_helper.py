@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+CLI Helper - Small argv utilities shared by the entry-point scripts
+Scripts take positional arguments; optional `--name value` flags may appear anywhere.
+"""
+
+def pop_option(args, name, default=None):
+    """Remove `--name value` (or `--name=value`) from args and return the value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + '='):
+            del args[i]
+            return arg.split('=', 1)[1]
+    return default
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Finalize and mux the dubbed audio in a single pass.
+Usage: finalize_mux.py <video_file> <combined_wav> <translated_srt> <target_lang> <output_file>
+                       [--original-srt FILE] [--gain 1.5] [--trace FILE]
+
+combined.wav (from sync_tts.py) is streamed in blocks: trimmed to the video duration,
+gained and clipped in NumPy, and piped as raw PCM straight into the one ffmpeg call
+that encodes AAC and muxes video, audio and subtitles. No intermediate audio file is written.
+Audio and subtitle tracks are tagged with their language's ISO 639-2 code.
+
+Multi-language output: pass comma-separated lists of the same length for combined_wav,
+translated_srt and target_lang. Each language becomes its own audio and subtitle track
+(tagged with its ISO 639-2 code, the first one default), the video stream is copied once,
+and every audio track is streamed through its own named pipe.
+
+Subtitle tracks are checked before muxing instead of retrying failed muxes: each SRT must
+decode and contain cues, and is rewritten in clean form (sorted, non-negative, UTF-8)
+for the container's subtitle codec. Tracks that fail the check are left out with a warning.
+--trace FILE (or $TRACE_FILE) records the subtitle checks and the mux as spans (see tracing.py).
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+import numpy as np
+import soundfile as sf
+
+import tracing
+from cli_helper import pop_option
+from segments import Segments, read_srt
+from media_probe import duration as probe_duration, first_stream
+
+DEFAULT_GAIN = 1.5
+BLOCK_SECONDS = 60
+
+# Subtitle codec each output container can hold
+SUBTITLE_CODECS = {'.mp4': 'mov_text', '.m4v': 'mov_text', '.mov': 'mov_text',
+                   '.mkv': 'srt', '.webm': 'webvtt'}
+
+# ISO 639-2 codes for the track language tag (containers reject free-form names)
+LANGUAGE_CODES = {
+    'english': 'eng', 'en': 'eng', 'chinese': 'chi', 'zh': 'chi', 'spanish': 'spa', 'es': 'spa',
+    'french': 'fre', 'fr': 'fre', 'japanese': 'jpn', 'ja': 'jpn', 'german': 'ger', 'de': 'ger',
+    'italian': 'ita', 'it': 'ita', 'portuguese': 'por', 'pt': 'por', 'korean': 'kor', 'ko': 'kor',
+    'russian': 'rus', 'ru': 'rus', 'arabic': 'ara', 'ar': 'ara', 'hindi': 'hin', 'hi': 'hin',
+    'turkish': 'tur', 'tr': 'tur',
+}
+
+
+def prepare_subtitle(srt_file, out_path):
+    """Check an SRT can be muxed and write a clean copy to out_path.
+    Returns: None if usable, otherwise the reason it was left out
+    """
+    try:
+        segments = read_srt(srt_file)
+    except (OSError, UnicodeDecodeError) as e:
+        return f"unreadable ({type(e).__name__})"
+    if not len(segments):
+        return "no subtitle cues"
+    # Muxers need cues in time order with non-negative, non-empty spans
+    order = np.argsort(segments.starts, kind='stable')
+    starts = np.maximum(segments.starts[order], 0.0)
+    ends = np.maximum(segments.ends[order], starts + 0.001)
+    Segments(starts, ends, [segments.texts[i] for i in order]).write_srt(out_path)
+    return None
+
+
+def audio_blocks(combined_wav, duration, gain):
+    """Yield float32 blocks of combined_wav trimmed (or silence-padded) to duration, gained and clipped"""
+    with sf.SoundFile(combined_wav) as f:
+        sample_rate = f.samplerate
+        remaining = int(round(duration * sample_rate))
+        block = BLOCK_SECONDS * sample_rate
+        while remaining > 0:
+            data = f.read(min(block, remaining), dtype='float32', always_2d=True)
+            if not len(data):
+                break
+            data = data.mean(axis=1) if data.shape[1] > 1 else data[:, 0]
+            remaining -= len(data)
+            yield np.clip(data * gain, -1.0, 1.0)
+        while remaining > 0:
+            n = min(block, remaining)
+            remaining -= n
+            yield np.zeros(n, dtype=np.float32)
+
+
+def language_code(language):
+    return LANGUAGE_CODES.get(language.lower(), 'und')
+
+
+def mux_command(video_file, audio_tracks, subtitles, output_file):
+    """ffmpeg command for [(pcm source, sample_rate, language, title)] audio tracks
+    ('pipe:0' or a named pipe, raw f32le) and [(path, language, title)] subtitles"""
+    codec = SUBTITLE_CODECS.get(os.path.splitext(output_file)[1].lower(), 'mov_text')
+    cmd = ['ffmpeg', '-y', '-v', 'error', '-i', video_file]
+    for source, sample_rate, _, _ in audio_tracks:
+        cmd += ['-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', source]
+    for path, _, _ in subtitles:
+        cmd += ['-i', path]
+    cmd += ['-map', '0:v:0?']
+    for n in range(len(audio_tracks)):
+        cmd += ['-map', f'{n + 1}:a:0']
+    for n in range(len(subtitles)):
+        cmd += ['-map', f'{n + 1 + len(audio_tracks)}:0']
+    cmd += ['-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k']
+    for n, (_, _, language, title) in enumerate(audio_tracks):
+        cmd += [f'-metadata:s:a:{n}', f'language={language}', f'-metadata:s:a:{n}', f'title={title}']
+        if len(audio_tracks) > 1:
+            cmd += [f'-disposition:a:{n}', 'default' if n == 0 else '0']
+    if subtitles:
+        cmd += ['-c:s', codec]
+    for n, (_, language, title) in enumerate(subtitles):
+        cmd += [f'-metadata:s:s:{n}', f'language={language}', f'-metadata:s:s:{n}', f'title={title}']
+    return cmd + [output_file]
+
+
+def feed(out, combined_wav, duration, gain):
+    """Stream one finalized audio track into an open pipe; returns the bytes written"""
+    written = 0
+    try:
+        for block in audio_blocks(combined_wav, duration, gain):
+            data = block.astype('<f4').tobytes()
+            out.write(data)
+            written += len(data)
+    except BrokenPipeError:
+        pass  # ffmpeg exited early; its log says why
+    finally:
+        try:
+            out.close()
+        except BrokenPipeError:
+            pass
+    return written
+
+
+def feed_fifo(fifo, combined_wav, duration, gain, written, n):
+    try:
+        out = open(fifo, 'wb')  # blocks until ffmpeg opens this input
+    except OSError:
+        return
+    written[n] = feed(out, combined_wav, duration, gain)
+
+
+def release_fifo(fifo):
+    """Unblock a feeder still waiting for ffmpeg to open its pipe (ffmpeg exited first)"""
+    try:
+        os.close(os.open(fifo, os.O_RDONLY | os.O_NONBLOCK))
+    except OSError:
+        pass
+
+
+def finalize_and_mux(video_file, combined_wav, translated_srt, target_lang, output_file,
+                     original_srt=None, gain=DEFAULT_GAIN):
+    """Stream the trimmed, gained timeline into one ffmpeg mux with the usable subtitle tracks"""
+    mux_languages(video_file, [(target_lang, combined_wav, translated_srt)], output_file, original_srt, gain)
+
+
+def mux_languages(video_file, languages, output_file, original_srt=None, gain=DEFAULT_GAIN):
+    """One ffmpeg mux of the video with an audio and a subtitle track per language.
+    languages: [(target_lang, combined_wav, translated_srt)]; the first is the default track.
+    """
+    import threading
+
+    duration = probe_duration(video_file)
+    tmp_dir = tempfile.mkdtemp(prefix='finalize_mux_')
+    try:
+        tracks = []
+        if original_srt:
+            tracks.append((original_srt, 'eng', 'Original'))
+        tracks += [(srt, language_code(lang), lang) for lang, _, srt in languages]
+        subtitles = []
+        for n, (srt_file, language, title) in enumerate(tracks):
+            clean = os.path.join(tmp_dir, f"track_{n}.srt")
+            with tracing.span('prepare_subtitle', 'mux', track=title, bytes=os.path.getsize(srt_file)
+                              if os.path.exists(srt_file) else 0) as span:
+                problem = prepare_subtitle(srt_file, clean)
+                if problem:
+                    span.set(error=problem)
+            if problem:
+                print(f"  Leaving out subtitle track {title!r} ({srt_file}): {problem}")
+            else:
+                subtitles.append((clean, language, title))
+
+        # One language goes through stdin; several each get a named pipe fed by a thread
+        audio_tracks = []
+        for n, (lang, combined_wav, _) in enumerate(languages):
+            source = 'pipe:0'
+            if len(languages) > 1:
+                source = os.path.join(tmp_dir, f"audio_{n}.f32")
+                os.mkfifo(source)
+            audio_tracks.append((source, first_stream(combined_wav, 'audio')['sample_rate'],
+                                 language_code(lang), lang))
+
+        cmd = mux_command(video_file, audio_tracks, subtitles, output_file)
+        log_path = os.path.join(tmp_dir, 'ffmpeg.log')
+        with open(log_path, 'w') as log, tracing.span('mux', 'mux', audio_tracks=len(audio_tracks),
+                                                      subtitles=len(subtitles)) as span:
+            try:
+                proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if len(languages) == 1 else subprocess.DEVNULL,
+                                        stdout=subprocess.DEVNULL, stderr=log)
+            except FileNotFoundError:
+                raise RuntimeError("ffmpeg not found")
+            written = [0] * len(languages)
+            if len(languages) == 1:
+                written[0] = feed(proc.stdin, languages[0][1], duration, gain)
+            else:
+                feeders = [threading.Thread(target=feed_fifo, args=(source, combined_wav, duration, gain, written, n),
+                                            daemon=True)
+                           for n, ((source, _, _, _), (_, combined_wav, _)) in enumerate(zip(audio_tracks, languages))]
+                for feeder in feeders:
+                    feeder.start()
+            returncode = proc.wait()
+            if len(languages) > 1:
+                for (source, _, _, _), feeder in zip(audio_tracks, feeders):
+                    release_fifo(source)
+                    feeder.join()
+            span.set(bytes=sum(written))
+            if returncode != 0:
+                span.set(error=f"ffmpeg exit {returncode}")
+        if returncode != 0:
+            with open(log_path) as log:
+                raise RuntimeError(f"ffmpeg mux failed ({returncode}): {log.read().strip()[-2000:]}")
+        print(f"  {duration:.1f}s of audio x {len(audio_tracks)} language(s) muxed with "
+              f"{len(subtitles)} subtitle track(s) -> {output_file}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    args = sys.argv[1:]
+    tracing.setup(args)
+    original_srt = pop_option(args, '--original-srt')
+    gain = float(pop_option(args, '--gain', DEFAULT_GAIN))
+    if len(args) < 5:
+        print("Usage: finalize_mux.py <video_file> <combined_wav> <translated_srt> <target_lang> <output_file> "
+              "[--original-srt FILE] [--gain 1.5] [--trace FILE]")
+        sys.exit(1)
+    video_file, combined_wavs, translated_srts, target_langs, output_file = args[:5]
+    languages = list(zip(*(value.split(',') for value in (target_langs, combined_wavs, translated_srts))))
+    if not all(len(value.split(',')) == len(languages) for value in (target_langs, combined_wavs, translated_srts)):
+        print("ERROR: combined_wav, translated_srt and target_lang lists must have the same length")
+        sys.exit(1)
+    try:
+        mux_languages(video_file, languages, output_file, original_srt, gain)
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
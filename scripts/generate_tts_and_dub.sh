@@ -1,12 +1,29 @@
 #!/bin/bash
 # Generate TTS audio with perfect subtitle sync and create dubbed video
-# Usage: generate_tts_and_dub.sh <video_file> <original_srt> <translated_srt> <target_lang> [voice_profile] [voice_name]
+# Usage: generate_tts_and_dub.sh <video_file> <original_srt> <translated_srt[,...]> <target_lang[,...]> [voice_profile] [voice_name[,...]]
 #
 # Uses numpy timeline assembly (scales to 1500+ segments).
-# edge-tts runs async parallel (batches of 10) for speed.
+# edge-tts runs async through an adaptive sliding window for speed.
+# With TRACE_FILE set, every step adds its spans to one Chrome trace (see tracing.py).
+#
+# Several languages (comma-separated translated SRTs and target languages, as written to
+# {name}_status.json by video_dubber.py) are synthesized in parallel, splitting one budget
+# between them: $DUB_JOBS stretch workers (default: all cores) and $DUB_TTS_CONCURRENCY
+# TTS requests (default 20). The result is one MP4 with an audio and a subtitle track
+# per language; the video stream is copied once.
+#
+# Work dirs are kept under $DUB_WORK_DIR for incremental re-dubs and pruned once unused
+# for $DUB_KEEP_DAYS days (default 14, 0 = never); "generate_tts_and_dub.sh --clean" removes them all.
 
 set -e
 
+DUB_ROOT="${DUB_WORK_DIR:-$HOME/.cache/video-processor/dub}"
+if [ "$1" = "--clean" ]; then
+    rm -rf "$DUB_ROOT"
+    echo "Removed dub work dirs under $DUB_ROOT"
+    exit 0
+fi
+
 VIDEO_FILE="$1"
 ORIGINAL_SRT="$2"
 TRANSLATED_SRT="$3"
@@ -15,16 +32,46 @@ VOICE_PROFILE="$5"  # Optional: voicebox profile name OR "none" to skip
 VOICE_NAME="$6"     # Optional: specific voice ID override (e.g. en-US-BrianNeural)
 
 if [ -z "$VIDEO_FILE" ] || [ -z "$ORIGINAL_SRT" ] || [ -z "$TRANSLATED_SRT" ] || [ -z "$TARGET_LANG" ]; then
-    echo "Usage: generate_tts_and_dub.sh <video_file> <original_srt> <translated_srt> <target_lang> [voice_profile] [voice_name]"
+    echo "Usage: generate_tts_and_dub.sh <video_file> <original_srt> <translated_srt[,...]> <target_lang[,...]> [voice_profile] [voice_name[,...]]"
+    echo "  translated_srt, target_lang: comma-separated lists of the same length for a multi-language dub"
     echo "  voice_profile: voicebox profile name, or omit for auto-select"
-    echo "  voice_name: specific voice ID (e.g. en-US-BrianNeural, am_michael)"
+    echo "  voice_name: specific voice ID (e.g. en-US-BrianNeural, am_michael); one per language"
+    echo "              for a multi-language dub (leave an entry empty to auto-select)"
+    echo "Or: generate_tts_and_dub.sh --clean   (remove all kept work dirs)"
     exit 1
 fi
 
-BASE_NAME=$(basename "$VIDEO_FILE" | sed 's/\.[^.]*$//')
-WORK_DIR="/tmp/tts_work_$$"
+IFS=',' read -ra LANGS <<< "$TARGET_LANG"
+IFS=',' read -ra SRTS <<< "$TRANSLATED_SRT"
+if [ "${#LANGS[@]}" -ne "${#SRTS[@]}" ]; then
+    echo "ERROR: ${#SRTS[@]} translated SRT(s) for ${#LANGS[@]} target language(s)"
+    exit 1
+fi
+NUM_LANGS=${#LANGS[@]}
+VOICES=()
+if [ -n "$VOICE_NAME" ]; then
+    IFS=',' read -ra VOICES <<< "$VOICE_NAME"
+    # A trailing empty entry ("voice,") is dropped by read; pad so the lengths line up
+    while [ "${#VOICES[@]}" -lt "$NUM_LANGS" ] && [[ "$VOICE_NAME" == *, ]]; do VOICES+=(""); done
+    if [ "${#VOICES[@]}" -ne "$NUM_LANGS" ]; then
+        echo "ERROR: ${#VOICES[@]} voice name(s) for ${#LANGS[@]} target language(s); give one per language"
+        exit 1
+    fi
+fi
+
 SCRIPT_DIR="$(cd "$(dirname "$0")" && pwd)"
 
+# Remember translations edited during review, in the memory video_dubber.py translated with:
+# $TRANSLATION_MEMORY_DB ("translation_memory" in {name}_status.json when --tm was given; "off" skips)
+for i in "${!LANGS[@]}"; do
+    python3 "$SCRIPT_DIR/translation_memory.py" learn "$ORIGINAL_SRT" "${SRTS[$i]}" "${LANGS[$i]}" || true
+done
+
+BASE_NAME=$(basename "$VIDEO_FILE" | sed 's/\.[^.]*$//')
+# Persistent per-video work dirs: re-running after review edits only re-dubs the changed lines.
+# Keyed by the input's absolute path too, so a/intro.mp4 and b/intro.mp4 don't share one
+PATH_HASH=$(python3 -c "import hashlib, os, sys; print(hashlib.sha1(os.path.abspath(sys.argv[1]).encode('utf-8')).hexdigest()[:8])" "$VIDEO_FILE")
+
 echo "========================================"
 echo "  Generating Synced TTS Audio"
 echo "========================================"
@@ -33,116 +80,106 @@ echo "Video: $VIDEO_FILE"
 echo "Target: $TARGET_LANG"
 echo ""
 
-# Create working directory
-mkdir -p "$WORK_DIR"
-
-# Determine TTS engine
-if [ -n "$VOICE_PROFILE" ] && [ "$VOICE_PROFILE" != "none" ]; then
-    TTS_ENGINE="voicebox"
-    echo "Using: Voicebox voice cloning (profile: $VOICE_PROFILE)"
-elif [ "$TARGET_LANG" = "chinese" ] || [ "$TARGET_LANG" = "zh" ]; then
-    if [ -f "$HOME/miniconda3/envs/kokoro/bin/python3" ]; then
-        TTS_ENGINE="kokoro"
-        echo "Using: Kokoro TTS (local)"
-    else
-        TTS_ENGINE="edge-tts"
-        echo "Using: edge-tts (cloud, parallel)"
+# Global budget, split between languages synthesized at the same time
+CPUS=$(python3 -c "import os; print(os.cpu_count() or 1)")
+JOBS_PER_LANG=$(( ${DUB_JOBS:-$CPUS} / NUM_LANGS ))
+TTS_PER_LANG=$(( ${DUB_TTS_CONCURRENCY:-20} / NUM_LANGS ))
+[ "$JOBS_PER_LANG" -ge 1 ] || JOBS_PER_LANG=1
+[ "$TTS_PER_LANG" -ge 1 ] || TTS_PER_LANG=1
+
+PIDS=()
+COMBINED_WAVS=()
+for i in "${!LANGS[@]}"; do
+    LANG_I="${LANGS[$i]}"
+    WORK_DIR="$DUB_ROOT/${BASE_NAME}-${PATH_HASH}_${LANG_I}"
+    mkdir -p "$WORK_DIR"
+    touch "$WORK_DIR"  # last used, for pruning
+    COMBINED_WAVS+=("$WORK_DIR/combined.wav")
+
+    # Determine TTS engine (voice profile -> voicebox, else the registered engine preferred
+    # for the language, else edge-tts; see tts_engines.py)
+    ENGINE_I="${TTS_ENGINE:-$(python3 "$SCRIPT_DIR/tts_engines.py" select "$LANG_I" "$VOICE_PROFILE")}"
+    case "$ENGINE_I" in
+        voicebox) echo "[$LANG_I] Using: Voicebox voice cloning (profile: $VOICE_PROFILE)" ;;
+        kokoro)   echo "[$LANG_I] Using: Kokoro TTS (local)" ;;
+        edge-tts) echo "[$LANG_I] Using: edge-tts (cloud, parallel)" ;;
+        *)        echo "[$LANG_I] Using: $ENGINE_I" ;;
+    esac
+
+    # Build sync_tts.py arguments
+    SYNC_ARGS=("${SRTS[$i]}" "$WORK_DIR" "$ENGINE_I" "$LANG_I" --pipeline streaming)
+    if [ "$NUM_LANGS" -gt 1 ]; then
+        SYNC_ARGS+=(--jobs "$JOBS_PER_LANG" --tts-concurrency "$TTS_PER_LANG")
+    fi
+    if [ -n "$VOICE_PROFILE" ] && [ "$VOICE_PROFILE" != "none" ]; then
+        SYNC_ARGS+=("$VOICE_PROFILE")
+    fi
+    VOICE_I="${VOICES[$i]}"
+    if [ -n "$VOICE_I" ]; then
+        # If no voice_profile but we have voice_name, add placeholder
+        if [ -z "$VOICE_PROFILE" ] || [ "$VOICE_PROFILE" = "none" ]; then
+            SYNC_ARGS+=("none")
+        fi
+        SYNC_ARGS+=("$VOICE_I")
     fi
-else
-    TTS_ENGINE="edge-tts"
-    echo "Using: edge-tts (cloud, parallel)"
-fi
-echo ""
 
-# Build sync_tts.py arguments
-SYNC_ARGS=("$TRANSLATED_SRT" "$WORK_DIR" "$TTS_ENGINE" "$TARGET_LANG")
-if [ -n "$VOICE_PROFILE" ] && [ "$VOICE_PROFILE" != "none" ]; then
-    SYNC_ARGS+=("$VOICE_PROFILE")
-fi
-if [ -n "$VOICE_NAME" ]; then
-    # If no voice_profile but we have voice_name, add placeholder
-    if [ -z "$VOICE_PROFILE" ] || [ "$VOICE_PROFILE" = "none" ]; then
-        SYNC_ARGS+=("none")
+    # Generate and sync TTS (TTS, stretching and timeline placement overlapped)
+    if [ "$NUM_LANGS" -eq 1 ]; then
+        echo ""
+        python3 "$SCRIPT_DIR/sync_tts.py" "${SYNC_ARGS[@]}"
+    else
+        python3 "$SCRIPT_DIR/sync_tts.py" "${SYNC_ARGS[@]}" > "$WORK_DIR/sync_tts.log" 2>&1 &
+        PIDS+=($!)
     fi
-    SYNC_ARGS+=("$VOICE_NAME")
+done
+
+if [ "$NUM_LANGS" -gt 1 ]; then
+    echo ""
+    echo "Synthesizing $NUM_LANGS languages in parallel ($JOBS_PER_LANG stretch jobs, $TTS_PER_LANG TTS requests each)..."
+    FAILED=0
+    for i in "${!PIDS[@]}"; do
+        LOG="$DUB_ROOT/${BASE_NAME}-${PATH_HASH}_${LANGS[$i]}/sync_tts.log"
+        if wait "${PIDS[$i]}"; then
+            echo "[${LANGS[$i]}] $(grep 'TOTAL:' "$LOG" | tail -1 | sed 's/^ *//')"
+        else
+            echo "[${LANGS[$i]}] FAILED, last lines of $LOG:"
+            tail -20 "$LOG"
+            FAILED=1
+        fi
+    done
+    [ "$FAILED" -eq 0 ] || exit 1
 fi
 
-# Generate and sync TTS (parallel edge-tts + numpy timeline)
-python3 "$SCRIPT_DIR/sync_tts.py" "${SYNC_ARGS[@]}"
-
 echo ""
 
-# The combined WAV is already built by sync_tts.py using numpy timeline
-COMBINED_WAV="$WORK_DIR/combined.wav"
-
-if [ ! -f "$COMBINED_WAV" ]; then
-    echo "ERROR: Combined audio not found at $COMBINED_WAV"
-    exit 1
-fi
-
-# Get video duration and trim/normalize
-VIDEO_DUR=$(ffprobe -v error -show_entries format=duration -of default=noprint_wrappers=1:nokey=1 "$VIDEO_FILE")
-
-echo "Trimming to video duration and normalizing..."
-ffmpeg -y -i "$COMBINED_WAV" -t "$VIDEO_DUR" -af "volume=1.5" -ar 24000 -ac 1 "${BASE_NAME}_${TARGET_LANG}_audio.wav" 2>/dev/null
-
-echo "Synced audio: ${BASE_NAME}_${TARGET_LANG}_audio.wav"
-echo ""
+# The combined WAVs are already built by sync_tts.py using numpy timeline
+for COMBINED_WAV in "${COMBINED_WAVS[@]}"; do
+    if [ ! -f "$COMBINED_WAV" ]; then
+        echo "ERROR: Combined audio not found at $COMBINED_WAV"
+        exit 1
+    fi
+done
 
-# Create dubbed video with subtitle tracks
+# Trim to video duration, apply gain and mux in one pass: the audio is piped
+# straight into ffmpeg and subtitle tracks are checked before muxing
 echo "========================================"
 echo "  Creating Dubbed Video"
 echo "========================================"
 echo ""
 
-# Try with dual subtitle tracks first
 echo "Muxing audio + subtitles onto video..."
-ffmpeg -y \
-    -i "$VIDEO_FILE" \
-    -i "${BASE_NAME}_${TARGET_LANG}_audio.wav" \
-    -i "$ORIGINAL_SRT" \
-    -i "$TRANSLATED_SRT" \
-    -map 0:v:0 -map 1:a:0 -map 2:0 -map 3:0 \
-    -c:v copy \
-    -c:a aac -b:a 192k \
-    -c:s mov_text \
-    -metadata:s:s:0 language=eng -metadata:s:s:0 title="Original" \
-    -metadata:s:s:1 language="${TARGET_LANG}" -metadata:s:s:1 title="${TARGET_LANG}" \
-    -shortest \
-    "${BASE_NAME}_dubbed.mp4" 2>/dev/null
-
-if [ $? -ne 0 ]; then
-    echo "Dual subs failed, trying with single subtitle track..."
-    ffmpeg -y \
-        -i "$VIDEO_FILE" \
-        -i "${BASE_NAME}_${TARGET_LANG}_audio.wav" \
-        -i "$TRANSLATED_SRT" \
-        -map 0:v:0 -map 1:a:0 -map 2:0 \
-        -c:v copy \
-        -c:a aac -b:a 192k \
-        -c:s mov_text -metadata:s:s:0 language="${TARGET_LANG}" \
-        -shortest \
-        "${BASE_NAME}_dubbed.mp4" 2>/dev/null
-
-    if [ $? -ne 0 ]; then
-        echo "Subtitle mux failed, creating video without subs..."
-        ffmpeg -y \
-            -i "$VIDEO_FILE" \
-            -i "${BASE_NAME}_${TARGET_LANG}_audio.wav" \
-            -map 0:v:0 -map 1:a:0 \
-            -c:v copy \
-            -c:a aac -b:a 192k \
-            -shortest \
-            "${BASE_NAME}_dubbed.mp4" 2>/dev/null
-    fi
+WAV_LIST=$(IFS=','; echo "${COMBINED_WAVS[*]}")
+python3 "$SCRIPT_DIR/finalize_mux.py" "$VIDEO_FILE" "$WAV_LIST" "$TRANSLATED_SRT" "$TARGET_LANG" \
+    "${BASE_NAME}_dubbed.mp4" --original-srt "$ORIGINAL_SRT"
+
+# Prune work dirs of other videos not dubbed for $DUB_KEEP_DAYS days
+KEEP_DAYS="${DUB_KEEP_DAYS:-14}"
+if [ "$KEEP_DAYS" -gt 0 ]; then
+    find "$DUB_ROOT" -mindepth 1 -maxdepth 1 -type d -mtime +"$KEEP_DAYS" -exec rm -rf {} +
 fi
 
 echo ""
-
-# Cleanup
-echo "Cleaning up temporary files..."
-rm -rf "$WORK_DIR"
-rm -f "${BASE_NAME}_${TARGET_LANG}_audio.wav"
+echo "Kept work dirs under $DUB_ROOT for incremental re-dubs (pruned after $KEEP_DAYS days unused; --clean removes them)"
 
 echo ""
 echo "========================================"
@@ -151,9 +188,18 @@ echo "========================================"
 echo ""
 echo "Output files:"
 echo "  - ${BASE_NAME}_original.srt"
-echo "  - ${BASE_NAME}_${TARGET_LANG}.srt"
+for SRT in "${SRTS[@]}"; do
+    echo "  - $SRT"
+done
 echo "  - ${BASE_NAME}_dubbed.mp4"
 echo ""
 echo "Video uses -c:v copy (no re-encode, fast)."
 echo "Subtitle tracks embedded as soft subs (toggle in player)."
+if [ "$NUM_LANGS" -gt 1 ]; then
+    echo "One audio track per language (${TARGET_LANG}); pick it in the player."
+fi
 echo ""
+
+if [ -n "$TRACE_FILE" ]; then
+    python3 "$SCRIPT_DIR/tracing.py" export "$TRACE_FILE"
+fi
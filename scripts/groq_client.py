@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Groq Client - Shared pooled API client and rate-limit-aware request scheduling
+One keep-alive HTTP connection pool per API key, shared by transcription,
+translation and summary. Set GROQ_BASE_URL to point at any OpenAI-compatible
+server (e.g. a local mock) instead of api.groq.com.
+"""
+import asyncio
+import random
+import time
+
+import tracing
+
+_clients = {}
+
+# Groq free-tier limits for llama-3.3-70b-versatile; override with --rpm / --tpm
+DEFAULT_RPM = 30
+DEFAULT_TPM = 12000
+
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def get_client(api_key, max_connections=16):
+    """Return the process-wide Groq client for api_key (one pooled keep-alive httpx client)"""
+    from groq import Groq, DefaultHttpxClient
+    import httpx
+
+    if api_key not in _clients:
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+        _clients[api_key] = Groq(api_key=api_key, http_client=http_client)
+    return _clients[api_key]
+
+
+def estimate_tokens(messages):
+    """Rough, conservative token estimate for a chat request (prompt + a similar-sized reply)"""
+    chars = sum(len(m['content']) for m in messages)
+    return chars // 2 + 16
+
+
+class RateLimiter:
+    """Token buckets for the API's requests-per-minute and tokens-per-minute limits"""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm)
+        self.tokens = float(tpm)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens):
+        """Wait until one request and `tokens` tokens are available, then take them"""
+        tokens = min(tokens, self.tpm)
+        async with self.lock:
+            while True:
+                self.refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait = max((1 - self.requests) * 60 / self.rpm,
+                           (tokens - self.tokens) * 60 / self.tpm)
+                await asyncio.sleep(max(wait, 0.01))
+
+    def update_from_headers(self, headers):
+        """Follow the server's view of the token budget (x-ratelimit-*-tokens headers)"""
+        try:
+            limit = headers.get('x-ratelimit-limit-tokens')
+            if limit:
+                self.tpm = max(int(float(limit)), 1)
+            remaining = headers.get('x-ratelimit-remaining-tokens')
+            if remaining:
+                self.tokens = min(self.tokens, float(remaining))
+        except ValueError:
+            pass
+
+
+def retry_delay(error, attempt):
+    """Seconds to wait before retrying: the server's retry-after if given, else jittered exponential"""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            pass
+    return min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0)
+
+
+class ChatScheduler:
+    """Runs chat completions concurrently under a concurrency limit and RPM/TPM token buckets.
+
+    Requests go through the shared pooled client in worker threads; 429 and 5xx
+    responses are retried with backoff. Create inside the running event loop.
+    """
+
+    def __init__(self, client, concurrency=4, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.client = client.with_options(max_retries=0)  # retries are handled here
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = RateLimiter(rpm, tpm)
+        self.retries = 0
+
+    async def create(self, **kwargs):
+        from groq import RateLimitError, InternalServerError
+
+        tokens = estimate_tokens(kwargs['messages'])
+        queued = time.perf_counter()
+        async with self.semaphore:
+            with tracing.span('chat', 'translate', model=kwargs.get('model'), tokens=tokens,
+                              bytes=sum(len(m['content'].encode('utf-8')) for m in kwargs['messages'])) as span:
+                span.set(queued=round(time.perf_counter() - queued, 3))
+                for attempt in range(MAX_ATTEMPTS):
+                    await self.limiter.acquire(tokens)
+                    try:
+                        raw = await asyncio.to_thread(
+                            self.client.chat.completions.with_raw_response.create, **kwargs)
+                    except (RateLimitError, InternalServerError) as e:
+                        if attempt == MAX_ATTEMPTS - 1:
+                            raise
+                        self.retries += 1
+                        span.add('retries')
+                        delay = retry_delay(e, attempt)
+                        if isinstance(e, RateLimitError):
+                            self.limiter.tokens = 0  # server says the budget is spent
+                        print(f"\n  API {e.status_code}, retrying in {delay:.1f}s...")
+                        await asyncio.sleep(delay)
+                        continue
+                    self.limiter.update_from_headers(raw.headers)
+                    return raw.parse()
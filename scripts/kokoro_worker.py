@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Persistent Kokoro TTS worker.
+Runs under the kokoro conda env, loads KPipeline once per language and keeps it warm,
+and serves synthesis jobs over a local Unix socket. Audio streams back per segment,
+so callers see progress immediately and large jobs have no time ceiling.
+
+Usage (worker): kokoro_worker.py [--socket PATH] [--idle-timeout SECONDS] [--threads N]
+Clients (sync_tts.py) start workers on demand and reuse them across runs.
+On CPU-only hosts, synthesize_sharded() spreads a job over several workers, each
+limited to cpu_count / workers threads, with shards balanced by text length.
+
+Protocol: newline-delimited JSON.
+  request:  {"op": "synthesize", "lang_code": "a", "voice": "am_michael", "batch_chars": 0,
+             "segments": [{"index": 0, "text": "..."}]}
+            batch_chars > 0 joins runs of short segments (up to that many characters) into one
+            pipe() call and splits the audio back apart at the segment boundaries
+  replies:  {"index": 0, "samples": N, "sample_rate": 24000} followed by N float32 little-endian samples,
+            or {"index": 0, "error": "..."}; finally {"done": true, "elapsed": seconds}
+  request:  {"op": "ping"} -> {"ok": true, "pipelines": [...]}
+  request:  {"op": "shutdown"} -> {"ok": true}
+"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import subprocess
+
+SAMPLE_RATE = 24000
+DEFAULT_IDLE_TIMEOUT = 1800
+SHORT_SEGMENT_CHARS = 80  # only segments this short are joined when batching
+KOKORO_PYTHON = os.path.expanduser("~/miniconda3/envs/kokoro/bin/python3")
+STARTUP_TIMEOUT = 60
+
+
+# ============================================================
+# Worker (runs in the kokoro env)
+# ============================================================
+
+def socket_path_for(shard=0, workers=1):
+    """Per-user socket for shard `shard` of a `workers`-process pool"""
+    return os.path.join(tempfile.gettempdir(), f"kokoro_worker_{os.getuid()}_{shard}of{workers}.sock")
+
+
+DEFAULT_SOCKET = socket_path_for()
+
+
+def send_json(out, obj):
+    out.write((json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+def batch_groups(segments, batch_chars):
+    """Group consecutive short segments so each group's text fits in batch_chars.
+    Lines without letters or digits ('...' placeholders) may yield no chunk, so they are never batched.
+    """
+    groups = []
+    for seg in segments:
+        short = (batch_chars > 0 and len(seg['text']) <= SHORT_SEGMENT_CHARS
+                 and any(c.isalnum() for c in seg['text']))
+        if (short and groups and groups[-1][-1]['short']
+                and sum(len(s['text']) for s in groups[-1]) + len(seg['text']) <= batch_chars):
+            groups[-1].append(dict(seg, short=True))
+        else:
+            groups.append([dict(seg, short=short)])
+    return groups
+
+
+def serve(socket_path=DEFAULT_SOCKET, idle_timeout=DEFAULT_IDLE_TIMEOUT, threads=None):
+    if threads:
+        # Must be set before torch is imported so each sharded worker stays in its core budget
+        for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+            os.environ[var] = str(threads)
+
+    import warnings
+    warnings.filterwarnings("ignore")
+    import numpy as np
+    from kokoro import KPipeline
+
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+
+    pipelines = {}
+
+    def get_pipeline(lang_code):
+        if lang_code not in pipelines:
+            t0 = time.time()
+            pipelines[lang_code] = KPipeline(lang_code=lang_code, repo_id="hexgrad/Kokoro-82M")
+            print(f"Loaded KPipeline lang_code={lang_code} in {time.time() - t0:.1f}s", flush=True)
+        return pipelines[lang_code]
+
+    def synthesize(pipe, text, voice):
+        chunks = [audio for _, _, audio in pipe(text, voice=voice, speed=1.0)]
+        if not chunks:
+            return np.zeros(2400, dtype=np.float32)
+        return np.concatenate([np.asarray(c, dtype=np.float32) for c in chunks])
+
+    def synthesize_group(pipe, group, voice):
+        """Yield (seg, audio, error); a group of short lines goes through one pipe() call.
+        KPipeline splits its input on newlines and yields one chunk per short line, so the
+        chunks map back to segments; if the counts disagree, fall back to one call per line.
+        Newlines inside a (multi-line cue) text are collapsed so each segment stays one line.
+        """
+        if len(group) > 1:
+            try:
+                text = '\n'.join(' '.join(seg['text'].split()) for seg in group)
+                chunks = [audio for _, _, audio in pipe(text, voice=voice, speed=1.0)]
+            except Exception:
+                chunks = []
+            if len(chunks) == len(group):
+                for seg, audio in zip(group, chunks):
+                    yield seg, np.asarray(audio, dtype=np.float32), None
+                return
+        for seg in group:
+            try:
+                yield seg, synthesize(pipe, seg['text'], voice), None
+            except Exception as e:
+                yield seg, None, str(e)
+
+    def handle(conn):
+        rfile = conn.makefile('rb')
+        wfile = conn.makefile('wb')
+        try:
+            for line in rfile:
+                request = json.loads(line)
+                op = request.get('op')
+                if op == 'ping':
+                    send_json(wfile, {'ok': True, 'pipelines': sorted(pipelines)})
+                elif op == 'shutdown':
+                    send_json(wfile, {'ok': True})
+                    wfile.flush()
+                    return False
+                elif op == 'synthesize':
+                    t0 = time.time()
+                    pipe = get_pipeline(request.get('lang_code', 'a'))
+                    voice = request['voice']
+                    for group in batch_groups(request['segments'], request.get('batch_chars', 0)):
+                        for seg, audio, error in synthesize_group(pipe, group, voice):
+                            if error is not None:
+                                send_json(wfile, {'index': seg['index'], 'error': error})
+                            else:
+                                send_json(wfile, {'index': seg['index'], 'samples': len(audio),
+                                                  'sample_rate': SAMPLE_RATE})
+                                wfile.write(audio.astype('<f4').tobytes())
+                            wfile.flush()
+                    send_json(wfile, {'done': True, 'elapsed': time.time() - t0})
+                else:
+                    send_json(wfile, {'error': f"unknown op {op!r}"})
+                wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away mid-job
+        finally:
+            rfile.close()
+            wfile.close()
+            conn.close()
+        return True
+
+    if os.path.exists(socket_path):
+        try:
+            connect(socket_path).close()
+            print(f"Another worker is already serving {socket_path}, exiting", flush=True)
+            return
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)  # stale socket from a dead worker
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(4)
+    server.settimeout(idle_timeout)
+    print(f"Kokoro worker listening on {socket_path} (pid {os.getpid()})", flush=True)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                print(f"Idle for {idle_timeout}s, exiting", flush=True)
+                break
+            conn.settimeout(None)
+            if not handle(conn):
+                break
+    finally:
+        server.close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# ============================================================
+# Client (runs in the main env)
+# ============================================================
+
+def connect(socket_path=DEFAULT_SOCKET):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    return sock
+
+
+def ensure_worker(socket_path=DEFAULT_SOCKET, kokoro_python=KOKORO_PYTHON, threads=None):
+    """Connect to the running worker, starting one in the background if needed"""
+    try:
+        return connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass
+
+    if not os.path.exists(kokoro_python):
+        raise RuntimeError(f"Kokoro env not found: {kokoro_python}")
+
+    log_path = socket_path + '.log'
+    print(f"Starting Kokoro worker (log: {log_path})...")
+    cmd = [kokoro_python, os.path.abspath(__file__), '--socket', socket_path]
+    if threads:
+        cmd += ['--threads', str(threads)]
+    with open(log_path, 'a') as log:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True
+        )
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        try:
+            return connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if proc.poll() is not None:
+                raise RuntimeError(f"Kokoro worker exited with code {proc.returncode}, see {log_path}")
+            time.sleep(0.2)
+    raise RuntimeError(f"Kokoro worker did not start within {STARTUP_TIMEOUT}s, see {log_path}")
+
+
+def synthesize_stream(sock, lang_code, voice, segments, batch_chars=0):
+    """Send one job and yield (index, audio float32 array or None, error) as segments finish"""
+    import numpy as np
+    import tracing
+
+    rfile = sock.makefile('rb')
+    request = {'op': 'synthesize', 'lang_code': lang_code, 'voice': voice, 'batch_chars': batch_chars,
+               'segments': [{'index': seg['index'], 'text': seg['text']} for seg in segments]}
+    sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+    last = time.time()  # the worker synthesizes in order, so each reply's span starts at the previous one
+    try:
+        while True:
+            line = rfile.readline()
+            if not line:
+                raise RuntimeError("Kokoro worker closed the connection")
+            reply = json.loads(line)
+            if reply.get('done'):
+                return
+            if 'samples' in reply:
+                data = rfile.read(reply['samples'] * 4)
+                now = time.time()
+                tracing.record('kokoro_segment', 'tts', last, now - last, segment=reply['index'], bytes=len(data))
+                last = now
+                yield reply['index'], np.frombuffer(data, dtype='<f4'), None
+            else:
+                now = time.time()
+                tracing.record('kokoro_segment', 'tts', last, now - last, segment=reply.get('index'),
+                               error=str(reply.get('error')))
+                last = now
+                yield reply.get('index'), None, reply.get('error')
+    finally:
+        rfile.close()
+
+
+def balance_shards(segments, workers):
+    """Split segments into `workers` shards with roughly equal total text length
+    (longest first onto the lightest shard); each shard keeps subtitle order."""
+    import heapq
+
+    heap = [(0, n) for n in range(workers)]
+    shards = [[] for _ in range(workers)]
+    for seg in sorted(segments, key=lambda s: len(s['text']), reverse=True):
+        load, n = heapq.heappop(heap)
+        shards[n].append(seg)
+        heapq.heappush(heap, (load + len(seg['text']) + 1, n))
+    return [sorted(shard, key=lambda s: s['index']) for shard in shards if shard]
+
+
+def synthesize_sharded(segments, lang_code, voice, workers=1, batch_chars=0,
+                       kokoro_python=KOKORO_PYTHON):
+    """Synthesize across `workers` worker processes, each limited to cpu_count / workers threads.
+    Yields (index, audio, error) from all shards as segments finish.
+    """
+    import queue
+    import threading
+
+    threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else None
+    results = queue.Queue()
+    DONE = object()
+
+    def run_shard(n, shard):
+        try:
+            sock = ensure_worker(socket_path_for(n, workers), kokoro_python, threads)
+            with sock:
+                for item in synthesize_stream(sock, lang_code, voice, shard, batch_chars):
+                    results.put(item)
+        except (RuntimeError, OSError) as e:
+            for seg in shard:
+                results.put((seg['index'], None, f"shard {n}: {e}"))
+        finally:
+            results.put(DONE)
+
+    shards = balance_shards(segments, workers)
+    for n, shard in enumerate(shards):
+        threading.Thread(target=run_shard, args=(n, shard), daemon=True).start()
+
+    # A shard that fails part-way may report some segments twice; yield each index once
+    seen = set()
+    remaining = len(shards)
+    while remaining:
+        item = results.get()
+        if item is DONE:
+            remaining -= 1
+        elif item[0] not in seen:
+            seen.add(item[0])
+            yield item
+
+
+if __name__ == "__main__":
+    from cli_helper import pop_option
+
+    args = sys.argv[1:]
+    threads = pop_option(args, '--threads')
+    serve(pop_option(args, '--socket', DEFAULT_SOCKET),
+          float(pop_option(args, '--idle-timeout', DEFAULT_IDLE_TIMEOUT)),
+          int(threads) if threads else None)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Media Probe - Format, stream, duration and codec info with one probe per file
+WAV and MP3 headers are parsed in-process (no subprocess); anything else takes one
+`ffprobe -show_format -show_streams` call. Results are cached by path, size and mtime:
+in memory for the process, and on disk for ffprobe results so the next script run
+(or the next entry point in the same job) reuses them.
+
+Location: $PROBE_CACHE_DIR (default ~/.cache/video-processor/probe)
+Usage: media_probe.py <file> [field]    (prints the JSON info, or one top-level field)
+"""
+import os
+import sys
+import json
+import struct
+import hashlib
+import subprocess
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/video-processor/probe")
+MP3_SYNC_SEARCH = 1 << 16   # bytes scanned past the ID3 tag for the first frame
+MP3_WALK_LIMIT = 8 << 20    # files without a VBR header up to this size have every frame counted
+
+_memo = {}
+
+
+# ============================================================
+# WAV headers
+# ============================================================
+
+WAV_CODECS = {1: 'pcm_s{bits}le', 3: 'pcm_f{bits}le', 6: 'pcm_alaw', 7: 'pcm_mulaw'}
+
+
+def probe_wav(path, size):
+    """Walk the RIFF chunks for fmt/data; returns info or None if not a plain WAV"""
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+            return None
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, chunk_size = header[:4], struct.unpack('<I', header[4:])[0]
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                if len(fmt) < 16:
+                    return None
+            elif chunk_id == b'data':
+                if fmt is None:
+                    return None
+                data_size = min(chunk_size, size - f.tell())  # streamed writers leave 0xFFFFFFFF
+                break
+            else:
+                f.seek(chunk_size, 1)
+            if chunk_size % 2:
+                f.seek(1, 1)
+
+    audio_format, channels, sample_rate, byte_rate, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if audio_format == 0xFFFE and len(fmt) >= 26:  # WAVE_FORMAT_EXTENSIBLE: real format in the subtype GUID
+        audio_format = struct.unpack('<H', fmt[24:26])[0]
+    if not (sample_rate and block_align):
+        return None
+    duration = data_size // block_align / sample_rate
+    codec = WAV_CODECS.get(audio_format, f'wav_0x{audio_format:04x}').format(bits=bits)
+    return {'format': 'wav', 'duration': duration, 'bit_rate': byte_rate * 8,
+            'streams': [{'type': 'audio', 'codec': codec, 'sample_rate': sample_rate,
+                         'channels': channels, 'duration': duration}]}
+
+
+# ============================================================
+# MP3 headers
+# ============================================================
+
+MP3_BITRATES = {  # kbps by (MPEG-1?, layer)
+    (True, 1): [32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def mp3_frame(data, pos):
+    """Decode the frame header at data[pos]; returns a dict or None"""
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version, layer = (b1 >> 3) & 3, 4 - ((b1 >> 1) & 3)
+    bitrate_index, rate_index = b2 >> 4, (b2 >> 2) & 3
+    if version == 1 or layer == 4 or not 0 < bitrate_index < 15 or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index - 1] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    if layer == 1:
+        length, samples = (12 * bitrate // sample_rate + padding) * 4, 384
+    else:
+        samples = 1152 if (mpeg1 or layer == 2) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {'mpeg1': mpeg1, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+            'channels': 1 if b3 >> 6 == 3 else 2, 'samples': samples, 'length': length}
+
+
+def vbr_frame_count(data, pos, frame):
+    """Frame count from a Xing/Info or VBRI header in the first frame, or None (CBR)"""
+    side_info = (32 if frame['channels'] == 2 else 17) if frame['mpeg1'] else (17 if frame['channels'] == 2 else 9)
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 12:
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            return struct.unpack('>I', data[xing + 8:xing + 12])[0]
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        return struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+    return None
+
+
+def count_mp3_samples(path, offset, frame):
+    """Walk the frame headers from offset; returns total samples (stops at the first non-frame)"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(MP3_WALK_LIMIT)
+    pos = samples = 0
+    while frame is not None and frame['length'] > 0:
+        samples += frame['samples']
+        pos += frame['length']
+        frame = mp3_frame(data, pos)
+    return samples
+
+
+def probe_mp3(path, size):
+    """Skip ID3v2, find the first frame confirmed by the next one; returns info or None.
+    Duration comes from a Xing/VBRI header, else from counting frames (small files),
+    else from the first frame's bitrate (CBR).
+    """
+    with open(path, 'rb') as f:
+        head = f.read(10)
+        start = 0
+        if head[:3] == b'ID3' and len(head) == 10:
+            start = 10 + ((head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9])
+            if head[5] & 0x10:
+                start += 10  # footer
+        f.seek(start)
+        data = f.read(MP3_SYNC_SEARCH)
+        f.seek(max(size - 128, 0))
+        tail = f.read(128)
+
+    for pos in range(len(data) - 4):
+        frame = mp3_frame(data, pos)
+        if frame is None:
+            continue
+        following = pos + frame['length']
+        if following + 4 <= len(data) and mp3_frame(data, following) is None:
+            continue  # false sync inside other data
+        break
+    else:
+        return None
+
+    audio_start = start + pos
+    audio_bytes = size - audio_start - (128 if tail[:3] == b'TAG' else 0)
+    frames = vbr_frame_count(data, pos, frame)
+    if frames:
+        duration = frames * frame['samples'] / frame['sample_rate']
+    elif audio_bytes <= MP3_WALK_LIMIT:
+        duration = count_mp3_samples(path, audio_start, frame) / frame['sample_rate']
+    else:
+        duration = audio_bytes * 8 / frame['bitrate']
+    bit_rate = int(audio_bytes * 8 / duration) if duration else frame['bitrate']
+    return {'format': 'mp3', 'duration': duration, 'bit_rate': bit_rate,
+            'streams': [{'type': 'audio', 'codec': 'mp3' if frame['layer'] == 3 else f"mp{frame['layer']}",
+                         'sample_rate': frame['sample_rate'], 'channels': frame['channels'],
+                         'duration': duration}]}
+
+
+# ============================================================
+# ffprobe (everything else)
+# ============================================================
+
+def probe_ffprobe(path):
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+            capture_output=True, text=True
+        )
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe not found")
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {result.stderr.strip()}")
+    raw = json.loads(result.stdout)
+    fmt = raw.get('format', {})
+
+    def number(value, kind=float):
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            return None
+
+    streams = []
+    for s in raw.get('streams', []):
+        stream = {'type': s.get('codec_type'), 'codec': s.get('codec_name'),
+                  'duration': number(s.get('duration'))}
+        if stream['type'] == 'audio':
+            stream.update(sample_rate=number(s.get('sample_rate'), int), channels=s.get('channels'))
+        elif stream['type'] == 'video':
+            stream.update(width=s.get('width'), height=s.get('height'), frame_rate=s.get('avg_frame_rate'))
+        streams.append(stream)
+    return {'format': fmt.get('format_name'), 'duration': number(fmt.get('duration')),
+            'bit_rate': number(fmt.get('bit_rate'), int), 'streams': streams}
+
+
+# ============================================================
+# Cached entry point
+# ============================================================
+
+def cache_path(key):
+    cache_dir = os.environ.get('PROBE_CACHE_DIR', DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, hashlib.sha256(json.dumps(key).encode('utf-8')).hexdigest() + '.json')
+
+
+def probe(path):
+    """Info dict for a media file: {'format', 'duration', 'bit_rate', 'streams': [...], 'source'}.
+    Each stream has 'type' ('audio'/'video'/'subtitle'), 'codec' and 'duration', plus
+    'sample_rate'/'channels' (audio) or 'width'/'height'/'frame_rate' (video).
+    Raises RuntimeError if the file can't be probed.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = [path, st.st_size, st.st_mtime_ns]
+    memo_key = tuple(key)
+    if memo_key in _memo:
+        return _memo[memo_key]
+
+    info = None
+    try:
+        # Sniff the content rather than trusting the extension
+        with open(path, 'rb') as f:
+            magic = f.read(4)
+        if magic == b'RIFF':
+            info = probe_wav(path, st.st_size)
+        elif magic[:3] == b'ID3' or os.path.splitext(path)[1].lower() == '.mp3':
+            info = probe_mp3(path, st.st_size)
+    except (OSError, struct.error):
+        info = None
+    if info is not None:
+        info['source'] = 'header'
+    else:
+        disk = cache_path(key)
+        try:
+            with open(disk, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            info = dict(probe_ffprobe(path), source='ffprobe')
+            try:
+                os.makedirs(os.path.dirname(disk), exist_ok=True)
+                with open(disk + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(info, f)
+                os.replace(disk + '.tmp', disk)
+            except OSError:
+                pass  # read-only cache dir: still cached in memory
+
+    _memo[memo_key] = info
+    return info
+
+
+def duration(path):
+    """Duration in seconds (container duration, else the longest stream)"""
+    info = probe(path)
+    if info.get('duration'):
+        return info['duration']
+    durations = [s['duration'] for s in info['streams'] if s.get('duration')]
+    if not durations:
+        raise RuntimeError(f"No duration for {path}")
+    return max(durations)
+
+
+def first_stream(path, kind):
+    """First stream of a type ('audio', 'video', 'subtitle'), or None"""
+    return next((s for s in probe(path)['streams'] if s['type'] == kind), None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: media_probe.py <file> [field]")
+        sys.exit(1)
+    try:
+        info = probe(sys.argv[1])
+    except (OSError, RuntimeError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+    if len(sys.argv) > 2:
+        value = duration(sys.argv[1]) if sys.argv[2] == 'duration' else info.get(sys.argv[2])
+        print(value if not isinstance(value, (dict, list)) else json.dumps(value))
+    else:
+        print(json.dumps(info, indent=2))
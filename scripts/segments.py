@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Segments - Columnar subtitle cues and the one SRT parser/writer shared by every script
+Starts and ends are float64 NumPy arrays (durations derived), texts a side list and
+cue numbers an int array. `index` is always a cue's 0-based position in the file;
+`number` is the cue number as written in the SRT.
+
+The parser is a single tolerant regex pass that streams a file in chunks:
+CRLF, a UTF-8 BOM, extra blank lines, missing or odd cue numbers, '.' as the
+millisecond separator and trailing position tags after the timing are all accepted.
+Each chunk is split into number, timing and text columns in one regex call and all
+timings are converted at once; only irregular chunks are walked cue by cue.
+"""
+import re
+import itertools
+import numpy as np
+
+# A timing line, and the cue number on the line above it if that follows a blank line;
+# anything after the end time (position tags) is ignored. Split groups: number, 'start --> end'
+CUE_HEAD = re.compile(r'^(?:(?<=\n\n)[ \t]*(\d+)[ \t]*\n)?[ \t]*(\d+:\d\d?:\d\d?[,.]?\d{0,3}[ \t]*-->'
+                      r'[ \t]*\d+:\d\d?:\d\d?[,.]?\d{0,3})[^\n]*\n?', re.M | re.A)
+TIMESTAMP = re.compile(r'(\d+):(\d\d?):(\d\d?)[,.]?(\d{0,3})', re.A)
+# Timings written in full (HH:MM:SS,mmm, as nearly every file has them) skip per-field parsing
+FULL_TIMINGS = re.compile(r'(?:\d+:\d\d:\d\d[,.]\d\d\d[ \t]*-->[ \t]*\d+:\d\d:\d\d[,.]\d\d\d\n)*', re.A)
+FIELD_SEPARATORS = str.maketrans(':,.->', '     ')
+READ_CHUNK = 1 << 20
+
+
+def to_seconds(timings):
+    """Vectorized: 'start --> end' timing strings -> (n, 2) array of start/end seconds"""
+    joined = '\n'.join(timings) + '\n'
+    if FULL_TIMINGS.fullmatch(joined):
+        fields = np.fromstring(joined.translate(FIELD_SEPARATORS), dtype=np.int64, sep=' ').reshape(-1, 4)
+        millis = fields[:, 3]
+    else:
+        fields = np.array(TIMESTAMP.findall(joined), dtype='S')  # ASCII digits; bytes convert fastest
+        millis = np.char.ljust(fields[:, 3], 3, b'0').astype(np.int64)  # '5' is 500ms, '' is 0
+    hms = fields[:, :3].astype(np.int64) @ np.array([3600, 60, 1])
+    return (hms + millis / 1000).reshape(-1, 2)
+
+
+def format_timestamp(seconds):
+    """SRT timestamp (HH:MM:SS,mmm), rounded to the millisecond"""
+    millis = max(int(round(seconds * 1000)), 0)
+    secs, millis = divmod(millis, 1000)
+    mins, secs = divmod(secs, 60)
+    hours, mins = divmod(mins, 60)
+    return f"{hours:02d}:{mins:02d}:{secs:02d},{millis:03d}"
+
+
+class Segments:
+    """Subtitle cues stored as columns; iterating or indexing yields plain dicts
+    ({'index', 'number', 'text', 'start', 'end', 'duration'}) for per-cue work.
+    """
+
+    def __init__(self, starts=(), ends=(), texts=(), numbers=None):
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.texts = list(texts)
+        if numbers is None:
+            numbers = np.arange(1, len(self.texts) + 1)
+        self.numbers = np.asarray(numbers, dtype=np.int64)
+
+    @property
+    def durations(self):
+        return self.ends - self.starts
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(len(self))[i]]
+        i = range(len(self))[i]
+        start, end = float(self.starts[i]), float(self.ends[i])
+        return {'index': i, 'number': int(self.numbers[i]), 'text': self.texts[i],
+                'start': start, 'end': end, 'duration': end - start}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def with_texts(self, texts):
+        """Same cues and timing with new texts (e.g. a translation)"""
+        assert len(texts) == len(self)
+        return Segments(self.starts, self.ends, texts, self.numbers)
+
+    # --- Vectorized queries ---
+
+    def total_duration(self):
+        """Seconds from 0 to the end of the last cue"""
+        return float(self.ends.max()) if len(self) else 0.0
+
+    def speech_duration(self):
+        return float(self.durations.sum())
+
+    def gaps(self):
+        """Time from each cue's end to the next cue's start (negative = overlap), len n-1"""
+        return self.starts[1:] - self.ends[:-1]
+
+    def overlaps(self):
+        """Positions i where cue i runs into cue i+1"""
+        return np.nonzero(self.gaps() < 0)[0]
+
+    def in_range(self, t0, t1):
+        """Positions of cues that intersect [t0, t1)"""
+        return np.nonzero((self.starts < t1) & (self.ends > t0))[0]
+
+    # --- Serialization ---
+
+    def to_records(self):
+        """List of dicts (JSON-friendly)"""
+        return list(self)
+
+    @classmethod
+    def from_records(cls, records):
+        records = sorted(records, key=lambda r: r['index']) if records and 'index' in records[0] else records
+        return cls([r['start'] for r in records], [r['end'] for r in records],
+                   [r['text'] for r in records],
+                   [r.get('number', pos + 1) for pos, r in enumerate(records)])
+
+    def iter_srt(self):
+        """SRT text one cue at a time"""
+        for number, start, end, text in zip(self.numbers.tolist(), self.starts.tolist(),
+                                            self.ends.tolist(), self.texts):
+            yield f"{number}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text.strip()}\n\n"
+
+    def to_srt(self):
+        return ''.join(self.iter_srt())
+
+    def write_srt(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(self.iter_srt())
+
+
+def iter_cue_columns(chunks):
+    """Parse SRT text given as an iterable of chunks (e.g. an open file read in blocks)
+    into (numbers, timings, texts) columns, one set per chunk: a number is None when a
+    cue has none and a timing is the raw 'start --> end' text (see to_seconds).
+    A cue's text is everything up to the next timing line, minus blank lines and the
+    next cue's number.
+    """
+    carry = ''     # unparsed text, starting right after the last timing line consumed
+    head = None    # (number, timing) of the cue whose text is being read
+    for chunk in itertools.chain(chunks, [None]):
+        final = chunk is None
+        buf = carry + ('' if final else chunk.replace('\r', ''))
+        # A line cut off at the end of the chunk waits for the next one
+        cut = len(buf) if final else buf.rfind('\n') + 1
+        parts = CUE_HEAD.split(buf[:cut])
+        numbers, timings, blocks = parts[1::3], parts[2::3], parts[0::3]
+        carry = parts[-1] + buf[cut:]
+        if head is None:
+            if not timings:
+                continue
+            # Before the first cue, its number may be anywhere
+            if numbers[0] is None:
+                numbers[0] = split_block(blocks[0], first=True)[0]
+            head = (numbers[0], timings[0])
+            numbers, timings, blocks = numbers[1:], timings[1:], blocks[1:]
+        # blocks[i] is the text of the cue before timings[i] (head first); unless this is
+        # the final chunk, the last cue's text continues in the next one
+        cue_numbers = [head[0]] + numbers
+        cue_timings = [head[1]] + timings
+        # Well-formed chunks (every cue numbered, no stray whitespace) only need their texts
+        # stripped; anything else is split cue by cue
+        texts = [block.strip() for block in blocks[:len(numbers)]]
+        joined = '\0'.join(texts)
+        if None in numbers or '\n\n' in joined or ' \n' in joined or '\n ' in joined or '\t' in joined:
+            for i, number in enumerate(numbers):
+                cue_numbers[i + 1], texts[i] = split_block(blocks[i] + (number + '\n' if number else ''))
+        if final:
+            yield cue_numbers, cue_timings, texts + [split_block(blocks[-1])[1]]
+        else:
+            head = (cue_numbers[-1], cue_timings[-1])
+            yield cue_numbers[:-1], cue_timings[:-1], texts
+
+
+def split_block(block, first=False):
+    """Split the text between two timing lines into (next cue's number or None, text).
+    The number is a digits line after a blank line (or anywhere before the first cue);
+    a digits line right under a timing is text.
+    """
+    # Fast path for well-formed files: "text\n...\n\n<number>\n"
+    body, blank, tail = block.rstrip().rpartition('\n\n')
+    if tail.isdigit() and (blank or first):
+        body = body.strip()
+        if '\n\n' not in body and ' \n' not in body and '\n ' not in body and '\t' not in body:
+            return int(tail), body
+    lines = [line.strip() for line in block.split('\n')]
+    while lines and not lines[-1]:
+        lines.pop()
+    number = None
+    if lines and lines[-1].isdigit() and (first or (len(lines) >= 2 and not lines[-2])):
+        number = int(lines.pop())
+    return number, '\n'.join(line for line in lines if line)
+
+
+def parse_srt(content):
+    """Parse SRT text into Segments"""
+    return from_columns(iter_cue_columns([content.lstrip('\ufeff')]))
+
+
+def read_srt(path):
+    """Parse an SRT file into Segments, streaming it in 1 MB chunks"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return from_columns(iter_cue_columns(iter(lambda: f.read(READ_CHUNK), '')))
+
+
+def from_columns(columns):
+    numbers, timings, texts = [], [], []
+    for chunk_numbers, chunk_timings, chunk_texts in columns:
+        numbers += chunk_numbers
+        timings += chunk_timings
+        texts += chunk_texts
+    if not texts:
+        return Segments()
+    if None in numbers:
+        # A cue without a number follows on from the one before
+        for i, number in enumerate(numbers):
+            if number is None:
+                numbers[i] = int(numbers[i - 1]) + 1 if i else 1
+    seconds = to_seconds(timings)
+    numbers = np.fromstring(' '.join(map(str, numbers)), dtype=np.int64, sep=' ')
+    return Segments(seconds[:, 0], seconds[:, 1], texts, numbers)
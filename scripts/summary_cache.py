@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Summary Cache - Chunk summaries from the map step of video_summary.py
+Chunk summaries are written in the transcript's language and keyed by a hash of the
+chunk text (with its timestamps), model and prompt version, so re-summarizing the same
+media in another language only redoes the final reduce step.
+
+Location: $SUMMARY_CACHE_DIR (default ~/.cache/video-processor/summaries)
+"""
+import os
+import json
+import hashlib
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/video-processor/summaries")
+
+
+class SummaryCache:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get('SUMMARY_CACHE_DIR', DEFAULT_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, kind, text, model, prompt_version):
+        payload = json.dumps([kind, text, model, prompt_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached summary dict, or None"""
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return summary
+
+    def put(self, key, summary):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def report(self):
+        lookups = self.hits + self.misses
+        if lookups:
+            print(f"  Summary cache: {self.hits}/{lookups} chunk summaries reused ({self.cache_dir})")
@@ -1,355 +1,693 @@
 #!/usr/bin/env python3
 """
 Sync TTS audio to subtitle timing with parallel generation and numpy timeline assembly.
-Usage: sync_tts.py <translated_srt> <work_dir> <tts_engine> <target_lang> [voice_profile] [voice_name]
+Usage: sync_tts.py <translated_srt> <work_dir> <tts_engine> <target_lang> [voice_profile] [voice_name] [options]
 
 Supports:
-  - edge-tts: Async parallel generation (batches of 10), 50+ languages
-  - kokoro: Local TTS via Kokoro-82M, English/Chinese/Japanese/etc.
-  - voicebox: Voice cloning via mlx-audio Qwen3-TTS
+  - edge-tts: Async adaptive sliding window (AIMD concurrency, retries, hedging), 50+ languages
+  - kokoro: Local TTS via Kokoro-82M (persistent warm worker), English/Chinese/Japanese/etc.
+  - voicebox: Voice cloning via mlx-audio Qwen3-TTS (warm concurrent sessions)
+  - synthetic: Deterministic offline tones, for benchmarks and scheduling tests
+Engines are registered in tts_engines.py and scheduled from their declared capabilities.
 
+Speed adjustment time-stretches in-process (WSOLA, see time_stretch.py); ffmpeg atempo is the fallback.
 Timeline assembly uses numpy array placement (scales to 1500+ segments).
+Re-running on the same work_dir after SRT edits only regenerates the changed lines
+and patches their regions of combined.wav in place.
+--trace FILE (or $TRACE_FILE) records a span per TTS call, stretch and placement (see tracing.py).
 """
 import sys
 import os
 import json
-import re
+import shutil
+import difflib
+import hashlib
 import subprocess
 import time
-import asyncio
 import numpy as np
 import soundfile as sf
 
-SAMPLE_RATE = 24000
-
-
-def parse_srt(srt_file):
-    """Parse SRT file and return segments with timing"""
-    with open(srt_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    segments = []
-    for i, block in enumerate(content.strip().split('\n\n')):
-        lines = block.split('\n')
-        if len(lines) >= 3:
-            text = '\n'.join(lines[2:]).strip()
-            m = re.match(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})', lines[1])
-            if m:
-                h1, m1, s1, ms1, h2, m2, s2, ms2 = map(int, m.groups())
-                start = h1*3600 + m1*60 + s1 + ms1/1000
-                end = h2*3600 + m2*60 + s2 + ms2/1000
-                duration = end - start
-                segments.append({
-                    'index': i,
-                    'text': text,
-                    'start': start,
-                    'end': end,
-                    'duration': duration
-                })
-    return segments
+from cli_helper import pop_option
+from time_stretch import SAMPLE_RATE, adjust_file, clamp_ratio, load_audio, stretch_to_duration
+from tts_cache import TTSCache, cache_key, link_or_copy
+from tts_engines import ENGINES, create_engine, plan_execution
+from segments import read_srt
+import media_probe
+import tracing
 
 
 # ============================================================
 # TTS Generation
 # ============================================================
 
-async def generate_edge_tts_all(segments, work_dir, voice):
-    """Generate all segments with edge-tts in parallel batches"""
-    import edge_tts
+def generate_tts_cached(segments, work_dir, engine, cache=None, on_ready=None, requested=None):
+    """Run engine.generate() only for lines that aren't already available.
 
-    BATCH_SIZE = 10
-    total = len(segments)
-    t0 = time.time()
+    Segments with a raw file in work_dir are kept (resume), lines found in the
+    cross-run TTS cache are copied in, and repeated lines within the run are
+    synthesized once and copied to their duplicates. on_ready(seg, audio) is called
+    for every segment as soon as its raw file exists (audio only if the engine
+    decoded it in memory), so later stages can start before generation ends.
+    The lines left to synthesize are planned from the engine's capabilities, starting
+    from `requested` concurrency (see tts_engines.plan_execution).
+    """
+    ext = engine.output_format
+    groups = {}
+    for seg in segments:
+        key = cache_key(engine.name, engine.voice, engine.voice_profile, seg['text'])
+        groups.setdefault(key, []).append(seg)
+
+    to_generate = {}
+    finished = set()
+
+    def finish(key, audio=None):
+        """Store a line's raw file in the cache, copy it to duplicates and announce them"""
+        group = groups[key]
+        src = next(filter(None, (find_raw_file(work_dir, seg['index']) for seg in group)), None)
+        if src is None or key in finished:
+            return
+        finished.add(key)
+        if cache is not None and key in to_generate:
+            cache.store(key, ext, src)
+        for seg in group:
+            if not find_raw_file(work_dir, seg['index']):
+                link_or_copy(src, os.path.join(work_dir, f"raw_{seg['index']:04d}{os.path.splitext(src)[1]}"))
+            if on_ready:
+                on_ready(seg, audio)
+
+    with tracing.span('cache_lookup', 'tts', lines=len(groups)) as span:
+        for key, group in groups.items():
+            if any(find_raw_file(work_dir, seg['index']) for seg in group):
+                finish(key)
+                span.add('resumed')
+                continue
+            out_path = os.path.join(work_dir, f"raw_{group[0]['index']:04d}.{ext}")
+            if cache is None or not cache.fetch(key, ext, out_path):
+                to_generate[key] = group[0]
+            else:
+                finish(key)
+                span.add('cache_hits')
+
+    duplicates = len(segments) - len(groups)
+    print(f"Unique lines: {len(groups)} ({duplicates} repeated), to synthesize: {len(to_generate)}")
+    if to_generate:
+        key_of = {seg['index']: key for key, seg in to_generate.items()}
+        pending = list(to_generate.values())
+        plan = plan_execution(engine, pending, requested)
+        print(f"{engine.name}: {plan.concurrency} concurrent, batches of up to {plan.batch_size}")
+        engine.generate(pending, work_dir, plan, lambda idx, audio=None: finish(key_of[idx], audio))
+        for key in to_generate:
+            finish(key)  # lines an engine wrote without announcing
+
+    if cache is not None:
+        cache.report()
 
-    for batch_start in range(0, total, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total)
-        tasks = []
 
-        for i in range(batch_start, batch_end):
-            text = segments[i]['text'].strip()
-            if not text:
-                text = "..."
-            out_path = os.path.join(work_dir, f"raw_{segments[i]['index']:04d}.mp3")
+# ============================================================
+# Speed Adjustment
+# ============================================================
 
-            if os.path.exists(out_path) and os.path.getsize(out_path) > 100:
-                continue  # skip already generated
+STRETCH_ENGINES = ('numpy', 'ffmpeg')
 
-            async def gen_one(idx, txt, path):
-                try:
-                    communicate = edge_tts.Communicate(txt, voice)
-                    await communicate.save(path)
-                except Exception as e:
-                    try:
-                        await asyncio.sleep(1)
-                        communicate = edge_tts.Communicate(txt, voice)
-                        await communicate.save(path)
-                    except Exception:
-                        print(f"  FAIL {idx+1}: {e}")
 
-            tasks.append(gen_one(segments[i]['index'], text, out_path))
+def find_raw_file(work_dir, idx):
+    """Find raw TTS file (mp3 for edge-tts, wav for kokoro/voicebox), or None if missing"""
+    for ext in ('mp3', 'wav'):
+        path = os.path.join(work_dir, f"raw_{idx:04d}.{ext}")
+        if os.path.exists(path) and os.path.getsize(path) > 100:
+            return path
+    return None
 
-        if tasks:
-            await asyncio.gather(*tasks)
 
-        elapsed = time.time() - t0
-        pct = batch_end / total * 100
-        eta = elapsed / max(batch_end, 1) * (total - batch_end)
-        print(f"  TTS: {batch_end}/{total} ({pct:.0f}%) - elapsed {elapsed:.0f}s - ETA {eta:.0f}s")
+def write_silence(path, duration):
+    silence = np.zeros(max(int(duration * SAMPLE_RATE), SAMPLE_RATE // 10), dtype=np.float32)
+    sf.write(path, silence, SAMPLE_RATE)
 
 
-def generate_edge_tts(segments, work_dir, voice):
-    """Wrapper to run async edge-tts generation"""
-    asyncio.run(generate_edge_tts_all(segments, work_dir, voice))
+def ffmpeg_adjust(input_file, adjusted_path, target_dur):
+    """Speed-adjust one segment with an ffmpeg atempo chain (fallback engine)"""
+    # Actual duration from the file header (ffprobe only for formats other than WAV/MP3)
+    try:
+        actual_dur = media_probe.duration(input_file)
+    except (RuntimeError, OSError):
+        write_silence(adjusted_path, target_dur)
+        return
 
+    if target_dur <= 0.05:
+        # Very short segment, just convert without speed adjustment
+        subprocess.run(
+            ['ffmpeg', '-y', '-i', input_file, '-ar', str(SAMPLE_RATE), '-ac', '1', adjusted_path],
+            capture_output=True, text=True
+        )
+        return
+
+    ratio = clamp_ratio(actual_dur / target_dur)
+
+    # Build atempo filter chain (each atempo supports 0.5-2.0)
+    filters = []
+    r = ratio
+    while r > 2.0:
+        filters.append("atempo=2.0")
+        r /= 2.0
+    while r < 0.5:
+        filters.append("atempo=0.5")
+        r *= 2.0
+    filters.append(f"atempo={r:.6f}")
+    filter_str = ",".join(filters)
+
+    subprocess.run([
+        'ffmpeg', '-y', '-i', input_file,
+        '-filter:a', filter_str,
+        '-ar', str(SAMPLE_RATE), '-ac', '1',
+        adjusted_path
+    ], capture_output=True, text=True)
+
+
+def adjust_segment(seg, work_dir, engine='numpy'):
+    """Speed-adjust one segment's raw TTS file into adj_XXXX.wav.
+
+    Output is written to adj_XXXX.part.wav and renamed into place, so an
+    interrupted run never leaves a truncated adj_XXXX.wav for resume to skip.
+    """
+    target_dur = seg['duration']
+    idx = seg['index']
+    adjusted_path = os.path.join(work_dir, f"adj_{idx:04d}.wav")
+    partial_path = os.path.join(work_dir, f"adj_{idx:04d}.part.wav")
 
-def generate_kokoro_tts(segments, work_dir, voice='am_michael'):
-    """Generate all segments with Kokoro TTS in a single process"""
-    kokoro_py = os.path.expanduser("~/miniconda3/envs/kokoro/bin/python3")
-    total = len(segments)
+    if os.path.exists(adjusted_path) and os.path.getsize(adjusted_path) > 100:
+        return
 
-    # Build segment data for the kokoro script
-    seg_data = []
-    for seg in segments:
-        seg_data.append({
-            'index': seg['index'],
-            'text': seg['text'].strip() or '...',
-            'out_path': os.path.join(work_dir, f"raw_{seg['index']:04d}.wav")
-        })
-
-    # Determine lang_code from voice name
-    lang_code = 'a'  # American English default
-    if voice.startswith('z'):
-        lang_code = 'z'  # Chinese
-
-    seg_json = json.dumps(seg_data)
-    gen_script = f'''
-import time, json, os, warnings
-warnings.filterwarnings("ignore")
-start_all = time.time()
-
-from kokoro import KPipeline
-import numpy as np
-import soundfile as sf
+    input_file = find_raw_file(work_dir, idx)
+    with tracing.span('stretch', 'stretch', segment=idx, engine=engine) as span:
+        if input_file is None:
+            # Create silence for missing segments
+            write_silence(partial_path, target_dur)
+            span.set(engine='silence')
+        elif engine == 'numpy':
+            span.set(bytes=os.path.getsize(input_file))
+            try:
+                adjust_file(input_file, partial_path, target_dur, SAMPLE_RATE)
+            except (RuntimeError, sf.LibsndfileError):
+                # Undecodable by libsndfile, fall back to ffmpeg
+                span.set(engine='ffmpeg')
+                ffmpeg_adjust(input_file, partial_path, target_dur)
+        else:
+            span.set(bytes=os.path.getsize(input_file))
+            ffmpeg_adjust(input_file, partial_path, target_dur)
 
-pipe = KPipeline(lang_code="{lang_code}", repo_id="hexgrad/Kokoro-82M")
-segs = json.loads({repr(seg_json)})
-VOICE = "{voice}"
+    if os.path.exists(partial_path):
+        os.replace(partial_path, adjusted_path)
 
-for i, seg in enumerate(segs):
-    if os.path.exists(seg["out_path"]) and os.path.getsize(seg["out_path"]) > 100:
-        continue
-    t0 = time.time()
-    text = seg["text"]
-    generator = pipe(text, voice=VOICE, speed=1.0)
-    audio_chunks = []
-    for gs, ps, audio in generator:
-        audio_chunks.append(audio)
-    if audio_chunks:
-        full_audio = np.concatenate(audio_chunks)
-        sf.write(seg["out_path"], full_audio, 24000)
-    else:
-        audio = np.zeros(2400, dtype=np.float32)
-        sf.write(seg["out_path"], audio, 24000)
-    if (i+1) % 50 == 0 or i == len(segs)-1:
-        elapsed = time.time() - start_all
-        print(f"  Kokoro: {{i+1}}/{{len(segs)}} - {{elapsed:.0f}}s")
-
-print(f"Total Kokoro generation: {{time.time()-start_all:.1f}}s")
-'''
-
-    result = subprocess.run(
-        [kokoro_py, '-c', gen_script],
-        capture_output=True, text=True, timeout=600
-    )
-    print(result.stdout)
-    if result.returncode != 0:
-        errors = [l for l in result.stderr.split('\n') if 'Error' in l or 'error' in l.lower()]
-        if errors:
-            print("Errors:", '\n'.join(errors[:5]))
-
-
-def generate_voicebox_tts(segments, work_dir, voice_profile):
-    """Generate all segments with voicebox voice cloning"""
-    voicebox_script = os.path.expanduser("~/.claude/skills/voicebox/scripts/voicebox.py")
-    total = len(segments)
 
-    for i, seg in enumerate(segments):
-        out_path = os.path.join(work_dir, f"raw_{seg['index']:04d}.wav")
-        if os.path.exists(out_path) and os.path.getsize(out_path) > 100:
-            continue
+def raw_size(seg, work_dir):
+    input_file = find_raw_file(work_dir, seg['index'])
+    return os.path.getsize(input_file) if input_file else 0
 
-        text = seg['text'].strip()
-        if not text:
-            silence = np.zeros(int(0.1 * SAMPLE_RATE), dtype=np.float32)
-            sf.write(out_path, silence, SAMPLE_RATE)
-            continue
 
-        subprocess.run(
-            ['uv', 'run', voicebox_script, 'generate', voice_profile, text, '--quality', 'high'],
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-        tmp_out = '/tmp/voicebox_output.wav'
-        if os.path.exists(tmp_out):
-            import shutil
-            shutil.copy(tmp_out, out_path)
+def stretch_pool(jobs):
+    """Process pool for stretching. Workers come from a forkserver, not a fork of this
+    process: the pool starts while TTS and dispatch threads are running, and a forked
+    child could inherit a lock one of them holds (logging, libsndfile, tracing).
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
 
-        if (i+1) % 10 == 0 or i == total-1:
-            print(f"  Voicebox: {i+1}/{total}")
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context('forkserver'))
 
 
-# ============================================================
-# Speed Adjustment
-# ============================================================
+def speed_adjust_all(segments, work_dir, engine='numpy', jobs=1):
+    """Speed-adjust all segments to match SRT duration.
 
-def speed_adjust_all(segments, work_dir):
-    """Speed-adjust all segments to match SRT duration"""
+    engine: 'numpy' decodes once and time-stretches in-process (WSOLA),
+            falling back to ffmpeg per segment if the file can't be decoded;
+            'ffmpeg' uses ffmpeg atempo for every segment.
+    jobs:   worker processes; >1 spreads segments over a process pool,
+            largest raw files first so a long segment doesn't finish last.
+    """
     total = len(segments)
     t0 = time.time()
 
-    for i, seg in enumerate(segments):
-        target_dur = seg['duration']
-        idx = seg['index']
+    def report(done):
+        if done % 100 == 0 or done == total:
+            elapsed = time.time() - t0
+            print(f"  Adjusted: {done}/{total} ({done/total*100:.0f}%) - {elapsed:.0f}s")
 
-        # Find raw file (mp3 for edge-tts, wav for kokoro/voicebox)
-        raw_mp3 = os.path.join(work_dir, f"raw_{idx:04d}.mp3")
-        raw_wav = os.path.join(work_dir, f"raw_{idx:04d}.wav")
-        adjusted_path = os.path.join(work_dir, f"adj_{idx:04d}.wav")
+    if jobs <= 1:
+        for i, seg in enumerate(segments):
+            adjust_segment(seg, work_dir, engine)
+            report(i + 1)
+        return
 
-        if os.path.exists(adjusted_path) and os.path.getsize(adjusted_path) > 100:
-            continue
+    from concurrent.futures import as_completed
 
-        # Determine input file
-        if os.path.exists(raw_mp3) and os.path.getsize(raw_mp3) > 100:
-            input_file = raw_mp3
-        elif os.path.exists(raw_wav) and os.path.getsize(raw_wav) > 100:
-            input_file = raw_wav
+    pending = []
+    done = 0
+    for seg in segments:
+        adjusted_path = os.path.join(work_dir, f"adj_{seg['index']:04d}.wav")
+        if os.path.exists(adjusted_path) and os.path.getsize(adjusted_path) > 100:
+            done += 1
         else:
-            # Create silence for missing segments
-            silence = np.zeros(max(int(target_dur * SAMPLE_RATE), SAMPLE_RATE // 10), dtype=np.float32)
-            sf.write(adjusted_path, silence, SAMPLE_RATE)
-            continue
+            pending.append(seg)
+    if done:
+        print(f"  Resuming: {done}/{total} already adjusted")
+    if not pending:
+        report(total)
+        return
 
-        # Get actual duration
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', input_file],
-            capture_output=True, text=True
-        )
-        try:
-            actual_dur = float(result.stdout.strip())
-        except (ValueError, AttributeError):
-            silence = np.zeros(max(int(target_dur * SAMPLE_RATE), SAMPLE_RATE // 10), dtype=np.float32)
-            sf.write(adjusted_path, silence, SAMPLE_RATE)
-            continue
+    pending.sort(key=lambda seg: raw_size(seg, work_dir), reverse=True)
 
-        if target_dur <= 0.05:
-            # Very short segment, just convert without speed adjustment
-            subprocess.run(
-                ['ffmpeg', '-y', '-i', input_file, '-ar', str(SAMPLE_RATE), '-ac', '1', adjusted_path],
-                capture_output=True, text=True
-            )
-        else:
-            ratio = actual_dur / target_dur
-            if ratio < 0.5:
-                ratio = 0.5
-            elif ratio > 4.0:
-                ratio = 4.0
-
-            # Build atempo filter chain (each atempo supports 0.5-2.0)
-            filters = []
-            r = ratio
-            while r > 2.0:
-                filters.append("atempo=2.0")
-                r /= 2.0
-            while r < 0.5:
-                filters.append("atempo=0.5")
-                r *= 2.0
-            filters.append(f"atempo={r:.6f}")
-            filter_str = ",".join(filters)
-
-            subprocess.run([
-                'ffmpeg', '-y', '-i', input_file,
-                '-filter:a', filter_str,
-                '-ar', str(SAMPLE_RATE), '-ac', '1',
-                adjusted_path
-            ], capture_output=True, text=True)
-
-        if (i+1) % 100 == 0 or i == total-1:
-            elapsed = time.time() - t0
-            print(f"  Adjusted: {i+1}/{total} ({(i+1)/total*100:.0f}%) - {elapsed:.0f}s")
+    with stretch_pool(min(jobs, len(pending))) as pool:
+        futures = [pool.submit(adjust_segment, seg, work_dir, engine) for seg in pending]
+        for future in as_completed(futures):
+            future.result()
+            done += 1
+            report(done)
 
 
 # ============================================================
 # Numpy Timeline Assembly
 # ============================================================
 
+TIMELINE_BLOCK = 60 * SAMPLE_RATE  # samples per streaming block (60s, ~5.8MB float32)
+
+
+class Timeline:
+    """Sparse raw float32 file (work_dir/timeline.f32) that segments are placed into
+    with positioned writes, so only one segment or block is ever resident and
+    memory stays flat however long the media is.
+    """
+
+    def __init__(self, work_dir, segments):
+        self.total_samples = timeline_samples(segments)
+        self.itemsize = np.dtype(np.float32).itemsize
+        self.path = os.path.join(work_dir, 'timeline.f32')
+        self.file = open(self.path, 'w+b')
+        self.file.truncate(self.total_samples * self.itemsize)  # sparse, reads back as silence
+        self.spans = {}  # index -> [start_sample, samples], for incremental patching later
+        self.scale = 1.0
+
+    def place(self, audio, seg):
+        """Write mono float32 audio at the segment's start, clipped to the timeline end"""
+        start_sample, samples_to_write = placed_span(seg, len(audio), self.total_samples)
+        if samples_to_write > 0:
+            with tracing.span('place', 'timeline', segment=seg['index'], bytes=samples_to_write * self.itemsize):
+                self.file.seek(start_sample * self.itemsize)
+                self.file.write(np.ascontiguousarray(audio[:samples_to_write], dtype=np.float32).tobytes())
+            self.spans[seg['index']] = [start_sample, samples_to_write]
+
+    def blocks(self):
+        self.file.seek(0)
+        for _ in range(0, self.total_samples, TIMELINE_BLOCK):
+            yield np.fromfile(self.file, dtype=np.float32, count=TIMELINE_BLOCK)
+
+    def write_normalized(self, output_audio):
+        """Streaming peak pass, then normalize each block while streaming to output_audio"""
+        with tracing.span('normalize', 'timeline', bytes=self.total_samples * self.itemsize):
+            peak = 0.0
+            for block in self.blocks():
+                peak = max(peak, float(np.max(np.abs(block))))
+            self.scale = scale = 0.95 / peak if peak > 0 else 1.0
+
+            with sf.SoundFile(output_audio, 'w', SAMPLE_RATE, 1) as out:
+                for block in self.blocks():
+                    block *= scale
+                    out.write(block)
+        print(f"  Timeline: {self.total_samples / SAMPLE_RATE:.1f}s audio written to {output_audio}")
+
+    def state(self):
+        """What an incremental re-dub needs to patch output_audio in place"""
+        return {'total_samples': self.total_samples, 'scale': self.scale,
+                'spans': {str(idx): span for idx, span in self.spans.items()}}
+
+    def close(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def timeline_samples(segments):
+    """Timeline length: last segment end + 2s buffer"""
+    return int((segments.total_duration() + 2.0) * SAMPLE_RATE)
+
+
+def placed_span(seg, length, total_samples):
+    """(start_sample, samples) a segment's audio covers on the timeline"""
+    start_sample = int(seg['start'] * SAMPLE_RATE)
+    return start_sample, max(min(start_sample + length, total_samples) - start_sample, 0)
+
+
+def read_mono(path):
+    audio, _ = sf.read(path, dtype='float32')
+    return audio[:, 0] if audio.ndim > 1 else audio
+
+
 def build_numpy_timeline(segments, work_dir, output_audio):
     """Build full audio timeline using numpy array placement.
 
     This approach scales to 1500+ segments without hitting ffmpeg input limits.
-    Each adjusted WAV is placed at its exact SRT start position in a pre-allocated array.
+    Each adjusted WAV is placed at its exact SRT start position in a sparse
+    Timeline file; the peak is found in a streaming pass, then blocks are
+    normalized as they are streamed to output_audio.
+    Returns: the timeline state saved for incremental re-dubs
     """
     total = len(segments)
+    timeline = Timeline(work_dir, segments)
+    try:
+        for i, seg in enumerate(segments):
+            adjusted_path = os.path.join(work_dir, f"adj_{seg['index']:04d}.wav")
+            if os.path.exists(adjusted_path):
+                try:
+                    timeline.place(read_mono(adjusted_path), seg)
+                except Exception:
+                    pass
 
-    # Total duration from last segment end + 2s buffer
-    total_dur = segments[-1]['end'] + 2.0
-    total_samples = int(total_dur * SAMPLE_RATE)
-    timeline = np.zeros(total_samples, dtype=np.float32)
+            if (i+1) % 200 == 0 or i == total-1:
+                print(f"  Placed: {i+1}/{total}")
 
-    for i, seg in enumerate(segments):
-        idx = seg['index']
-        adjusted_path = os.path.join(work_dir, f"adj_{idx:04d}.wav")
+        timeline.write_normalized(output_audio)
+    finally:
+        timeline.close()
+    return timeline.state()
 
-        if not os.path.exists(adjusted_path):
-            continue
 
-        try:
-            audio, sr = sf.read(adjusted_path, dtype='float32')
-            if len(audio.shape) > 1:
-                audio = audio[:, 0]  # mono
+# ============================================================
+# Streaming Pipeline
+# ============================================================
+
+PIPELINES = ('staged', 'streaming')
+STREAM_DEPTH_PER_JOB = 4  # segments queued or stretching per worker before TTS is held back
+
+
+def stretch_segment(seg, work_dir, engine='numpy', audio=None):
+    """Speed-adjust one segment and return the adjusted samples (streaming mode).
+
+    audio is the raw TTS already decoded at SAMPLE_RATE when the engine produced it
+    in memory; otherwise the raw file is decoded here. adj_XXXX.wav is still written
+    so an interrupted run resumes, and an existing one is reused.
+    """
+    adjusted_path = os.path.join(work_dir, f"adj_{seg['index']:04d}.wav")
+    partial_path = os.path.join(work_dir, f"adj_{seg['index']:04d}.part.wav")
+    if os.path.exists(adjusted_path) and os.path.getsize(adjusted_path) > 100:
+        return read_mono(adjusted_path)
 
-            start_sample = int(seg['start'] * SAMPLE_RATE)
-            end_sample = min(start_sample + len(audio), total_samples)
-            samples_to_write = end_sample - start_sample
+    if engine == 'numpy':
+        try:
+            with tracing.span('stretch', 'stretch', segment=seg['index'], engine=engine,
+                              in_memory=audio is not None) as span:
+                if audio is not None:
+                    actual_dur = len(audio) / SAMPLE_RATE
+                else:
+                    input_file = find_raw_file(work_dir, seg['index'])
+                    if input_file is not None:
+                        span.set(bytes=os.path.getsize(input_file))
+                        audio, actual_dur = load_audio(input_file, SAMPLE_RATE)
+                if audio is not None:
+                    adjusted = stretch_to_duration(np.asarray(audio, dtype=np.float32), actual_dur, seg['duration'])
+                    sf.write(partial_path, adjusted, SAMPLE_RATE)
+                    os.replace(partial_path, adjusted_path)
+                    return adjusted
+        except (RuntimeError, sf.LibsndfileError):
+            pass  # undecodable, adjust_segment falls back to ffmpeg
+
+    # ffmpeg engine, decode fallback, or silence for a segment that failed to generate
+    adjust_segment(seg, work_dir, engine)
+    return read_mono(adjusted_path) if os.path.exists(adjusted_path) else None
+
+
+def sync_streaming(segments, work_dir, generate_all, output_audio, engine='numpy', jobs=1):
+    """Overlap TTS generation, speed adjustment and timeline placement.
+
+    generate_all(on_ready) runs in a producer thread and calls on_ready(seg, audio)
+    as each segment's raw audio lands. Segments go straight to a process pool for
+    stretching and their adjusted samples come back in memory to be placed on the
+    timeline. Bounded queues between the stages apply back-pressure, so wall time
+    approaches the slowest stage instead of the sum of all three.
+    Returns: (seconds until generation finished, timeline state)
+    """
+    import queue
+    import threading
 
-            if samples_to_write > 0:
-                timeline[start_sample:end_sample] = audio[:samples_to_write]
-        except Exception:
-            pass
+    total = len(segments)
+    depth = STREAM_DEPTH_PER_JOB * jobs
+    ready = queue.Queue(maxsize=depth)
+    stretched = queue.Queue()
+    slots = threading.BoundedSemaphore(depth)
+    t0 = time.time()
+    gen_done = []
 
-        if (i+1) % 200 == 0 or i == total-1:
-            print(f"  Placed: {i+1}/{total}")
+    def produce():
+        announced = set()
 
-    # Normalize
-    peak = np.max(np.abs(timeline))
-    if peak > 0:
-        timeline = timeline / peak * 0.95
+        def on_ready(seg, audio=None):
+            if seg['index'] not in announced:
+                announced.add(seg['index'])
+                ready.put((seg, audio))  # blocks while stretching is behind (edge-tts calls this off its event loop)
 
-    sf.write(output_audio, timeline, SAMPLE_RATE)
-    audio_dur = len(timeline) / SAMPLE_RATE
-    print(f"  Timeline: {audio_dur:.1f}s audio written to {output_audio}")
-    return output_audio
+        try:
+            generate_all(on_ready)
+        except Exception as e:
+            print(f"  TTS generation failed: {type(e).__name__}: {e}")
+        finally:
+            gen_done.append(time.time() - t0)
+            for seg in segments:
+                on_ready(seg)  # failed lines: stretch writes silence
+            ready.put(None)
+
+    with stretch_pool(jobs) as pool:
+        def dispatch():
+            while (item := ready.get()) is not None:
+                seg, audio = item
+                slots.acquire()  # at most `depth` segments stretching or waiting to be placed
+                future = pool.submit(stretch_segment, seg, work_dir, engine, audio)
+                future.add_done_callback(lambda f, seg=seg: stretched.put((seg, f)))
+
+        threading.Thread(target=produce, daemon=True).start()
+        threading.Thread(target=dispatch, daemon=True).start()
+
+        timeline = Timeline(work_dir, segments)
+        try:
+            for placed in range(1, total + 1):
+                seg, future = stretched.get()
+                slots.release()
+                try:
+                    audio = future.result()
+                    if audio is not None:
+                        timeline.place(audio, seg)
+                except Exception as e:
+                    print(f"  FAIL {seg['index']+1}: {type(e).__name__}: {e}")
+                if placed % 100 == 0 or placed == total:
+                    print(f"  Placed: {placed}/{total} - {time.time() - t0:.0f}s")
+            timeline.write_normalized(output_audio)
+        finally:
+            timeline.close()
+    return gen_done[0], timeline.state()
 
 
 # ============================================================
-# Voice Maps
+# Incremental Re-dub
 # ============================================================
 
-EDGE_VOICE_MAP = {
-    # Languages
-    'chinese': 'zh-CN-YunxiNeural', 'zh': 'zh-CN-YunxiNeural',
-    'spanish': 'es-ES-AlvaroNeural', 'es': 'es-ES-AlvaroNeural',
-    'french': 'fr-FR-HenriNeural', 'fr': 'fr-FR-HenriNeural',
-    'japanese': 'ja-JP-KeitaNeural', 'ja': 'ja-JP-KeitaNeural',
-    'german': 'de-DE-ConradNeural', 'de': 'de-DE-ConradNeural',
-    'italian': 'it-IT-DiegoNeural', 'it': 'it-IT-DiegoNeural',
-    'portuguese': 'pt-BR-AntonioNeural', 'pt': 'pt-BR-AntonioNeural',
-    'korean': 'ko-KR-InJoonNeural', 'ko': 'ko-KR-InJoonNeural',
-    'russian': 'ru-RU-DmitryNeural', 'ru': 'ru-RU-DmitryNeural',
-    'arabic': 'ar-SA-HamedNeural', 'ar': 'ar-SA-HamedNeural',
-    'hindi': 'hi-IN-MadhurNeural', 'hi': 'hi-IN-MadhurNeural',
-    'turkish': 'tr-TR-AhmetNeural', 'tr': 'tr-TR-AhmetNeural',
-    'english': 'en-US-BrianNeural', 'en': 'en-US-BrianNeural',
-}
+STATE_FILE = 'sync_state.json'
+
+
+def load_json(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_json(path, obj):
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+
+def remove_segment_files(work_dir, idx, raw=True):
+    names = [f"adj_{idx:04d}.wav"] + ([f"raw_{idx:04d}.mp3", f"raw_{idx:04d}.wav"] if raw else [])
+    for name in names:
+        path = os.path.join(work_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def segment_meta(seg):
+    """What a segment's raw (text) and adjusted (text + timing) files were made for"""
+    return {'text': hashlib.sha1(seg['text'].encode('utf-8')).hexdigest(),
+            'start': seg['start'], 'end': seg['end']}
+
+
+def same_timing(a, b):
+    return abs(a['start'] - b['start']) <= 1e-6 and abs(a['end'] - b['end']) <= 1e-6
+
+
+def meta_path(work_dir, idx):
+    return os.path.join(work_dir, f"seg_{idx:04d}.json")
+
+
+def read_slots(work_dir):
+    """{index: meta} from the per-segment seg_XXXX.json files"""
+    slots = {}
+    for name in os.listdir(work_dir):
+        if name.startswith('seg_') and name.endswith('.json'):
+            meta = load_json(os.path.join(work_dir, name))
+            if meta is not None:
+                slots[int(name[4:-5])] = meta
+    return slots
+
+
+def prepare_work_dir(segments, work_dir, settings):
+    """Match the SRT against the previous run's segments in work_dir, by content.
+
+    Every segment slot has a seg_XXXX.json recording the text (hash) and timing its
+    raw_/adj_ files were made for. It is rewritten before the slot gets new content
+    and after stale files are removed, so a killed run never leaves a file that
+    doesn't match its record. Old and new cues are aligned on their text with
+    difflib, so inserting, deleting, splitting or merging a line only touches the
+    lines around it: matched cues keep (or are renamed to) their files, cues with new
+    text are synthesized again, and cues whose timing moved are only stretched again.
+    Files from a run with other engine/voice settings are all discarded.
+    Returns: (changed indices, previous timeline state with its spans re-keyed to the
+    new indices and the regions of removed audio under 'stale'), or (None, None) when
+    there is no finished run to patch and the timeline must be built in full.
+    """
+    state = load_json(os.path.join(work_dir, STATE_FILE)) or {}
+    previous = load_json(os.path.join(work_dir, 'segments.json'))
+    timeline = state.get('timeline')
+
+    # Until this run finishes, combined.wav no longer matches segments.json
+    save_json(os.path.join(work_dir, STATE_FILE), {'settings': settings, 'timeline': None})
+    staging = os.path.join(work_dir, 'moving')
+    shutil.rmtree(staging, ignore_errors=True)  # left by a killed run; those lines are redone
+
+    if state.get('settings') != settings:
+        for name in os.listdir(work_dir):
+            if name.startswith(('raw_', 'adj_', 'seg_')):
+                os.remove(os.path.join(work_dir, name))
+        timeline = None
+    slots = read_slots(work_dir)
+    if not slots and previous is not None:
+        # Work dir from before the per-segment records: trust segments.json
+        for record in previous:
+            save_json(meta_path(work_dir, record['index']), segment_meta(record))
+        slots = read_slots(work_dir)
+
+    wanted = {seg['index']: segment_meta(seg) for seg in segments}
+    old_order = sorted(slots)
+    new_order = sorted(wanted)
+    matcher = difflib.SequenceMatcher(None, [slots[i]['text'] for i in old_order],
+                                      [wanted[j]['text'] for j in new_order], autojunk=False)
+    source = {}  # new index -> old index with the same text
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            for k in range(i2 - i1):
+                source[new_order[j1 + k]] = old_order[i1 + k]
+
+    # Reused files that change slot wait in staging until their new slot is cleared
+    os.makedirs(staging)
+    for j, i in source.items():
+        if i == j:
+            continue
+        keep_adjusted = same_timing(slots[i], wanted[j])
+        for name in os.listdir(work_dir):
+            stem, ext = os.path.splitext(name)
+            if stem in (f"raw_{i:04d}", f"adj_{i:04d}") and (stem.startswith('raw_') or keep_adjusted):
+                os.makedirs(os.path.join(staging, str(j)), exist_ok=True)
+                os.rename(os.path.join(work_dir, name), os.path.join(staging, str(j), f"{stem[:4]}{j:04d}{ext}"))
+
+    old_spans = {int(idx): span for idx, span in (timeline or {}).get('spans', {}).items()}
+    spans = {}
+    stale = [span for i, span in old_spans.items() if i not in source.values()]
+    changed = []
+    for idx in sorted(set(slots) | set(wanted)):
+        want = wanted.get(idx)
+        src = source.get(idx)
+        if src is not None and src == idx:
+            if not same_timing(slots[idx], want):
+                remove_segment_files(work_dir, idx, raw=False)
+                save_json(meta_path(work_dir, idx), want)
+        else:
+            remove_segment_files(work_dir, idx)
+            if want is None:  # slot past the end of the new SRT
+                if os.path.exists(meta_path(work_dir, idx)):
+                    os.remove(meta_path(work_dir, idx))
+                continue
+            if slots.get(idx) != want:
+                save_json(meta_path(work_dir, idx), want)
+            moved = os.path.join(staging, str(idx))
+            if os.path.isdir(moved):
+                for name in os.listdir(moved):
+                    os.rename(os.path.join(moved, name), os.path.join(work_dir, name))
+                os.rmdir(moved)
+        if src is not None and src in old_spans:
+            if same_timing(slots[src], want):
+                spans[idx] = old_spans[src]  # same audio at the same place
+                continue
+            stale.append(old_spans[src])
+        changed.append(idx)
+    os.rmdir(staging)
+
+    if timeline is None or previous is None or not os.path.exists(os.path.join(work_dir, 'combined.wav')):
+        return None, None
+    return changed, dict(timeline, spans=spans, stale=stale)
+
+
+def patch_timeline(segments, changed, work_dir, output_audio, timeline):
+    """Re-render only the regions of output_audio covered by changed segments, old or new.
+
+    Each region is rebuilt from the adjusted files of every segment overlapping it,
+    in order, and written in place at the previous run's normalization scale.
+    Returns: the updated timeline state, or None if the timeline length changed or a
+    patched region would clip (the caller then rebuilds the whole timeline).
+    """
+    total_samples = timeline_samples(segments)
+    if total_samples != timeline['total_samples']:
+        return None
+    spans = {int(idx): span for idx, span in timeline['spans'].items()}
+    by_index = {seg['index']: seg for seg in segments}
+
+    regions = [list(span) for span in timeline.get('stale', [])]  # audio of removed or moved lines
+    for idx in changed:
+        if idx in spans:
+            regions.append(spans.pop(idx))
+        adjusted_path = os.path.join(work_dir, f"adj_{idx:04d}.wav")
+        if idx in by_index and os.path.exists(adjusted_path):
+            span = placed_span(by_index[idx], sf.info(adjusted_path).frames, total_samples)
+            if span[1] > 0:
+                spans[idx] = list(span)
+                regions.append(spans[idx])
+
+    merged = []
+    for start, length in sorted(regions):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], start + length)
+        else:
+            merged.append([start, start + length])
+
+    patches = []
+    for a, b in merged:
+        buf = np.zeros(b - a, dtype=np.float32)
+        for seg in segments:
+            span = spans.get(seg['index'])
+            if span is None or span[0] >= b or span[0] + span[1] <= a:
+                continue
+            audio = read_mono(os.path.join(work_dir, f"adj_{seg['index']:04d}.wav"))
+            lo, hi = max(span[0], a), min(span[0] + span[1], b)
+            buf[lo - a:hi - a] = audio[lo - span[0]:hi - span[0]]
+        buf *= timeline['scale']
+        if len(buf) and np.max(np.abs(buf)) > 1.0:
+            return None
+        patches.append((a, buf))
+
+    with sf.SoundFile(output_audio, 'r+') as out:
+        for a, buf in patches:
+            out.seek(a)
+            out.write(buf)
+    print(f"  Patched {len(patches)} region(s), {sum(len(buf) for _, buf in patches) / SAMPLE_RATE:.1f}s "
+          f"of {total_samples / SAMPLE_RATE:.1f}s audio")
+    return {'total_samples': total_samples, 'scale': timeline['scale'],
+            'spans': {str(idx): span for idx, span in spans.items()}}
 
 
 # ============================================================
@@ -357,22 +695,62 @@ EDGE_VOICE_MAP = {
 # ============================================================
 
 def main():
-    if len(sys.argv) < 5:
-        print("Usage: sync_tts.py <srt_file> <work_dir> <tts_engine> <target_lang> [voice_profile] [voice_name]")
-        print("  tts_engine: edge-tts, kokoro, or voicebox")
+    args = sys.argv[1:]
+    tracing.setup(args)
+    stretch_engine = pop_option(args, '--stretch-engine', 'numpy')
+    jobs = pop_option(args, '--jobs', str(os.cpu_count() or 1))
+    tts_cache_dir = pop_option(args, '--tts-cache')
+    tts_cache_mb = pop_option(args, '--tts-cache-mb')
+    tts_concurrency = pop_option(args, '--tts-concurrency')
+    # Engine-specific flags, as declared by each registered engine
+    engine_concurrency = {}
+    engine_options = {name: {} for name in ENGINES}
+    for name, cls in ENGINES.items():
+        if cls.concurrency_option:
+            engine_concurrency[name] = pop_option(args, cls.concurrency_option)
+        for flag, (option, kind, default) in cls.cli_options.items():
+            value = pop_option(args, flag)
+            engine_options[name][option] = default if value is None else kind(value)
+    pipeline = pop_option(args, '--pipeline', 'staged')
+
+    concurrency_values = [jobs, tts_concurrency] + list(engine_concurrency.values())
+    if (len(args) < 4 or args[2] not in ENGINES or stretch_engine not in STRETCH_ENGINES or pipeline not in PIPELINES
+            or not all(v.isdigit() for v in concurrency_values if v is not None)):
+        print("Usage: sync_tts.py <srt_file> <work_dir> <tts_engine> <target_lang> [voice_profile] [voice_name] [options]")
+        print(f"  tts_engine: {', '.join(ENGINES)}")
         print("  voice_profile: voicebox profile name (required for voicebox)")
         print("  voice_name: specific voice ID override (e.g. en-US-BrianNeural, am_michael)")
+        print("Options:")
+        print("  --stretch-engine numpy|ffmpeg: in-process WSOLA (default) or ffmpeg atempo")
+        print("  --jobs N: speed-adjustment worker processes (default: all cores, 1 = serial)")
+        print("  --tts-cache DIR|off: cross-run TTS cache (default $TTS_CACHE_DIR or ~/.cache/video-processor/tts)")
+        print("  --tts-cache-mb N: cache size cap, least recently used entries evicted (default 2048)")
+        print("  --kokoro-workers N: shard Kokoro synthesis over N CPU worker processes (default 1)")
+        print("  --kokoro-batch-chars N: join short lines into one Kokoro call up to N chars (default 0 = off)")
+        print("  --voicebox-jobs N: concurrent warm voicebox sessions (default 1)")
+        print("  --edge-concurrency N: initial edge-tts requests in flight, adapts up to 4x (default 10)")
+        print("  --synthetic-concurrency N, --synthetic-latency S, --synthetic-warmup S: offline test engine")
+        print("  --tts-concurrency N: requested concurrency for any engine (capped by its capabilities)")
+        print("  --pipeline staged|streaming: run the three steps one after another (default), or overlap")
+        print("      them so each segment is stretched and placed as soon as its TTS arrives")
+        print("  --trace FILE: record per-segment spans, export a Chrome trace and print a summary")
         sys.exit(1)
 
-    srt_file = sys.argv[1]
-    work_dir = sys.argv[2]
-    tts_engine = sys.argv[3]
-    target_lang = sys.argv[4]
-    voice_profile = sys.argv[5] if len(sys.argv) > 5 else None
-    voice_name = sys.argv[6] if len(sys.argv) > 6 else None
-
-    if tts_engine == 'voicebox' and not voice_profile:
-        print("Error: voicebox engine requires voice_profile parameter")
+    srt_file = args[0]
+    work_dir = args[1]
+    tts_engine = args[2]
+    target_lang = args[3]
+    voice_profile = args[4] if len(args) > 4 else None
+    voice_name = args[5] if len(args) > 5 else None
+    if voice_profile == 'none':
+        voice_profile = None
+    jobs = max(int(jobs), 1)
+    requested = tts_concurrency or engine_concurrency.get(tts_engine)
+    requested = max(int(requested), 1) if requested else None
+
+    engine = create_engine(tts_engine, voice_name, voice_profile, target_lang, **engine_options[tts_engine])
+    if engine.needs_profile and not voice_profile:
+        print(f"Error: {tts_engine} engine requires voice_profile parameter")
         sys.exit(1)
 
     os.makedirs(work_dir, exist_ok=True)
@@ -382,7 +760,7 @@ def main():
 
     # Parse SRT
     print("Parsing subtitles...")
-    segments = parse_srt(srt_file)
+    segments = read_srt(srt_file)
     total = len(segments)
     print(f"Found {total} segments\n")
 
@@ -390,59 +768,86 @@ def main():
     print(f"=== Step 1: TTS Generation ({tts_engine}) ===")
     t1 = time.time()
 
-    if tts_engine == 'edge-tts':
-        voice = voice_name or EDGE_VOICE_MAP.get(target_lang, 'en-US-BrianNeural')
-        print(f"Voice: {voice}")
-        generate_edge_tts(segments, work_dir, voice)
-    elif tts_engine == 'kokoro':
-        voice = voice_name or 'am_michael'
-        print(f"Voice: {voice}")
-        generate_kokoro_tts(segments, work_dir, voice)
-    elif tts_engine == 'voicebox':
+    if engine.voice:
+        print(f"Voice: {engine.voice}")
+    if voice_profile:
         print(f"Voice profile: {voice_profile}")
-        generate_voicebox_tts(segments, work_dir, voice_profile)
 
-    gen_time = time.time() - t1
-    print(f"TTS generation: {gen_time:.1f}s ({gen_time/60:.1f} min)\n")
-
-    # Verify generated files
-    missing = []
-    for seg in segments:
-        idx = seg['index']
-        mp3 = os.path.join(work_dir, f"raw_{idx:04d}.mp3")
-        wav = os.path.join(work_dir, f"raw_{idx:04d}.wav")
-        has_mp3 = os.path.exists(mp3) and os.path.getsize(mp3) > 100
-        has_wav = os.path.exists(wav) and os.path.getsize(wav) > 100
-        if not has_mp3 and not has_wav:
-            missing.append(idx + 1)
-    if missing:
-        print(f"WARNING: {len(missing)} missing segments: {missing[:10]}...")
-
-    # Step 2: Speed adjustment
-    print(f"\n=== Step 2: Speed Adjustment ===")
-    t2 = time.time()
-    speed_adjust_all(segments, work_dir)
-    adj_time = time.time() - t2
-    print(f"Speed adjustment: {adj_time:.1f}s\n")
-
-    # Step 3: Build numpy timeline
-    print(f"=== Step 3: Building Audio Timeline ===")
-    t3 = time.time()
-    build_numpy_timeline(segments, work_dir, output_audio)
-    build_time = time.time() - t3
-    print(f"Timeline built: {build_time:.1f}s\n")
-
-    total_time = time.time() - t_global
-    print(f"=== Sync Complete ===")
-    print(f"  TTS generation:    {gen_time:.1f}s ({gen_time/60:.1f} min)")
-    print(f"  Speed adjustment:  {adj_time:.1f}s")
-    print(f"  Timeline building: {build_time:.1f}s")
-    print(f"  TOTAL:             {total_time:.1f}s ({total_time/60:.1f} min)")
-    print(f"  Output: {output_audio}")
-
-    # Save segments info
-    with open(os.path.join(work_dir, 'segments.json'), 'w') as f:
-        json.dump(segments, f, ensure_ascii=False)
+    cache = None if tts_cache_dir == 'off' else TTSCache(tts_cache_dir, tts_cache_mb)
+
+    settings = {'engine': tts_engine, 'voice': engine.voice, 'voice_profile': voice_profile,
+                'stretch_engine': stretch_engine}
+    changed, previous = prepare_work_dir(segments, work_dir, settings)
+    timeline = None
+
+    if previous is not None:
+        # Incremental re-dub: only edited lines are synthesized and stretched again
+        print(f"Incremental: {len(changed)} of {total} segments changed since the last run")
+        with tracing.span('tts', 'stage', engine=tts_engine):
+            generate_tts_cached(segments, work_dir, engine, cache, requested=requested)
+        with tracing.span('speed_adjust', 'stage'):
+            speed_adjust_all(segments, work_dir, stretch_engine, jobs)
+        with tracing.span('timeline', 'stage', changed=len(changed)):
+            timeline = patch_timeline(segments, changed, work_dir, output_audio, previous)
+            if timeline is None:
+                print("  Timeline length or level changed, rebuilding it from the adjusted segments")
+                timeline = build_numpy_timeline(segments, work_dir, output_audio)
+        total_time = time.time() - t_global
+        print(f"\n=== Sync Complete (incremental) ===")
+        print(f"  TOTAL:             {total_time:.1f}s")
+        print(f"  Output: {output_audio}")
+    elif pipeline == 'streaming':
+        print(f"Streaming: TTS -> speed adjustment ({stretch_engine}, {jobs} jobs) -> timeline, overlapped")
+        with tracing.span('sync_streaming', 'stage', engine=tts_engine):
+            gen_time, timeline = sync_streaming(
+                segments, work_dir,
+                lambda on_ready: generate_tts_cached(segments, work_dir, engine, cache, on_ready, requested),
+                output_audio, stretch_engine, jobs)
+        total_time = time.time() - t_global
+        print(f"\n=== Sync Complete ===")
+        print(f"  TTS generation:    {gen_time:.1f}s ({gen_time/60:.1f} min, overlapped)")
+        print(f"  Stretch + place:   {total_time - gen_time:.1f}s after generation finished")
+        print(f"  TOTAL:             {total_time:.1f}s ({total_time/60:.1f} min)")
+        print(f"  Output: {output_audio}")
+    else:
+        with tracing.span('tts', 'stage', engine=tts_engine):
+            generate_tts_cached(segments, work_dir, engine, cache, requested=requested)
+
+        gen_time = time.time() - t1
+        print(f"TTS generation: {gen_time:.1f}s ({gen_time/60:.1f} min)\n")
+
+        # Verify generated files
+        missing = [seg['index'] + 1 for seg in segments if not find_raw_file(work_dir, seg['index'])]
+        if missing:
+            print(f"WARNING: {len(missing)} missing segments: {missing[:10]}...")
+
+        # Step 2: Speed adjustment
+        print(f"\n=== Step 2: Speed Adjustment ({stretch_engine}, {jobs} jobs) ===")
+        t2 = time.time()
+        with tracing.span('speed_adjust', 'stage'):
+            speed_adjust_all(segments, work_dir, stretch_engine, jobs)
+        adj_time = time.time() - t2
+        print(f"Speed adjustment: {adj_time:.1f}s\n")
+
+        # Step 3: Build numpy timeline
+        print(f"=== Step 3: Building Audio Timeline ===")
+        t3 = time.time()
+        with tracing.span('timeline', 'stage'):
+            timeline = build_numpy_timeline(segments, work_dir, output_audio)
+        build_time = time.time() - t3
+        print(f"Timeline built: {build_time:.1f}s\n")
+
+        total_time = time.time() - t_global
+        print(f"=== Sync Complete ===")
+        print(f"  TTS generation:    {gen_time:.1f}s ({gen_time/60:.1f} min)")
+        print(f"  Speed adjustment:  {adj_time:.1f}s")
+        print(f"  Timeline building: {build_time:.1f}s")
+        print(f"  TOTAL:             {total_time:.1f}s ({total_time/60:.1f} min)")
+        print(f"  Output: {output_audio}")
+
+    # Save segments info and the timeline layout for the next (incremental) run
+    save_json(os.path.join(work_dir, 'segments.json'), segments.to_records())
+    save_json(os.path.join(work_dir, STATE_FILE), {'settings': settings, 'timeline': timeline})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+In-process time-stretch engine for TTS segments.
+Decodes each file once with soundfile, takes the duration from the sample count,
+and time-stretches in numpy with WSOLA (waveform-similarity overlap-add).
+
+Replaces the per-segment ffprobe + ffmpeg atempo pair in sync_tts.speed_adjust_all.
+Output is always SAMPLE_RATE mono float32.
+"""
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 24000
+
+# Same clamp as the ffmpeg atempo chain
+MIN_RATIO = 0.5
+MAX_RATIO = 4.0
+
+# WSOLA parameters (at SAMPLE_RATE): 40ms frames, 50% overlap, +/-10ms search
+FRAME = 960
+HOP_OUT = FRAME // 2
+TOLERANCE = 240
+
+
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """Decode an audio file to mono float32 at sample_rate.
+    Returns: (audio, duration_seconds) where duration is taken from the source sample count
+    """
+    audio, sr = sf.read(path, dtype='float32', always_2d=True)
+    audio = audio.mean(axis=1) if audio.shape[1] > 1 else audio[:, 0]
+    duration = len(audio) / sr
+    if sr != sample_rate:
+        audio = resample(audio, sr, sample_rate)
+    return audio, duration
+
+
+def resample(audio, sr_in, sr_out):
+    """Linear-interpolation resampler (TTS output is band-limited speech, so this is sufficient)"""
+    if sr_in == sr_out or len(audio) == 0:
+        return audio
+    n_out = int(round(len(audio) * sr_out / sr_in))
+    positions = np.arange(n_out, dtype=np.float64) * (sr_in / sr_out)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def clamp_ratio(ratio):
+    return min(max(ratio, MIN_RATIO), MAX_RATIO)
+
+
+def wsola(audio, ratio, frame=FRAME, hop_out=HOP_OUT, tolerance=TOLERANCE):
+    """Time-stretch audio by ratio (>1 = faster/shorter) without changing pitch.
+
+    Each output frame is taken from near its nominal input position, shifted by up to
+    +/-tolerance samples to best match the natural continuation of the previous frame.
+    Cross-correlation is done in the frequency domain.
+    """
+    audio = np.asarray(audio, dtype=np.float32)
+    out_len = int(round(len(audio) / ratio))
+    if out_len == 0 or len(audio) == 0:
+        return np.zeros(out_len, dtype=np.float32)
+    if len(audio) < frame:
+        # Too short to overlap-add; plain resample of the time axis
+        positions = np.linspace(0, len(audio) - 1, out_len)
+        return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+    hop_in = hop_out * ratio
+    window = np.hanning(frame + 1)[:frame].astype(np.float32)  # periodic Hann: sums to 1 at 50% overlap
+    n_frames = out_len // hop_out + 2
+
+    # Pad so every search region and continuation template stays in bounds
+    pad = tolerance + frame
+    padded = np.concatenate([
+        np.zeros(pad, dtype=np.float32),
+        audio,
+        np.zeros(int(n_frames * hop_in) + 2 * pad, dtype=np.float32),
+    ])
+
+    region_len = frame + 2 * tolerance
+    nfft = 1 << (region_len - 1).bit_length()
+    n_lags = 2 * tolerance + 1
+
+    out = np.zeros(n_frames * hop_out + frame, dtype=np.float32)
+    norm = np.zeros_like(out)
+
+    prev = pad
+    for k in range(n_frames):
+        nominal = pad + int(k * hop_in) - frame // 2
+        if k == 0:
+            pos = nominal
+        else:
+            template = padded[prev + hop_out:prev + hop_out + frame]
+            region = padded[nominal - tolerance:nominal - tolerance + region_len]
+            corr = np.fft.irfft(np.fft.rfft(region, nfft) * np.conj(np.fft.rfft(template, nfft)), nfft)
+            pos = nominal - tolerance + int(np.argmax(corr[:n_lags]))
+
+        o = k * hop_out
+        out[o:o + frame] += padded[pos:pos + frame] * window
+        norm[o:o + frame] += window
+        prev = pos
+
+    # Frames are centred on k * hop_in, so the first half frame is ramp-up before input sample 0
+    start = frame // 2
+    out = out[start:start + out_len]
+    norm = norm[start:start + out_len]
+    return out / np.maximum(norm, 1e-3)
+
+
+def stretch_to_duration(audio, actual_dur, target_dur):
+    """Stretch decoded audio so it plays in target_dur (ratio clamped to 0.5-4.0)"""
+    if target_dur <= 0.05:
+        # Very short segment, no speed adjustment
+        return audio
+    return wsola(audio, clamp_ratio(actual_dur / target_dur))
+
+
+def adjust_file(input_file, output_file, target_dur, sample_rate=SAMPLE_RATE):
+    """Decode, stretch and write one segment as sample_rate mono WAV.
+    Returns: number of samples written
+    """
+    audio, actual_dur = load_audio(input_file, sample_rate)
+    adjusted = stretch_to_duration(audio, actual_dur, target_dur)
+    sf.write(output_file, adjusted, sample_rate)
+    return len(adjusted)
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Tracing - Per-unit-of-work spans with Chrome-trace export and a summary table
+Every transcription chunk, translation request, TTS call, stretch, placement and mux
+can be wrapped in a span that records its duration plus bytes, retries and cache hits.
+
+Tracing is off unless $TRACE_FILE is set (or a script is run with --trace FILE).
+Each process, including worker processes, appends its spans as JSON lines to
+<TRACE_FILE>.d/<pid>.jsonl, so all the scripts of one dub (video_dubber.py, sync_tts.py,
+finalize_mux.py) share a trace. export() merges them into TRACE_FILE in Chrome trace
+event format (open in chrome://tracing or https://ui.perfetto.dev) and prints a
+summary table of where the time went.
+
+A script that starts a run (video_dubber.py, video_summary.py) clears spans left in
+<TRACE_FILE>.d by earlier runs, unless a parent process started with --trace owns the
+trace ($TRACE_OWNER), so an exported $TRACE_FILE only holds the current run.
+
+Usage: tracing.py summary <trace_file>   (table for an exported or in-progress trace)
+       tracing.py export <trace_file>    (merge the span files and print the table)
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+COUNTERS = ('bytes', 'retries', 'cache_hits')
+
+_path = None
+_sink = None
+_sink_pid = None
+_lock = threading.Lock()
+
+
+def _reset_lock():
+    # A worker forked while another thread was writing a span would inherit _lock held
+    global _lock
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+def enable(path):
+    """Trace this process to path; worker processes inherit it through $TRACE_FILE"""
+    global _path
+    _path = os.path.abspath(path)
+    os.environ['TRACE_FILE'] = _path
+    os.environ['TRACE_OWNER'] = str(os.getpid())
+
+
+def enabled():
+    return _path is not None
+
+
+def _write(event):
+    global _sink, _sink_pid
+    line = json.dumps(event, ensure_ascii=False) + '\n'
+    with _lock:
+        pid = os.getpid()
+        if _sink_pid != pid:  # first span in this process, or a forked worker
+            os.makedirs(_path + '.d', exist_ok=True)
+            _sink = open(os.path.join(_path + '.d', f"{pid}.jsonl"), 'a', encoding='utf-8', buffering=1)
+            _sink_pid = pid
+            _sink.write(json.dumps({'name': 'process_name', 'ph': 'M', 'pid': pid,
+                                    'args': {'name': f"{os.path.basename(sys.argv[0])} ({pid})"}}) + '\n')
+        _sink.write(line)
+
+
+def record(name, cat, start, seconds, **attrs):
+    """Record a finished span: start is time.time() at its start, seconds its duration"""
+    if _path is None:
+        return
+    _write({'name': name, 'cat': cat, 'ph': 'X', 'ts': int(start * 1e6), 'dur': int(seconds * 1e6),
+            'pid': os.getpid(), 'tid': threading.get_native_id(), 'args': attrs})
+
+
+class Span:
+    """A span in progress: set(key=value) adds attributes, add(key, n) bumps a counter"""
+    __slots__ = ('name', 'cat', 'attrs', 'start', 't0')
+
+    def __init__(self, name, cat, attrs):
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add(self, key, n=1):
+        self.attrs[key] = self.attrs.get(key, 0) + n
+
+    def __enter__(self):
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        record(self.name, self.cat, self.start, time.perf_counter() - self.t0, **self.attrs)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+    def add(self, key, n=1):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+def span(name, cat='', **attrs):
+    """Context manager timing one unit of work; a shared no-op when tracing is off"""
+    if _path is None:
+        return NULL_SPAN
+    return Span(name, cat, attrs)
+
+
+# ============================================================
+# Export
+# ============================================================
+
+def load_events(path):
+    """Span events of a trace: the span files if present, else the exported trace file"""
+    span_dir = path + '.d'
+    events = []
+    if os.path.isdir(span_dir):
+        for name in sorted(os.listdir(span_dir)):
+            if not name.endswith('.jsonl'):
+                continue
+            with open(os.path.join(span_dir, name), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        pass  # a line cut short by a killed worker
+    elif os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            events = json.load(f).get('traceEvents', [])
+    return events
+
+
+def export(path=None, quiet=False):
+    """Merge every process's spans into path (Chrome trace JSON) and print the summary"""
+    path = path or _path
+    if path is None:
+        return None
+    if _sink is not None and _sink_pid == os.getpid():
+        _sink.flush()
+    events = load_events(path)
+    events.sort(key=lambda e: (e.get('ph') != 'M', e.get('ts', 0)))
+    with open(path + '.part', 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+    os.replace(path + '.part', path)
+    if not quiet:
+        print_summary(events)
+        print(f"  Trace: {path} ({sum(e.get('ph') == 'X' for e in events)} spans)")
+    return events
+
+
+def summarize(events):
+    """Per (category, name): count, total/mean/p95/max seconds and counter totals"""
+    groups = {}
+    for e in events:
+        if e.get('ph') == 'X':
+            groups.setdefault((e.get('cat', ''), e['name']), []).append(e)
+    rows = []
+    for (cat, name), group in groups.items():
+        durations = sorted(e['dur'] / 1e6 for e in group)
+        row = {'cat': cat, 'name': name, 'count': len(group), 'total': sum(durations),
+               'mean': sum(durations) / len(durations), 'max': durations[-1],
+               'p95': durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+               'errors': sum('error' in e.get('args', {}) for e in group)}
+        for key in COUNTERS:
+            row[key] = sum(e.get('args', {}).get(key, 0) or 0 for e in group)
+        rows.append(row)
+    rows.sort(key=lambda r: (r['cat'] != 'stage', -r['total']))
+    return rows
+
+
+def print_summary(events):
+    rows = summarize(events)
+    if not rows:
+        return
+    print(f"\n=== Trace Summary ===")
+    print(f"  {'span':<32} {'count':>7} {'total':>9} {'mean':>8} {'p95':>8} {'max':>8} "
+          f"{'MB':>8} {'retries':>7} {'hits':>6} {'errors':>6}")
+    for r in rows:
+        label = f"{r['cat']}/{r['name']}" if r['cat'] else r['name']
+        print(f"  {label:<32} {r['count']:>7} {r['total']:>8.2f}s {r['mean']:>7.3f}s {r['p95']:>7.3f}s "
+              f"{r['max']:>7.2f}s {r['bytes'] / 1e6:>8.1f} {r['retries']:>7} {r['cache_hits']:>6} {r['errors']:>6}")
+
+
+def setup(args, starts_run=False):
+    """Entry-point scripts: pop --trace FILE from args and enable tracing.
+    --trace starts a fresh trace that is exported when the script exits; with only
+    $TRACE_FILE set (a surrounding pipeline owns the trace) spans are added to it
+    and it is merged quietly. starts_run: this script begins a pipeline run, so
+    spans of earlier runs are cleared unless a parent process owns the trace.
+    """
+    import shutil
+    from cli_helper import pop_option
+
+    path = pop_option(args, '--trace')
+    if path:
+        shutil.rmtree(os.path.abspath(path) + '.d', ignore_errors=True)
+        enable(path)
+        atexit.register(export)
+    elif _path is not None:
+        if starts_run and not os.environ.get('TRACE_OWNER'):
+            shutil.rmtree(_path + '.d', ignore_errors=True)
+            os.environ['TRACE_OWNER'] = str(os.getpid())
+        atexit.register(export, quiet=True)
+
+
+if os.environ.get('TRACE_FILE'):
+    _path = os.path.abspath(os.environ['TRACE_FILE'])  # also how worker processes pick it up
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] in ('summary', 'export'):
+        if sys.argv[1] == 'export':
+            export(sys.argv[2])
+        else:
+            print_summary(load_events(sys.argv[2]))
+    else:
+        print("Usage: tracing.py summary|export <trace_file>")
+        sys.exit(1)
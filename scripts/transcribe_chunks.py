@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Chunked transcription front end for long inputs.
+1. Stream-decode only the audio track to 16 kHz mono PCM on disk (ffmpeg pipe, bounded memory)
+2. Split on silence into chunks below the API upload limit
+3. Transcribe chunks concurrently (FLAC upload, shared pooled client)
+4. Stitch segment timestamps back together with each chunk's offset
+
+Inputs that fit in one chunk are sent as a single request, so short files
+transcribe exactly as a single-shot upload would.
+
+transcribe_stream() does the same while a download is still arriving: the bytes are
+piped through ffmpeg as they come in, and each silence-aligned chunk is uploaded as
+soon as it has been decoded, so transcription overlaps the download.
+"""
+import io
+import os
+import hashlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+import tracing
+
+SAMPLE_RATE = 16000
+READ_CHUNK = 1 << 20
+
+# Groq's upload limit is 25MB; 10 min of 16 kHz mono is ~19MB as WAV, less as FLAC
+MAX_CHUNK_SECONDS = 600
+SILENCE_SEARCH_SECONDS = 30   # look for the quietest point in the last 30s of each chunk
+FRAME = 320                   # 20ms RMS frames
+QUIET_SPAN = 10               # frames averaged when ranking quiet points (200ms)
+STREAM_CHUNK_SECONDS = 300    # shorter chunks while streaming: only the last one waits for the download
+
+
+def extract_audio(media_file, pcm_path):
+    """Decode the first audio stream to raw 16 kHz mono s16le at pcm_path.
+    The stream is hashed while it is written (same fingerprint as transcript_cache).
+    Returns: (fingerprint, num_samples); raises RuntimeError if nothing could be decoded
+    """
+    digest = hashlib.sha256()
+    written = 0
+    try:
+        proc = subprocess.Popen(
+            ['ffmpeg', '-v', 'error', '-i', media_file, '-map', '0:a:0', '-vn',
+             '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg not found")
+
+    with open(pcm_path, 'wb') as out, tracing.span('extract_audio', 'transcribe') as span:
+        for chunk in iter(lambda: proc.stdout.read(READ_CHUNK), b''):
+            digest.update(chunk)
+            out.write(chunk)
+            written += len(chunk)
+        span.set(bytes=written)
+    if proc.wait() != 0 or written == 0:
+        raise RuntimeError(f"Could not decode audio from {media_file}")
+    return 'pcm:' + digest.hexdigest(), written // 2
+
+
+def quietest_point(pcm, lo, hi):
+    """Sample index of the quietest 200ms region in pcm[lo:hi]"""
+    window = pcm[lo:hi].astype(np.float32)
+    n_frames = len(window) // FRAME
+    if n_frames <= QUIET_SPAN:
+        return hi
+    rms = np.sqrt(np.mean(window[:n_frames * FRAME].reshape(n_frames, FRAME) ** 2, axis=1))
+    smoothed = np.convolve(rms, np.ones(QUIET_SPAN) / QUIET_SPAN, mode='valid')
+    best = int(np.argmin(smoothed)) + QUIET_SPAN // 2
+    return lo + best * FRAME
+
+
+def plan_chunks(pcm, max_seconds=MAX_CHUNK_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS):
+    """Split points on silence so no chunk exceeds max_seconds. Returns [(start, end)] in samples"""
+    total = len(pcm)
+    max_samples = int(max_seconds * SAMPLE_RATE)
+    search = min(int(search_seconds * SAMPLE_RATE), max_samples // 2)
+    chunks = []
+    start = 0
+    while total - start > max_samples:
+        end = start + max_samples
+        split = quietest_point(pcm, end - search, end)
+        chunks.append((start, split))
+        start = split
+    chunks.append((start, total))
+    return chunks
+
+
+def encode_flac(samples):
+    buf = io.BytesIO()
+    sf.write(buf, np.asarray(samples), SAMPLE_RATE, format='FLAC', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def transcribe_chunk(client, pcm, start, end, number, language, model):
+    """Transcribe pcm[start:end]; returns its segments shifted to absolute time"""
+    with tracing.span('transcribe_chunk', 'transcribe', chunk=number,
+                      audio_seconds=round((end - start) / SAMPLE_RATE, 2)) as span:
+        flac = encode_flac(pcm[start:end])
+        span.set(bytes=len(flac))
+        transcription = client.audio.transcriptions.create(
+            file=(f"chunk_{number:03d}.flac", flac),
+            model=model,
+            response_format="verbose_json",
+            language=language,
+            timestamp_granularities=["segment"]
+        )
+    offset = start / SAMPLE_RATE
+    segments = []
+    for segment in transcription.segments:
+        segment = dict(segment)
+        segment['start'] = segment['start'] + offset
+        segment['end'] = segment['end'] + offset
+        segments.append(segment)
+    return segments
+
+
+def transcribe_pcm(client, pcm_path, language, model, concurrency=4, max_seconds=MAX_CHUNK_SECONDS):
+    """Chunk the extracted PCM on silence and transcribe the chunks concurrently"""
+    pcm = np.memmap(pcm_path, dtype=np.int16, mode='r')
+    chunks = plan_chunks(pcm, max_seconds)
+    if len(chunks) > 1:
+        print(f"Long input: {len(chunks)} chunks of up to {max_seconds // 60} min, {concurrency} at a time")
+
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(chunks)))) as pool:
+        futures = [pool.submit(transcribe_chunk, client, pcm, start, end, n, language, model)
+                   for n, (start, end) in enumerate(chunks)]
+        results = []
+        for n, future in enumerate(futures):
+            results.append(future.result())
+            if len(chunks) > 1:
+                print(f"  Transcribed chunk {n+1}/{len(chunks)}")
+
+    segments = [segment for chunk_segments in results for segment in chunk_segments]
+    for i, segment in enumerate(segments):
+        segment['id'] = i
+    return segments
+
+
+# ============================================================
+# Streaming ingest
+# ============================================================
+
+class StreamChunker:
+    """Cuts PCM into silence-aligned chunks as it is decoded (the same cuts plan_chunks makes)"""
+
+    def __init__(self, on_chunk, max_seconds=STREAM_CHUNK_SECONDS, search_seconds=SILENCE_SEARCH_SECONDS):
+        self.on_chunk = on_chunk          # on_chunk(first_sample, samples)
+        self.max_samples = int(max_seconds * SAMPLE_RATE)
+        self.search = min(int(search_seconds * SAMPLE_RATE), self.max_samples // 2)
+        self.buffer = bytearray()
+        self.offset = 0                   # absolute sample index of buffer[0]
+
+    def feed(self, data):
+        self.buffer += data
+        while len(self.buffer) // 2 > self.max_samples:
+            pcm = np.frombuffer(bytes(self.buffer[:self.max_samples * 2]), dtype=np.int16)
+            split = quietest_point(pcm, self.max_samples - self.search, self.max_samples)
+            self.on_chunk(self.offset, pcm[:split])
+            del self.buffer[:split * 2]
+            self.offset += split
+
+    def finish(self):
+        usable = len(self.buffer) // 2 * 2
+        if usable:
+            self.on_chunk(self.offset, np.frombuffer(bytes(self.buffer[:usable]), dtype=np.int16))
+        self.buffer = bytearray()
+
+
+def transcribe_stream(client, blocks, media_path, language, model, concurrency=4,
+                      max_seconds=STREAM_CHUNK_SECONDS):
+    """Transcribe media while it downloads.
+    blocks yields the downloaded bytes; they are written to media_path and piped through
+    ffmpeg, and each chunk is transcribed as soon as it has been decoded.
+    Returns: (fingerprint, segments), or (None, None) if the stream could not be decoded
+    progressively (e.g. an MP4 with its index at the end); media_path is complete either way.
+    """
+    try:
+        proc = subprocess.Popen(
+            ['ffmpeg', '-v', 'error', '-i', 'pipe:0', '-map', '0:a:0', '-vn',
+             '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+    except FileNotFoundError:
+        proc = None
+
+    digest = hashlib.sha256()
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    chunks = []                 # [(first_sample, future)]
+    progress = {'downloaded': 0, 'decoded': 0}
+
+    def submit(first, samples):
+        number = len(chunks)
+        chunks.append((first, pool.submit(transcribe_chunk, client, samples, 0, len(samples),
+                                          number, language, model)))
+        print(f"  Chunk {number + 1} decoded up to {(first + len(samples)) / SAMPLE_RATE / 60:.1f} min "
+              f"({progress['downloaded'] / 1e6:.0f} MB downloaded), transcribing", flush=True)
+
+    chunker = StreamChunker(submit, max_seconds)
+
+    def decode():
+        for data in iter(lambda: proc.stdout.read(READ_CHUNK), b''):
+            digest.update(data)
+            progress['decoded'] += len(data)
+            chunker.feed(data)
+
+    reader = threading.Thread(target=decode, daemon=True)
+    try:
+        if proc is not None:
+            reader.start()
+        feeding = proc is not None
+        with open(media_path + '.part', 'wb') as out, tracing.span('stream_download', 'transcribe') as span:
+            for block in blocks:
+                out.write(block)
+                progress['downloaded'] += len(block)
+                if feeding:
+                    try:
+                        proc.stdin.write(block)
+                    except BrokenPipeError:
+                        feeding = False  # ffmpeg gave up; keep downloading for the fallback
+            span.set(bytes=progress['downloaded'])
+        os.replace(media_path + '.part', media_path)
+        if proc is None:
+            return None, None
+        try:
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        reader.join()
+        if proc.wait() != 0 or progress['decoded'] == 0:
+            return None, None
+        chunker.finish()
+
+        segments = []
+        for n, (first, future) in enumerate(chunks):
+            offset = first / SAMPLE_RATE
+            for segment in future.result():
+                segment['start'] += offset
+                segment['end'] += offset
+                segments.append(segment)
+            if len(chunks) > 1:
+                print(f"  Transcribed chunk {n+1}/{len(chunks)}")
+    finally:
+        if proc is not None and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    for i, segment in enumerate(segments):
+        segment['id'] = i
+    return 'pcm:' + digest.hexdigest(), segments
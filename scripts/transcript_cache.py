@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Transcript Cache - verbose_json transcription segments keyed by audio fingerprint
+The key is a hash of the decoded audio (not the container), plus language and model,
+so video_dubber.py, video_summary.py and re-muxed copies of the same media share one
+Whisper result and skip the upload entirely.
+
+Location: $TRANSCRIPT_CACHE_DIR (default ~/.cache/video-processor/transcripts)
+"""
+import os
+import json
+import hashlib
+import subprocess
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/video-processor/transcripts")
+CHUNK = 1 << 20
+
+
+def audio_fingerprint(media_file):
+    """sha256 of the first audio stream decoded to 16 kHz mono s16le.
+    Falls back to hashing the file bytes if ffmpeg can't decode it.
+    """
+    digest = hashlib.sha256()
+    try:
+        proc = subprocess.Popen(
+            ['ffmpeg', '-v', 'error', '-i', media_file, '-map', '0:a:0', '-vn',
+             '-ac', '1', '-ar', '16000', '-f', 's16le', '-'],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        decoded = 0
+        for chunk in iter(lambda: proc.stdout.read(CHUNK), b''):
+            digest.update(chunk)
+            decoded += len(chunk)
+        if proc.wait() == 0 and decoded:
+            return 'pcm:' + digest.hexdigest()
+    except FileNotFoundError:
+        pass
+
+    digest = hashlib.sha256()
+    with open(media_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK), b''):
+            digest.update(chunk)
+    return 'file:' + digest.hexdigest()
+
+
+class TranscriptCache:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get('TRANSCRIPT_CACHE_DIR', DEFAULT_CACHE_DIR)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, media_file, language, model, fingerprint=None):
+        """Cache key; pass fingerprint if the audio has already been decoded and hashed"""
+        payload = json.dumps([fingerprint or audio_fingerprint(media_file), language, model])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Return cached segments, or None"""
+        try:
+            with open(self.path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)['segments']
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+    def put(self, key, segments, language, model, source=None):
+        tmp = self.path(key) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'language': language, 'model': model, 'source': source,
+                       'segments': segments}, f, ensure_ascii=False)
+        os.replace(tmp, self.path(key))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Translation Memory - Persistent SQLite store of subtitle translations
+Keyed by source text, target language, model and prompt version, so recurring lines
+(intros, sponsor reads, catchphrases) are translated once across episodes.
+Translations edited during review are stored too and take priority over machine output.
+
+Location: $TRANSLATION_MEMORY_DB (default ~/.cache/video-processor/translation_memory.sqlite, "off" to disable)
+Usage: translation_memory.py learn <original_srt> <translated_srt> <target_lang> [--tm DB|off]
+       translation_memory.py stats [--tm DB]
+"""
+import os
+import sys
+import time
+import sqlite3
+
+from cli_helper import pop_option
+
+DEFAULT_DB = os.path.expanduser("~/.cache/video-processor/translation_memory.sqlite")
+REVIEW_MODEL = 'review'  # model column for human-edited rows
+
+# Eviction policy: machine translations unused for MAX_AGE_DAYS are dropped,
+# then the least recently used rows beyond MAX_ROWS
+MAX_AGE_DAYS = 365
+MAX_ROWS = 200000
+
+
+def normalize_source(text):
+    return ' '.join(text.split())
+
+
+class TranslationMemory:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get('TRANSLATION_MEMORY_DB', DEFAULT_DB)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        # WAL lets concurrent runs read while one writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                edited INTEGER NOT NULL DEFAULT 0,
+                created REAL NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (source, target_lang, model, prompt_version)
+            )""")
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, texts, target_lang, model, prompt_version):
+        """Return {position: translation} for texts found in memory (reviewed edits win)"""
+        found = {}
+        now = time.time()
+        for pos, text in enumerate(texts):
+            row = self.conn.execute("""
+                SELECT rowid, translation FROM translations
+                WHERE source = ? AND target_lang = ?
+                  AND (edited = 1 OR (model = ? AND prompt_version = ?))
+                ORDER BY edited DESC, used DESC LIMIT 1""",
+                (normalize_source(text), target_lang.lower(), model, prompt_version)).fetchone()
+            if row:
+                self.conn.execute("UPDATE translations SET used = ? WHERE rowid = ?", (now, row[0]))
+                found[pos] = row[1]
+        self.conn.commit()
+        self.hits += len(found)
+        self.misses += len(texts) - len(found)
+        return found
+
+    def store(self, pairs, target_lang, model, prompt_version, edited=False):
+        """Insert or replace (source, translation) pairs"""
+        now = time.time()
+        self.conn.executemany("""
+            INSERT OR REPLACE INTO translations
+                (source, target_lang, model, prompt_version, translation, edited, created, used)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(normalize_source(src), target_lang.lower(), model, prompt_version, dst, int(edited), now, now)
+             for src, dst in pairs if src.strip() and dst.strip()])
+        self.conn.commit()
+
+    def machine_translation(self, text, target_lang):
+        row = self.conn.execute("""
+            SELECT translation FROM translations
+            WHERE source = ? AND target_lang = ? AND edited = 0
+            ORDER BY used DESC LIMIT 1""", (normalize_source(text), target_lang.lower())).fetchone()
+        return row[0] if row else None
+
+    def evict(self, max_age_days=MAX_AGE_DAYS, max_rows=MAX_ROWS):
+        cutoff = time.time() - max_age_days * 86400
+        removed = self.conn.execute(
+            "DELETE FROM translations WHERE edited = 0 AND used < ?", (cutoff,)).rowcount
+        removed += self.conn.execute("""
+            DELETE FROM translations WHERE rowid IN (
+                SELECT rowid FROM translations ORDER BY used DESC LIMIT -1 OFFSET ?)""",
+            (max_rows,)).rowcount
+        self.conn.commit()
+        return removed
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def report(self):
+        removed = self.evict()
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        print(f"  Translation memory: {self.hits}/{lookups} hits ({rate:.0f}% hit rate), "
+              f"{self.count()} entries, {removed} evicted - {self.db_path}")
+
+    def close(self):
+        self.conn.close()
+
+
+def learn_from_review(original_srt, translated_srt, target_lang, tm=None):
+    """Store lines whose reviewed translation differs from the machine translation.
+    Returns: number of edits stored
+    """
+    from segments import read_srt
+
+    original = read_srt(original_srt)
+    original = dict(zip(original.numbers.tolist(), original.texts))
+    translated = read_srt(translated_srt)
+    translated = dict(zip(translated.numbers.tolist(), translated.texts))
+
+    tm = tm or TranslationMemory()
+    edits = []
+    for index, source in original.items():
+        reviewed = translated.get(index)
+        if not reviewed or reviewed == source:
+            continue
+        machine = tm.machine_translation(source, target_lang)
+        if machine is not None and machine != reviewed:
+            edits.append((source, reviewed))
+    tm.store(edits, target_lang, REVIEW_MODEL, '', edited=True)
+    return len(edits)
+
+
+def main():
+    args = sys.argv[1:]
+    # Same default as video_dubber.py --tm, so review edits land in the memory translations came from
+    db_path = pop_option(args, '--tm', os.environ.get('TRANSLATION_MEMORY_DB'))
+    if not args or args[0] not in ('learn', 'stats') or (args[0] == 'learn' and len(args) < 4):
+        print("Usage: translation_memory.py learn <original_srt> <translated_srt> <target_lang> [--tm DB|off]")
+        print("       translation_memory.py stats [--tm DB]")
+        print("  --tm: the memory video_dubber.py used (default $TRANSLATION_MEMORY_DB or ~/.cache/video-processor/)")
+        sys.exit(1)
+
+    if db_path == 'off':
+        print("Translation memory: off")
+        return
+    tm = TranslationMemory(db_path)
+    if args[0] == 'learn':
+        stored = learn_from_review(args[1], args[2], args[3], tm)
+        print(f"Translation memory: stored {stored} reviewed edits")
+    else:
+        print(f"Translation memory: {tm.count()} entries in {tm.db_path}")
+    tm.close()
+
+
+if __name__ == "__main__":
+    main()
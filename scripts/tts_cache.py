@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Content-addressed TTS cache shared across runs.
+Raw TTS files are stored under a hash of (engine, voice, voice profile, normalized text),
+so re-dubbing a video or reusing intros/outros across a series skips synthesis.
+The cache is capped in size and evicts least-recently-used entries.
+
+Location: $TTS_CACHE_DIR (default ~/.cache/video-processor/tts)
+Size cap: $TTS_CACHE_MAX_MB (default 2048)
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import unicodedata
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/video-processor/tts")
+DEFAULT_MAX_MB = 2048
+
+
+def normalize_text(text):
+    """NFKC + collapsed whitespace, so trivially different spellings of a line share an entry"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def cache_key(engine, voice, voice_profile, text):
+    payload = json.dumps([engine, voice or '', voice_profile or '', normalize_text(text)],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def link_or_copy(src, dst):
+    tmp = dst + '.tmp'
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+class TTSCache:
+    """Directory of <key[:2]>/<key>.<ext> files; file mtime is the LRU clock"""
+
+    def __init__(self, cache_dir=None, max_mb=None):
+        self.cache_dir = cache_dir or os.environ.get('TTS_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = int(float(max_mb or os.environ.get('TTS_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, key, ext):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{ext}")
+
+    def fetch(self, key, ext, out_path):
+        """Copy a cached entry to out_path; returns True on hit"""
+        path = self.path(key, ext)
+        if os.path.exists(path) and os.path.getsize(path) > 100:
+            link_or_copy(path, out_path)
+            os.utime(path)  # mark as recently used
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def store(self, key, ext, src_path):
+        path = self.path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        link_or_copy(src_path, path)
+        os.utime(path)
+        self.stored += 1
+
+    def entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        """Remove least-recently-used entries until the cache is under its size cap"""
+        entries = sorted(self.entries())
+        size = sum(e[1] for e in entries)
+        removed = 0
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed += 1
+        return size, removed
+
+    def report(self):
+        size, removed = self.evict()
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        print(f"  TTS cache: {self.hits} hits, {self.misses} misses ({rate:.0f}% hit rate), "
+              f"{self.stored} stored, {removed} evicted - "
+              f"{size / 1024 / 1024:.0f}/{self.max_bytes / 1024 / 1024:.0f} MB in {self.cache_dir}")
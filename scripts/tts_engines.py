@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+TTS Engines - Registered engine interface with capability-driven scheduling
+Each engine declares what it can do (max concurrency, batch size, native sample rate and
+output format, warm-up cost) and plan_execution() turns those capabilities into how a job
+runs: how many requests/sessions/workers to start and how to batch segments. Engines with
+their own transport (edge-tts sliding window, Kokoro socket workers, voicebox sessions)
+run the plan themselves; simple engines only implement synthesize(batch) and get the
+shared thread scheduler.
+
+The in-tree "synthetic" engine is deterministic (a tone of plausible length per line, no
+network or model), so scheduling and throughput can be tested offline:
+  $SYNTHETIC_TTS_LATENCY  seconds of simulated latency per request (default 0)
+  $SYNTHETIC_TTS_WARMUP   seconds of simulated warm-up per worker (default 0)
+
+Usage: tts_engines.py list                                  (capabilities table)
+       tts_engines.py select <target_lang> [voice_profile]  (engine name for a job)
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import hashlib
+import itertools
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+import soundfile as sf
+
+import tracing
+from time_stretch import SAMPLE_RATE
+from kokoro_worker import KOKORO_PYTHON, socket_path_for, synthesize_sharded
+from voicebox_worker import VOICEBOX_SCRIPT, generate_concurrent
+from adaptive_scheduler import AdaptiveScheduler
+
+WARMUP_AMORTIZATION = 3.0  # an extra worker must have >= 3x its warm-up cost of work to be worth starting
+
+EDGE_VOICE_MAP = {
+    # Languages
+    'chinese': 'zh-CN-YunxiNeural', 'zh': 'zh-CN-YunxiNeural',
+    'spanish': 'es-ES-AlvaroNeural', 'es': 'es-ES-AlvaroNeural',
+    'french': 'fr-FR-HenriNeural', 'fr': 'fr-FR-HenriNeural',
+    'japanese': 'ja-JP-KeitaNeural', 'ja': 'ja-JP-KeitaNeural',
+    'german': 'de-DE-ConradNeural', 'de': 'de-DE-ConradNeural',
+    'italian': 'it-IT-DiegoNeural', 'it': 'it-IT-DiegoNeural',
+    'portuguese': 'pt-BR-AntonioNeural', 'pt': 'pt-BR-AntonioNeural',
+    'korean': 'ko-KR-InJoonNeural', 'ko': 'ko-KR-InJoonNeural',
+    'russian': 'ru-RU-DmitryNeural', 'ru': 'ru-RU-DmitryNeural',
+    'arabic': 'ar-SA-HamedNeural', 'ar': 'ar-SA-HamedNeural',
+    'hindi': 'hi-IN-MadhurNeural', 'hi': 'hi-IN-MadhurNeural',
+    'turkish': 'tr-TR-AhmetNeural', 'tr': 'tr-TR-AhmetNeural',
+    'english': 'en-US-BrianNeural', 'en': 'en-US-BrianNeural',
+}
+
+
+# ============================================================
+# Engine transports
+# ============================================================
+
+async def generate_edge_tts_all(segments, work_dir, voice, concurrency=10, on_ready=None):
+    """Generate all segments with edge-tts through an adaptive sliding window.
+
+    Up to `concurrency` requests start in flight; the window then grows or shrinks
+    with observed latency and errors, failures back off and retry, and stragglers
+    past the p95 latency are hedged (see adaptive_scheduler.py).
+    on_ready(index) is called as each segment's file lands, on a worker thread: it may
+    block (sync_tts back-pressure) without stalling the requests in flight.
+    """
+    import edge_tts
+
+    total = len(segments)
+    t0 = time.time()
+    scheduler = AdaptiveScheduler(initial=concurrency, max_limit=concurrency * 4)
+
+    async def synthesize(text, out_path):
+        # Each attempt (including a hedged duplicate) writes its own part file
+        part = f"{out_path}.{os.urandom(4).hex()}.part.mp3"
+        try:
+            await edge_tts.Communicate(text, voice).save(part)
+            if os.path.getsize(part) <= 100:
+                raise RuntimeError("empty audio")
+            return part
+        except BaseException:
+            if os.path.exists(part):
+                os.remove(part)
+            raise
+
+    done = 0
+    failed = []
+
+    async def gen_one(idx, text, out_path):
+        nonlocal done
+        attempts = 0
+        landed = False
+
+        def attempt():
+            nonlocal attempts
+            attempts += 1  # retries and hedged duplicates
+            return synthesize(text, out_path)
+
+        with tracing.span('edge_request', 'tts', segment=idx, chars=len(text)) as span:
+            try:
+                part = await scheduler.submit(attempt, discard=os.remove)
+                span.set(bytes=os.path.getsize(part))
+                os.replace(part, out_path)
+                landed = True
+            except Exception as e:
+                failed.append(idx + 1)
+                span.set(error=type(e).__name__)
+                print(f"  FAIL {idx+1}: {type(e).__name__}: {e}")
+            span.set(retries=max(attempts - 1, 0))
+        if landed and on_ready:
+            await asyncio.get_running_loop().run_in_executor(None, on_ready, idx)
+        done += 1
+        if done % 50 == 0 or done == len(pending):
+            elapsed = time.time() - t0
+            eta = elapsed / done * (len(pending) - done)
+            print(f"  TTS: {total - len(pending) + done}/{total} - {scheduler.inflight} in flight "
+                  f"(window {scheduler.limit:.0f}) - elapsed {elapsed:.0f}s - ETA {eta:.0f}s")
+
+    pending = []
+    for seg in segments:
+        out_path = os.path.join(work_dir, f"raw_{seg['index']:04d}.mp3")
+        if os.path.exists(out_path) and os.path.getsize(out_path) > 100:
+            continue  # skip already generated
+        pending.append(gen_one(seg['index'], seg['text'].strip() or "...", out_path))
+
+    if pending:
+        await asyncio.gather(*pending)
+        scheduler.report('edge-tts')
+        if failed:
+            print(f"  edge-tts: {len(failed)} segments failed after retries: {failed[:10]}")
+
+
+def generate_edge_tts(segments, work_dir, voice, concurrency=10, on_ready=None):
+    """Wrapper to run async edge-tts generation"""
+    asyncio.run(generate_edge_tts_all(segments, work_dir, voice, concurrency, on_ready))
+
+
+def generate_kokoro_tts(segments, work_dir, voice='am_michael', workers=1, batch_chars=0, on_ready=None):
+    """Generate all segments with Kokoro TTS via persistent warm workers (kokoro_worker.py).
+
+    workers > 1 shards segments (balanced by text length) over that many worker
+    processes, each limited to cpu_count / workers threads. batch_chars > 0 sends
+    runs of short lines through one pipe() call. on_ready(index, audio) receives
+    each segment's decoded audio as it arrives.
+    """
+    total = len(segments)
+    t0 = time.time()
+
+    # Determine lang_code from voice name
+    lang_code = 'a'  # American English default
+    if voice.startswith('z'):
+        lang_code = 'z'  # Chinese
+
+    pending = []
+    for seg in segments:
+        out_path = os.path.join(work_dir, f"raw_{seg['index']:04d}.wav")
+        if os.path.exists(out_path) and os.path.getsize(out_path) > 100:
+            continue
+        pending.append({'index': seg['index'], 'text': seg['text'].strip() or '...'})
+    if not pending:
+        return
+    if workers > 1:
+        print(f"Kokoro: {workers} workers x {max(1, (os.cpu_count() or 1) // workers)} threads")
+
+    done = total - len(pending)
+    failed = 0
+    for idx, audio, error in synthesize_sharded(pending, lang_code, voice, workers, batch_chars):
+        done += 1
+        if error is not None:
+            failed += 1
+            print(f"  FAIL {idx+1}: {error}")
+        else:
+            out_path = os.path.join(work_dir, f"raw_{idx:04d}.wav")
+            sf.write(out_path + '.part.wav', audio, SAMPLE_RATE)
+            os.replace(out_path + '.part.wav', out_path)
+            if on_ready:
+                on_ready(idx, audio)
+        if done % 50 == 0 or done == total:
+            print(f"  Kokoro: {done}/{total} - {time.time() - t0:.0f}s")
+
+    print(f"Total Kokoro generation: {time.time() - t0:.1f}s" + (f" ({failed} failed)" if failed else ""))
+
+
+def generate_voicebox_tts(segments, work_dir, voice_profile, jobs=1, on_ready=None):
+    """Generate all segments with voicebox voice cloning on warm sessions (voicebox_worker.py).
+
+    Each of the `jobs` sessions loads the voice profile once and writes straight to
+    the segment's own raw file; failed segments are reported, not dropped.
+    on_ready(index) is called as each segment's file lands.
+    """
+    total = len(segments)
+    t0 = time.time()
+
+    pending = []
+    for seg in segments:
+        out_path = os.path.join(work_dir, f"raw_{seg['index']:04d}.wav")
+        if os.path.exists(out_path) and os.path.getsize(out_path) > 100:
+            continue
+
+        text = seg['text'].strip()
+        if not text:
+            silence = np.zeros(int(0.1 * SAMPLE_RATE), dtype=np.float32)
+            sf.write(out_path, silence, SAMPLE_RATE)
+            if on_ready:
+                on_ready(seg['index'], silence)
+            continue
+        pending.append({'index': seg['index'], 'text': text})
+    if not pending:
+        return
+
+    done = total - len(pending)
+    failed = []
+    out_path_for = lambda seg: os.path.abspath(os.path.join(work_dir, f"raw_{seg['index']:04d}.wav"))
+    try:
+        for idx, error in generate_concurrent(pending, voice_profile, out_path_for, jobs, work_dir):
+            done += 1
+            if error is not None:
+                failed.append(idx + 1)
+                print(f"  FAIL {idx+1}: {error}")
+            elif on_ready:
+                on_ready(idx)
+            if done % 10 == 0 or done == total:
+                print(f"  Voicebox: {done}/{total} - {time.time() - t0:.0f}s")
+    except RuntimeError as e:
+        print(f"  Voicebox unavailable: {e}")
+        return
+
+    print(f"Total voicebox generation: {time.time() - t0:.1f}s"
+          + (f" ({len(failed)} failed: {failed[:10]})" if failed else ""))
+
+
+# ============================================================
+# Engine interface
+# ============================================================
+
+ENGINES = {}
+
+Plan = namedtuple('Plan', 'concurrency batch_size')
+
+
+def register(cls):
+    """Class decorator: make an engine available by its name"""
+    ENGINES[cls.name] = cls
+    return cls
+
+
+def raw_path(work_dir, idx, ext):
+    return os.path.join(work_dir, f"raw_{idx:04d}.{ext}")
+
+
+def has_raw(work_dir, idx, ext):
+    path = raw_path(work_dir, idx, ext)
+    return os.path.exists(path) and os.path.getsize(path) > 100
+
+
+class TTSEngine:
+    """Base engine. Subclasses set the capability attributes and implement either
+    synthesize(batch) (shared scheduler) or generate(segments, work_dir, plan, on_ready).
+    """
+    name = None
+    max_concurrency = 1        # most requests / sessions / worker processes worth running at once
+    default_concurrency = 1    # used when the caller doesn't ask for a number
+    batch_size = 1             # segments per synthesize() call
+    sample_rate = SAMPLE_RATE  # native output sample rate
+    output_format = 'wav'      # raw file extension
+    warmup_seconds = 0.0       # one-off cost per concurrent worker (model load, session start)
+    seconds_per_char = 0.01    # rough synthesis cost, to judge whether a warm-up pays off
+    needs_profile = False      # requires a voice profile (cloning)
+    preferred_languages = ()   # target languages this engine is auto-selected for
+    concurrency_option = None  # sync_tts.py flag that sets the requested concurrency
+    cli_options = {}           # other sync_tts.py flags: {'--flag': (option name, type, default)}
+
+    def __init__(self, voice=None, voice_profile=None, target_lang=None, **options):
+        self.voice = voice or self.default_voice(target_lang)
+        self.voice_profile = voice_profile
+        self.options = options
+
+    def default_voice(self, target_lang):
+        return None
+
+    def available(self):
+        return True
+
+    def capabilities(self):
+        return {'max_concurrency': self.max_concurrency, 'batch_size': self.batch_size,
+                'sample_rate': self.sample_rate, 'output_format': self.output_format,
+                'warmup_seconds': self.warmup_seconds}
+
+    def generate(self, segments, work_dir, plan, on_ready=None):
+        """Default: batches of plan.batch_size on plan.concurrency threads, each with its own warm-up"""
+        pending = [seg for seg in segments if not has_raw(work_dir, seg['index'], self.output_format)]
+        if not pending:
+            return
+        batches = [pending[i:i + plan.batch_size] for i in range(0, len(pending), plan.batch_size)]
+        local = threading.local()
+        t0 = time.time()
+
+        def run(batch):
+            if not getattr(local, 'warm', False):
+                with tracing.span('warm_up', 'tts', engine=self.name):
+                    self.warm_up()
+                local.warm = True
+            with tracing.span('synthesize', 'tts', engine=self.name, segments=len(batch),
+                              chars=sum(len(seg['text']) for seg in batch)) as span:
+                audios = self.synthesize(batch)
+                span.set(bytes=sum(audio.nbytes for audio in audios))
+            return batch, audios
+
+        done = failed = 0
+        todo = iter(batches)
+        with ThreadPoolExecutor(plan.concurrency) as pool:
+            # Only ~2 batches per worker are submitted at a time, so finished audio isn't held in memory
+            running = {pool.submit(run, batch) for batch in itertools.islice(todo, plan.concurrency * 2)}
+            while running:
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                running |= {pool.submit(run, batch) for batch in itertools.islice(todo, len(finished))}
+                for future in finished:
+                    try:
+                        batch, audios = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"  {self.name}: batch failed: {type(e).__name__}: {e}")
+                        continue
+                    self.write_batch(batch, audios, work_dir, on_ready)
+                    done += len(batch)
+                    if done % 50 < len(batch) or done == len(pending):
+                        print(f"  {self.name}: {done}/{len(pending)} - {time.time() - t0:.1f}s")
+        if failed:
+            print(f"  {self.name}: {failed} batches failed")
+
+    def write_batch(self, batch, audios, work_dir, on_ready=None):
+        for seg, audio in zip(batch, audios):
+            path = raw_path(work_dir, seg['index'], self.output_format)
+            sf.write(path + '.part.' + self.output_format, audio, self.sample_rate)
+            os.replace(path + '.part.' + self.output_format, path)
+            if on_ready:
+                on_ready(seg['index'], audio if self.sample_rate == SAMPLE_RATE else None)
+
+    def warmup_for(self, concurrency):
+        """Average warm-up seconds per worker when running `concurrency` of them"""
+        return self.warmup_seconds
+
+    def warm_up(self):
+        pass
+
+    def synthesize(self, batch):
+        """Return one float32 array per segment in batch"""
+        raise NotImplementedError
+
+
+def plan_execution(engine, segments, requested=None):
+    """Concurrency and batch size for running `segments` on `engine`.
+
+    Starts from the requested (or default) concurrency, capped by the engine's maximum.
+    Engines with a warm-up cost only get as many workers as the job's estimated
+    synthesis time can amortize; nobody gets more workers than there are batches.
+    """
+    n = len(segments)
+    batch_size = max(1, engine.batch_size)
+    concurrency = min(requested or engine.default_concurrency, engine.max_concurrency)
+    if engine.warmup_seconds > 0:
+        work = sum(len(seg['text']) for seg in segments) * engine.seconds_per_char
+        while concurrency > 1 and concurrency * WARMUP_AMORTIZATION * engine.warmup_for(concurrency) > work:
+            concurrency -= 1
+    concurrency = max(1, min(concurrency, math.ceil(n / batch_size) if n else 1))
+    # Small jobs: smaller batches so every worker gets some
+    batch_size = max(1, min(batch_size, math.ceil(n / concurrency))) if n else batch_size
+    return Plan(concurrency, batch_size)
+
+
+def create_engine(name, voice=None, voice_profile=None, target_lang=None, **options):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine {name!r} (available: {', '.join(ENGINES)})")
+    return ENGINES[name](voice, voice_profile, target_lang, **options)
+
+
+def select_engine(target_lang, voice_profile=None):
+    """Engine name for a job: cloning if a profile is given, else the first available
+    engine that prefers the language, else edge-tts"""
+    if voice_profile and voice_profile != 'none':
+        return 'voicebox'
+    for name, cls in ENGINES.items():
+        if target_lang in cls.preferred_languages and not cls.needs_profile and cls().available():
+            return name
+    return 'edge-tts'
+
+
+# ============================================================
+# Engines
+# ============================================================
+
+@register
+class EdgeTTSEngine(TTSEngine):
+    name = 'edge-tts'
+    max_concurrency = 40
+    default_concurrency = 10
+    output_format = 'mp3'
+    concurrency_option = '--edge-concurrency'
+
+    def default_voice(self, target_lang):
+        return EDGE_VOICE_MAP.get(target_lang, 'en-US-BrianNeural')
+
+    def generate(self, segments, work_dir, plan, on_ready=None):
+        generate_edge_tts(segments, work_dir, self.voice, plan.concurrency, on_ready)
+
+
+@register
+class KokoroEngine(TTSEngine):
+    name = 'kokoro'
+    max_concurrency = os.cpu_count() or 1
+    batch_size = 1                 # segments are streamed to the workers; any shard size works
+    seconds_per_char = 0.02        # CPU synthesis
+    preferred_languages = ('chinese', 'zh')
+    concurrency_option = '--kokoro-workers'
+    cli_options = {'--kokoro-batch-chars': ('batch_chars', int, 0)}
+
+    def default_voice(self, target_lang):
+        return 'zm_yunxi' if target_lang in ('chinese', 'zh') else 'am_michael'
+
+    warmup_seconds = 8.0           # model load, for a worker that isn't already running
+
+    def warmup_for(self, concurrency):
+        # Workers persist across runs: only shards of this pool size without a live
+        # socket (see synthesize_sharded) pay for loading the model
+        cold = sum(not os.path.exists(socket_path_for(n, concurrency)) for n in range(concurrency))
+        return self.warmup_seconds * cold / concurrency
+
+    def available(self):
+        return os.path.exists(KOKORO_PYTHON)
+
+    def generate(self, segments, work_dir, plan, on_ready=None):
+        generate_kokoro_tts(segments, work_dir, self.voice, plan.concurrency,
+                            self.options.get('batch_chars', 0), on_ready)
+
+
+@register
+class VoiceboxEngine(TTSEngine):
+    name = 'voicebox'
+    max_concurrency = 4
+    warmup_seconds = 15.0          # environment, model and profile per session
+    seconds_per_char = 0.1
+    needs_profile = True
+    concurrency_option = '--voicebox-jobs'
+
+    def available(self):
+        return os.path.exists(VOICEBOX_SCRIPT)
+
+    def generate(self, segments, work_dir, plan, on_ready=None):
+        generate_voicebox_tts(segments, work_dir, self.voice_profile, plan.concurrency, on_ready)
+
+
+@register
+class SyntheticEngine(TTSEngine):
+    """Deterministic offline engine: each line becomes a tone whose length follows the text
+    (~14 characters per second, +/-15% per line) and whose pitch depends on the text hash."""
+    name = 'synthetic'
+    max_concurrency = 64
+    default_concurrency = 8
+    batch_size = 4
+    concurrency_option = '--synthetic-concurrency'
+    cli_options = {'--synthetic-latency': ('latency', float, None),
+                   '--synthetic-warmup': ('warmup', float, None)}
+
+    def __init__(self, voice=None, voice_profile=None, target_lang=None, **options):
+        super().__init__(voice, voice_profile, target_lang, **options)
+        latency = options.get('latency')
+        warmup = options.get('warmup')
+        self.latency = float(os.environ.get('SYNTHETIC_TTS_LATENCY', 0) if latency is None else latency)
+        self.warmup_seconds = float(os.environ.get('SYNTHETIC_TTS_WARMUP', 0) if warmup is None else warmup)
+
+    def default_voice(self, target_lang):
+        return 'tone'
+
+    def warm_up(self):
+        time.sleep(self.warmup_seconds)
+
+    def synthesize(self, batch):
+        time.sleep(self.latency)
+        return [synthetic_audio(seg['text'], self.sample_rate) for seg in batch]
+
+
+def synthetic_audio(text, sample_rate=SAMPLE_RATE):
+    """Same text, same samples: a soft tone with a little seeded noise"""
+    seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+    rng = np.random.default_rng(seed)
+    seconds = min(max(len(text.strip()) / 14.0 * rng.uniform(0.85, 1.15), 0.3), 20.0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    freq = 120 + seed % 180
+    envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.02)
+    audio = 0.3 * np.sin(2 * np.pi * freq * t) * envelope + 0.01 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == 'select':
+        print(select_engine(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
+    elif len(sys.argv) > 1 and sys.argv[1] == 'list':
+        for name, cls in ENGINES.items():
+            engine = cls()
+            caps = engine.capabilities()
+            print(f"{name:<10} {'available' if engine.available() else 'missing':<10} "
+                  + ', '.join(f"{k}={v}" for k, v in caps.items()))
+    else:
+        print("Usage: tts_engines.py list | select <target_lang> [voice_profile]")
+        sys.exit(1)
@@ -2,12 +2,43 @@
 """
 URL Helper - Download video/audio from URLs
 Supports: YouTube, Twitter, TikTok, Instagram, and many more via yt-dlp
+
+The calling path picks the download mode:
+  video  best video + audio merged to MP4, fragments fetched concurrently (dubbing)
+  audio  the best audio stream as served, no video and no re-encode (transcription, summaries)
+
+Downloads are cached by extractor + video ID, so the same video is fetched once across
+tools and runs (a cached video also serves audio-only requests); the file is hard-linked
+(or copied) into output_dir.
+
+Location: $DOWNLOAD_CACHE_DIR (default ~/.cache/video-processor/downloads, "off" to disable)
+Fragments: $DOWNLOAD_FRAGMENTS concurrent fragment downloads (default 4)
 """
+import os
 import subprocess
 import sys
 import re
+import json
+import shutil
+import hashlib
+import threading
 from pathlib import Path
-from urllib.parse import urlparse
+from urllib.parse import urlparse, unquote
+
+import tracing
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/video-processor/downloads")
+DEFAULT_FRAGMENTS = 4
+FORMATS = {
+    'video': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'audio': 'bestaudio[ext=m4a]/bestaudio/best',
+}
+VIDEO_EXTENSIONS = ['.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv']
+AUDIO_EXTENSIONS = ['.mp3', '.m4a', '.wav', '.flac', '.ogg', '.aac', '.opus']
+INDEX_FILE = 'index.json'
+COMPLETE_FILE = 'complete'  # per entry: name of the finished file, written after a successful download
+
+_index_lock = threading.Lock()
 
 def is_url(input_string):
     """Check if string is a URL"""
@@ -20,133 +51,237 @@ def is_url(input_string):
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
     return url_pattern.match(input_string) is not None
 
-def download_from_url(url, output_dir="."):
+# ============================================================
+# Download cache
+# ============================================================
+
+def cache_dir():
+    """The download cache directory, or None when disabled"""
+    path = os.environ.get('DOWNLOAD_CACHE_DIR', DEFAULT_CACHE_DIR)
+    return None if path == 'off' else path
+
+def video_key(url):
+    """'<extractor>-<id>' for a URL without a network request, or None.
+    Uses the yt_dlp module's URL patterns when it is importable; otherwise URLs
+    are only matched through the cache index.
     """
-    Download video/audio from URL using yt-dlp
-    Returns: (downloaded_file_path, file_type)
+    try:
+        from yt_dlp.extractor import gen_extractor_classes
+    except ImportError:
+        return None
+    for ie in gen_extractor_classes():
+        if ie.ie_key() != 'Generic' and ie.suitable(url):
+            video_id = ie.get_temp_id(url)
+            return f"{ie.ie_key()}-{video_id}" if video_id else None
+    return None
+
+def _load_index(root):
+    try:
+        with open(os.path.join(root, INDEX_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _remember(root, url, key):
+    """Map url -> cache entry (re-read first: several tools may share the cache)"""
+    with _index_lock:
+        index = _load_index(root)
+        index[url] = key
+        path = os.path.join(root, INDEX_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+
+def mark_complete(path):
+    """Record path as its cache entry's finished download"""
+    marker = os.path.join(os.path.dirname(path), COMPLETE_FILE)
+    with open(marker + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(os.path.basename(path))
+    os.replace(marker + '.tmp', marker)
+
+def cached_file(root, url, mode):
+    """A cached download for url usable in mode, or None (a video also serves audio).
+    Only an entry's marked file counts: leftovers of an interrupted download
+    (unmerged .fNNN streams, partial files) are a miss.
     """
-    print(f"\n🌐 Downloading from URL...")
-    print(f"URL: {url}")
-    print(f"Using: yt-dlp\n")
+    key = video_key(url) or _load_index(root).get(url)
+    if not key:
+        return None
+    for candidate in ([mode, 'video'] if mode == 'audio' else [mode]):
+        entry = os.path.join(root, key, candidate)
+        try:
+            with open(os.path.join(entry, COMPLETE_FILE), encoding='utf-8') as f:
+                path = os.path.join(entry, f.read().strip())
+        except FileNotFoundError:
+            continue
+        if os.path.isfile(path):
+            return path
+    return None
+
+def place(cached, output_dir):
+    """Hard-link (or copy, across filesystems) a cached download into output_dir"""
+    target = os.path.join(output_dir, os.path.basename(cached))
+    if os.path.exists(target):
+        if os.path.samefile(target, cached) or os.path.getsize(target) == os.path.getsize(cached):
+            return target
+        os.remove(target)
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        os.link(cached, target)
+    except OSError:
+        shutil.copy2(cached, target + '.tmp')
+        os.replace(target + '.tmp', target)
+    return target
+
+# ============================================================
+# yt-dlp
+# ============================================================
 
-    # Generate output filename template
-    output_template = f"{output_dir}/%(title)s.%(ext)s"
+def file_type_of(path):
+    ext = Path(path).suffix.lower()
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    if ext in AUDIO_EXTENSIONS:
+        return 'audio'
+    return 'unknown'
 
-    # Download with best quality, prefer mp4/m4a
+def run_ytdlp(url, mode, output_template, fragments):
+    """Run yt-dlp and return the final file path (yt-dlp prints it on the last line)"""
     cmd = [
         'yt-dlp',
         '--no-playlist',  # Don't download playlists
-        '--format', 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-        '--merge-output-format', 'mp4',
+        '--format', FORMATS[mode],
+        '--concurrent-fragments', str(fragments),
         '--output', output_template,
         '--print', 'after_move:filepath',  # Print final filepath
-        url
     ]
+    if mode == 'video':
+        cmd += ['--merge-output-format', 'mp4']
+    cmd.append(url)
 
-    try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        # Extract the downloaded file path from output
-        # yt-dlp prints the filepath on the last line
-        lines = result.stdout.strip().split('\n')
-        downloaded_file = None
-
-        for line in reversed(lines):
-            if line and Path(line).exists():
-                downloaded_file = line
-                break
-
-        if not downloaded_file:
-            raise Exception("Could not determine downloaded file path")
-
-        print(f"✅ Downloaded: {downloaded_file}\n")
-
-        # Determine file type
-        ext = Path(downloaded_file).suffix.lower()
-        if ext in ['.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv']:
-            file_type = 'video'
-        elif ext in ['.mp3', '.m4a', '.wav', '.flac', '.ogg', '.aac']:
-            file_type = 'audio'
-        else:
-            file_type = 'unknown'
-
-        return downloaded_file, file_type
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error downloading from URL:")
-        print(e.stderr)
-        sys.exit(1)
-    except Exception as e:
-        print(f"❌ Error: {e}")
-        sys.exit(1)
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    for line in reversed(result.stdout.strip().split('\n')):
+        if line and Path(line).exists():
+            return line
+    raise Exception("Could not determine downloaded file path")
 
-def download_audio_only(url, output_dir="."):
+def download_from_url(url, output_dir=".", mode='video', fragments=None):
     """
-    Download only audio from URL (useful for audio processing)
-    Returns: downloaded_audio_file_path
+    Download video/audio from URL using yt-dlp
+    mode: 'video' (merged MP4) or 'audio' (best audio stream, no re-encode)
+    Returns: (downloaded_file_path, file_type)
     """
-    print(f"\n🌐 Downloading audio from URL...")
+    fragments = fragments or int(os.environ.get('DOWNLOAD_FRAGMENTS', DEFAULT_FRAGMENTS))
+    root = cache_dir()
+
+    print(f"\n🌐 Downloading from URL...")
     print(f"URL: {url}")
-    print(f"Using: yt-dlp (audio only)\n")
+    print(f"Using: yt-dlp ({mode}{', ' + str(fragments) + ' fragments at once' if mode == 'video' else ''})\n")
 
-    output_template = f"{output_dir}/%(title)s.%(ext)s"
+    with tracing.span('download', 'download', mode=mode) as span:
+        try:
+            cached = cached_file(root, url, mode) if root else None
+            if cached:
+                downloaded_file = place(cached, output_dir)
+                span.set(cache_hits=1, bytes=os.path.getsize(cached))
+                print(f"✅ Cached download: {downloaded_file}\n")
+            elif root:
+                # Cache layout: <root>/<extractor>-<id>/<mode>/<title>.<ext>
+                template = os.path.join(root, '%(extractor_key)s-%(id)s', mode, '%(title).200B.%(ext)s')
+                cached = run_ytdlp(url, mode, template, fragments)
+                mark_complete(cached)
+                _remember(root, url, os.path.basename(os.path.dirname(os.path.dirname(cached))))
+                downloaded_file = place(cached, output_dir)
+                span.set(bytes=os.path.getsize(cached))
+                print(f"✅ Downloaded: {downloaded_file}\n")
+            else:
+                downloaded_file = run_ytdlp(url, mode, f"{output_dir}/%(title)s.%(ext)s", fragments)
+                span.set(bytes=os.path.getsize(downloaded_file))
+                print(f"✅ Downloaded: {downloaded_file}\n")
 
-    cmd = [
-        'yt-dlp',
-        '--no-playlist',
-        '--extract-audio',
-        '--audio-format', 'mp3',
-        '--audio-quality', '0',  # Best quality
-        '--output', output_template,
-        '--print', 'after_move:filepath',
-        url
-    ]
+            return downloaded_file, file_type_of(downloaded_file)
 
+        except subprocess.CalledProcessError as e:
+            print(f"❌ Error downloading from URL:")
+            print(e.stderr)
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            sys.exit(1)
+
+# ============================================================
+# Streaming ingest
+# ============================================================
+
+def resolve_stream(url):
+    """Where to stream url's audio from: (media_url, headers, cache_key, filename), or None.
+    Direct links to media files are used as they are; other pages are resolved by yt-dlp
+    (one metadata request). None when the audio is not a single progressive HTTP file
+    (HLS/DASH segments, or separate streams yt-dlp would have to merge).
+    """
+    path = unquote(urlparse(url).path)
+    if Path(path).suffix.lower() in VIDEO_EXTENSIONS + AUDIO_EXTENSIONS:
+        key = 'direct-' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]
+        return url, {}, key, os.path.basename(path)
+
+    cmd = ['yt-dlp', '--no-playlist', '--format', FORMATS['audio'],
+           '--output', '%(title).200B.%(ext)s', '--dump-json', url]
     try:
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-
-        lines = result.stdout.strip().split('\n')
-        downloaded_file = None
-
-        for line in reversed(lines):
-            if line and Path(line).exists():
-                downloaded_file = line
-                break
-
-        if not downloaded_file:
-            raise Exception("Could not determine downloaded file path")
-
-        print(f"✅ Downloaded: {downloaded_file}\n")
-        return downloaded_file
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error downloading audio:")
-        print(e.stderr)
-        sys.exit(1)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        info = json.loads(result.stdout.strip().split('\n')[-1]) if result.returncode == 0 else {}
+    except (FileNotFoundError, ValueError):
+        return None
+    if info.get('requested_formats') or info.get('protocol') not in ('http', 'https') or not info.get('url'):
+        return None
+    filename = os.path.basename(info.get('filename') or f"{info['id']}.{info['ext']}")
+    return info['url'], info.get('http_headers') or {}, f"{info['extractor_key']}-{info['id']}", filename
+
+def stream_target(key, filename):
+    """Download cache path for a streamed download, or None when the cache is off"""
+    root = cache_dir()
+    if not root:
+        return None
+    mode = 'video' if file_type_of(filename) == 'video' else 'audio'
+    os.makedirs(os.path.join(root, key, mode), exist_ok=True)
+    return os.path.join(root, key, mode, filename)
+
+def finish_stream(url, key, cached, output_dir):
+    """Index a completed streamed download in the cache and place it in output_dir"""
+    mark_complete(cached)
+    _remember(cache_dir(), url, key)
+    return place(cached, output_dir)
+
+def open_stream(media_url, headers):
+    """HTTP response for a resolved media URL; read() it in blocks as the bytes arrive"""
+    from urllib.request import Request, urlopen
+    return urlopen(Request(media_url, headers=headers), timeout=60)
+
+def download_audio_only(url, output_dir="."):
+    """
+    Download only audio from URL (useful for audio processing)
+    Returns: downloaded_audio_file_path
+    """
+    return download_from_url(url, output_dir, mode='audio')[0]
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: url_helper.py <url> [output_dir]")
+    args = sys.argv[1:]
+    audio_only = '--audio' in args
+    args = [a for a in args if a != '--audio']
+
+    if len(args) < 1:
+        print("Usage: url_helper.py <url> [output_dir] [--audio]")
         print("Example: url_helper.py https://youtube.com/watch?v=xxx")
+        print("  --audio: best audio stream only (no video, no re-encode)")
+        print("  Cache: $DOWNLOAD_CACHE_DIR (default ~/.cache/video-processor/downloads, 'off' to disable)")
         sys.exit(1)
 
-    url = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else "."
+    url = args[0]
+    output_dir = args[1] if len(args) > 1 else "."
 
     if not is_url(url):
         print(f"❌ Error: Not a valid URL: {url}")
         sys.exit(1)
 
-    downloaded_file, file_type = download_from_url(url, output_dir)
+    downloaded_file, file_type = download_from_url(url, output_dir, mode='audio' if audio_only else 'video')
     print(f"File type: {file_type}")
     print(f"Path: {downloaded_file}")
@@ -2,18 +2,28 @@
 """
 Video/Audio Processor - Extract, translate, review, and dub videos/audio
 Supports: Local files (MP4, MP3, WAV, M4A, etc.) and URLs (YouTube, Twitter, etc.)
-Usage: video_dubber.py <video_file_or_url> <target_lang> [groq_api_key]
+Usage: video_dubber.py <video_file_or_url> <target_lang> [groq_api_key] [options]
 """
 import sys
 import os
-import re
-import subprocess
+import json
+import asyncio
+import tempfile
 from pathlib import Path
 
 # Import URL helper
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
+import url_helper
 from url_helper import is_url, download_from_url
+from cli_helper import pop_option
+from groq_client import get_client, ChatScheduler, DEFAULT_RPM, DEFAULT_TPM
+from translation_memory import TranslationMemory
+from transcript_cache import TranscriptCache
+from transcribe_chunks import SAMPLE_RATE, extract_audio, transcribe_pcm, transcribe_stream
+from segments import Segments, parse_srt, format_timestamp
+import media_probe
+import tracing
 
 def print_header(text):
     print(f"\n{'='*60}")
@@ -21,19 +31,19 @@ def print_header(text):
     print(f"{'='*60}\n")
 
 def get_video_info(video_file):
-    """Get video duration and basic info"""
-    result = subprocess.run(
-        ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-         '-of', 'default=noprint_wrappers=1:nokey=1', video_file],
-        capture_output=True, text=True
-    )
-    duration = float(result.stdout.strip())
-    return {'duration': duration}
+    """Get video duration and basic info (format, streams; cached per file)"""
+    return media_probe.probe(video_file)
+
+TRANSCRIPTION_MODEL = "whisper-large-v3"
 
-def transcribe_video(video_file, groq_api_key, source_lang='en'):
-    """Transcribe video/audio using Groq Whisper Large V3"""
-    from groq import Groq
+def transcribe_video(video_file, groq_api_key, source_lang='en', use_cache=True, concurrency=4):
+    """Transcribe video/audio using Groq Whisper Large V3.
 
+    Only the audio track is decoded (16 kHz mono); long inputs are split on silence
+    into chunks below the upload limit and transcribed concurrently (transcribe_chunks.py).
+    Segments are cached by decoded-audio fingerprint + language + model
+    (transcript_cache.py), so a second tool touching the same media skips the upload.
+    """
     # Detect file type
     ext = Path(video_file).suffix.lower()
     if ext in ['.mp3', '.m4a', '.wav', '.flac', '.ogg', '.aac']:
@@ -44,30 +54,53 @@ def transcribe_video(video_file, groq_api_key, source_lang='en'):
     print_header(f"🎵 Step 1: Transcribing {file_type}")
     print(f"Using: Groq Whisper Large V3")
     print(f"Language: {source_lang}")
-    print(f"This should be very fast (20-30x realtime)...\n")
-
-    client = Groq(api_key=groq_api_key)
-
-    with open(video_file, "rb") as audio_file:
-        transcription = client.audio.transcriptions.create(
-            file=(video_file, audio_file.read()),
-            model="whisper-large-v3",
-            response_format="verbose_json",
-            language=source_lang,
-            timestamp_granularities=["segment"]
-        )
 
+    with tempfile.TemporaryDirectory(prefix='transcribe_') as tmp_dir:
+        pcm_path = os.path.join(tmp_dir, 'audio.s16')
+        try:
+            fingerprint, num_samples = extract_audio(video_file, pcm_path)
+            print(f"Audio: {num_samples / SAMPLE_RATE / 60:.1f} min extracted (16 kHz mono)")
+        except RuntimeError as e:
+            print(f"Audio extraction failed ({e}), uploading the whole file")
+            fingerprint = None
+
+        cache = TranscriptCache() if use_cache else None
+        segments = None
+        if cache is not None:
+            with tracing.span('transcript_cache', 'transcribe') as span:
+                cache_key = cache.key(video_file, source_lang, TRANSCRIPTION_MODEL, fingerprint)
+                segments = cache.get(cache_key)
+                span.set(cache_hits=int(segments is not None))
+            if segments is not None:
+                print(f"Using cached transcript (same audio already transcribed)\n")
+
+        if segments is None:
+            print(f"This should be very fast (20-30x realtime)...\n")
+            client = get_client(groq_api_key)
+
+            if fingerprint is not None:
+                segments = transcribe_pcm(client, pcm_path, source_lang, TRANSCRIPTION_MODEL, concurrency)
+            else:
+                with open(video_file, "rb") as audio_file, \
+                        tracing.span('transcribe_file', 'transcribe', bytes=os.path.getsize(video_file)):
+                    transcription = client.audio.transcriptions.create(
+                        file=(video_file, audio_file.read()),
+                        model=TRANSCRIPTION_MODEL,
+                        response_format="verbose_json",
+                        language=source_lang,
+                        timestamp_granularities=["segment"]
+                    )
+                segments = transcription.segments
+            if cache is not None:
+                cache.put(cache_key, segments, source_lang, TRANSCRIPTION_MODEL, os.path.abspath(video_file))
+
+    return save_transcript(video_file, segments)
+
+def save_transcript(video_file, segments):
+    """Write {name}_original.srt next to the working directory; returns (srt_content, srt_file)"""
     # Convert to SRT
-    srt_content = ""
-    for i, segment in enumerate(transcription.segments, 1):
-        start = segment['start']
-        end = segment['end']
-        text = segment['text'].strip()
-
-        start_time = seconds_to_srt_time(start)
-        end_time = seconds_to_srt_time(end)
-
-        srt_content += f"{i}\n{start_time} --> {end_time}\n{text}\n\n"
+    srt_content = Segments([seg['start'] for seg in segments], [seg['end'] for seg in segments],
+                           [seg['text'].strip() for seg in segments]).to_srt()
 
     # Save original SRT
     base_name = Path(video_file).stem
@@ -76,66 +109,71 @@ def transcribe_video(video_file, groq_api_key, source_lang='en'):
         f.write(srt_content)
 
     print(f"✅ Transcript saved: {original_srt}")
-    print(f"   Segments: {len(transcription.segments)}")
-    print(f"   Preview: {transcription.segments[0]['text'][:60]}...")
+    print(f"   Segments: {len(segments)}")
+    print(f"   Preview: {segments[0]['text'][:60]}...")
 
     return srt_content, original_srt
 
-def seconds_to_srt_time(seconds):
-    """Convert seconds to SRT timestamp format"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds - int(seconds)) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
-
-def parse_srt(srt_content):
-    """Parse SRT content into segments"""
-    segments = []
-    blocks = srt_content.strip().split('\n\n')
-
-    for block in blocks:
-        lines = block.split('\n')
-        if len(lines) >= 3:
-            index = lines[0]
-            timestamp = lines[1]
-            text = '\n'.join(lines[2:])
-
-            match = re.match(r'(\d{2}):(\d{2}):(\d{2}),(\d{3}) --> (\d{2}):(\d{2}):(\d{2}),(\d{3})', timestamp)
-            if match:
-                h1, m1, s1, ms1, h2, m2, s2, ms2 = map(int, match.groups())
-                start_sec = h1*3600 + m1*60 + s1 + ms1/1000
-                end_sec = h2*3600 + m2*60 + s2 + ms2/1000
-
-                segments.append({
-                    'index': int(index),
-                    'timestamp': timestamp,
-                    'start': start_sec,
-                    'end': end_sec,
-                    'text': text.strip()
-                })
-
-    return segments
-
-def translate_subtitle(srt_content, target_lang, groq_api_key):
-    """Translate SRT content to target language"""
-    from groq import Groq
-
-    print_header("🌐 Step 2: Translating Subtitles")
-    print(f"Target language: {target_lang}")
-    print(f"Using: Groq Llama 3.3 70B\n")
-
-    client = Groq(api_key=groq_api_key)
-    segments = parse_srt(srt_content)
-
-    translated_segments = []
-    for i, seg in enumerate(segments):
-        print(f"  Translating segment {i+1}/{len(segments)}...", end='\r')
-
-        # Build context-aware translation prompt
-        translation_prompt = f"""Translate this video subtitle from English to {target_lang}.
-
-CRITICAL RULES:
+def transcribe_url(url, groq_api_key, source_lang='en', use_cache=True, concurrency=4, need_video=False):
+    """Transcribe a URL while it downloads (transcribe_chunks.transcribe_stream).
+
+    The audio is fetched as one HTTP stream and transcribed chunk by chunk as it arrives.
+    With need_video, a video that is not the streamed file itself is downloaded alongside.
+    Falls back to download-then-transcribe for cached, segmented or non-progressive media.
+    Returns: (media_file, srt_content, srt_file)
+    """
+    mode = 'video' if need_video else 'audio'
+    root = url_helper.cache_dir()
+    stream = None if root and url_helper.cached_file(root, url, mode) else url_helper.resolve_stream(url)
+    if stream is None:
+        media_file, _ = download_from_url(url, output_dir=".", mode=mode)
+        return (media_file,) + transcribe_video(media_file, groq_api_key, source_lang, use_cache, concurrency)
+
+    media_url, headers, key, filename = stream
+    video_job = None
+    if need_video and url_helper.file_type_of(filename) != 'video':
+        from concurrent.futures import ThreadPoolExecutor
+        video_pool = ThreadPoolExecutor(max_workers=1)
+        video_job = video_pool.submit(download_from_url, url, ".", 'video')
+        video_pool.shutdown(wait=False)
+
+    print_header("🎵 Step 1: Transcribing While Downloading")
+    print(f"Using: Groq Whisper Large V3")
+    print(f"Language: {source_lang}")
+    print(f"Streaming: {filename}\n")
+
+    target = url_helper.stream_target(key, filename)
+    with url_helper.open_stream(media_url, headers) as response:
+        fingerprint, segments = transcribe_stream(
+            get_client(groq_api_key), iter(lambda: response.read(1 << 16), b''),
+            target or filename, source_lang, TRANSCRIPTION_MODEL, concurrency)
+    media_file = url_helper.finish_stream(url, key, target, ".") if target else filename
+    print(f"✅ Downloaded: {media_file}")
+
+    if segments is None:
+        print("Stream could not be decoded progressively, transcribing the finished download")
+        srt_content, srt_file = transcribe_video(media_file, groq_api_key, source_lang, use_cache, concurrency)
+    else:
+        if use_cache:
+            cache = TranscriptCache()
+            cache.put(cache.key(media_file, source_lang, TRANSCRIPTION_MODEL, fingerprint), segments,
+                      source_lang, TRANSCRIPTION_MODEL, os.path.abspath(media_file))
+        srt_content, srt_file = save_transcript(media_file, segments)
+
+    if video_job is not None:
+        media_file, _ = video_job.result()
+    return media_file, srt_content, srt_file
+
+TRANSLATION_MODEL = "llama-3.3-70b-versatile"
+PROMPT_VERSION = "1"    # bump when translation prompts change, so the translation memory re-translates
+BATCH_CONTEXT = 2       # neighbouring lines shown (not translated) on each side of a window
+BATCH_ATTEMPTS = 3      # tries per window before falling back to per-line requests
+
+def translation_system_prompt(target_lang):
+    return f"You are a professional video subtitle translator specializing in natural, culturally-aware {target_lang} translations. Your translations sound like a native speaker, not a machine. You preserve the original tone, style, and intent while adapting idioms and expressions for the target culture."
+
+def translation_rules(target_lang):
+    return f"""CRITICAL RULES:
 1. Use NATURAL {target_lang} phrasing - avoid word-for-word translation
 2. Match the TONE and STYLE of the original (casual, formal, enthusiastic, etc.)
 3. Keep technical terms, brand names, and proper nouns in ENGLISH (e.g., "Google Gemini", "ChatGPT", "YouTube")
@@ -145,50 +183,194 @@ CRITICAL RULES:
 
 EXAMPLE (English to Chinese):
 - Bad: "我想到了你，在我看到这个以后。" (machine translation)
-- Good: "我一看到这个，就想到了你。" (natural Chinese)
+- Good: "我一看到这个，就想到了你。" (natural Chinese)"""
+
+async def translate_one(scheduler, text, target_lang):
+    """Translate a single subtitle line"""
+    # Build context-aware translation prompt
+    translation_prompt = f"""Translate this video subtitle from English to {target_lang}.
+
+{translation_rules(target_lang)}
 
 SUBTITLE TEXT:
-{seg['text']}
+{text}
 
 OUTPUT: Only the natural {target_lang} translation, nothing else."""
 
-        response = client.chat.completions.create(
+    response = await scheduler.create(
+        messages=[
+            {"role": "system", "content": translation_system_prompt(target_lang)},
+            {"role": "user", "content": translation_prompt}
+        ],
+        model=TRANSLATION_MODEL,
+        temperature=0.5  # Slightly higher for more natural phrasing
+    )
+    return response.choices[0].message.content.strip()
+
+def build_batch_prompt(segments, window, target_lang):
+    """Build the JSON request for segments at positions `window`, with neighbouring context"""
+    first, last = window[0], window[-1]
+    payload = {
+        'context_before': segments.texts[max(0, first - BATCH_CONTEXT):first],
+        'segments': [{'id': int(segments.numbers[pos]), 'text': segments.texts[pos]} for pos in window],
+        'context_after': segments.texts[last + 1:last + 1 + BATCH_CONTEXT],
+    }
+    return f"""Translate these consecutive video subtitles from English to {target_lang}.
+
+{translation_rules(target_lang)}
+7. Translate each entry of "segments" on its own - do NOT merge, split, or reorder them
+8. "context_before" and "context_after" are neighbouring lines for context only - do NOT translate them
+
+INPUT (JSON):
+{json.dumps(payload, ensure_ascii=False, indent=1)}
+
+OUTPUT: A JSON object {{"translations": [{{"id": <same id>, "text": "<natural {target_lang} translation>"}}, ...]}} with exactly one entry per input segment, in the same order. Nothing else."""
+
+def parse_batch_response(content, expected_ids):
+    """Return translations for expected_ids, or None if count/ids don't match"""
+    try:
+        items = json.loads(content)['translations']
+        ids = [item['id'] for item in items]
+        texts = [str(item['text']).strip() for item in items]
+    except (ValueError, KeyError, TypeError):
+        return None
+    if ids != expected_ids or not all(texts):
+        return None
+    return texts
+
+async def translate_batch(scheduler, segments, window, target_lang):
+    """Translate the segments at positions `window` in one request; returns list of texts or None on failure"""
+    expected_ids = [int(segments.numbers[pos]) for pos in window]
+    try:
+        response = await scheduler.create(
             messages=[
-                {
-                    "role": "system",
-                    "content": f"You are a professional video subtitle translator specializing in natural, culturally-aware {target_lang} translations. Your translations sound like a native speaker, not a machine. You preserve the original tone, style, and intent while adapting idioms and expressions for the target culture."
-                },
-                {
-                    "role": "user",
-                    "content": translation_prompt
-                }
+                {"role": "system", "content": translation_system_prompt(target_lang)},
+                {"role": "user", "content": build_batch_prompt(segments, window, target_lang)}
             ],
-            model="llama-3.3-70b-versatile",
-            temperature=0.5  # Slightly higher for more natural phrasing
+            model=TRANSLATION_MODEL,
+            temperature=0.5,
+            response_format={"type": "json_object"}
         )
+    except Exception as e:
+        print(f"\n  Batch {expected_ids[0]}-{expected_ids[-1]} request failed: {e}")
+        return None
+    return parse_batch_response(response.choices[0].message.content, expected_ids)
+
+async def translate_window(scheduler, segments, window, target_lang, batch_size):
+    """Translate one window: single lines, or a JSON batch with retries and line-by-line fallback"""
+    with tracing.span('translate_window', 'translate', first=int(segments.numbers[window[0]]),
+                      segments=len(window)) as span:
+        if batch_size <= 1:
+            return [await translate_one(scheduler, segments.texts[pos], target_lang) for pos in window]
+
+        for attempt in range(BATCH_ATTEMPTS):
+            texts = await translate_batch(scheduler, segments, window, target_lang)
+            if texts is not None:
+                span.set(retries=attempt)
+                return texts
+        print(f"\n  Batch {segments.numbers[window[0]]}-{segments.numbers[window[-1]]} failed validation, translating line by line")
+        span.set(retries=BATCH_ATTEMPTS, fallback=True)
+        return list(await asyncio.gather(
+            *(translate_one(scheduler, segments.texts[pos], target_lang) for pos in window)))
+
+async def translate_all(scheduler, segments, todo, target_lang, batch_size, label=''):
+    """Translate the segments at positions `todo` concurrently; results come back in `todo` order"""
+    total = len(todo)
+    step = max(batch_size, 1)
+    done = 0
+
+    async def run(window):
+        nonlocal done
+        texts = await translate_window(scheduler, segments, window, target_lang, batch_size)
+        done += len(window)
+        print(f"  {label}Translated {done}/{total} segments...", end='\r')
+        return texts
+
+    results = await asyncio.gather(*(run(todo[i:i + step]) for i in range(0, total, step)))
+    return [text for texts in results for text in texts]
+
+async def translate_fanout(client, segments, todo_by_lang, batch_size, concurrency, rpm, tpm):
+    """Translate every language's `todo` positions at once, all sharing one scheduler
+    (so `concurrency` and the rpm/tpm limits are a global budget, not per language)"""
+    scheduler = ChatScheduler(client, concurrency, rpm, tpm)
+    labels = len(todo_by_lang) > 1
+    results = await asyncio.gather(
+        *(translate_all(scheduler, segments, todo, lang, batch_size, f"[{lang}] " if labels else '')
+          for lang, todo in todo_by_lang.items()))
+    if scheduler.retries:
+        print(f"\n  Rate-limit/server retries: {scheduler.retries}")
+    return dict(zip(todo_by_lang, results))
+
+def translate_languages(srt_content, target_langs, groq_api_key, batch_size=1,
+                        concurrency=4, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, tm=None):
+    """Translate SRT content into each of target_langs.
+
+    Lines found in the translation memory `tm` (if given) are reused; the rest are
+    translated and stored back. batch_size > 1 sends windows of that many segments per
+    request as JSON (with a little neighbouring context), validating the returned ids
+    and retrying only the windows that fail; a window that keeps failing falls back to
+    per-line requests. All languages are translated at the same time, with up to
+    `concurrency` requests in flight in total, paced to the rpm/tpm limits.
+    Returns: (original Segments, {target_lang: translated Segments with the same numbers and timing})
+    """
+    print_header("🌐 Step 2: Translating Subtitles")
+    print(f"Target language{'s' if len(target_langs) > 1 else ''}: {', '.join(target_langs)}")
+    print(f"Using: Groq Llama 3.3 70B")
+    if batch_size > 1:
+        print(f"Batch size: {batch_size} segments per request")
+    print(f"Concurrency: {concurrency} (limits: {rpm} req/min, {tpm} tokens/min)\n")
 
-        translated_text = response.choices[0].message.content.strip()
-        translated_segments.append({
-            'index': seg['index'],
-            'timestamp': seg['timestamp'],
-            'original': seg['text'],
-            'translated': translated_text,
-            'start': seg['start'],
-            'end': seg['end']
-        })
+    segments = parse_srt(srt_content)
+    texts = segments.texts
+
+    translations = {lang: {} for lang in target_langs}
+    if tm is not None:
+        for lang in target_langs:
+            with tracing.span('translation_memory', 'translate', lines=len(texts), target_lang=lang) as span:
+                translations[lang] = tm.lookup(texts, lang, TRANSLATION_MODEL, PROMPT_VERSION)
+                span.set(cache_hits=len(translations[lang]))
+            print(f"  Translation memory ({lang}): {len(translations[lang])}/{len(segments)} segments already translated")
+
+    todo_by_lang = {lang: [pos for pos in range(len(segments)) if pos not in translations[lang]]
+                    for lang in target_langs}
+    todo_by_lang = {lang: todo for lang, todo in todo_by_lang.items() if todo}
+    if todo_by_lang:
+        client = get_client(groq_api_key)
+        new_by_lang = asyncio.run(
+            translate_fanout(client, segments, todo_by_lang, batch_size, concurrency, rpm, tpm))
+        for lang, new in new_by_lang.items():
+            todo = todo_by_lang[lang]
+            translations[lang].update(zip(todo, new))
+            if tm is not None:
+                tm.store([(texts[pos], text) for pos, text in zip(todo, new)],
+                         lang, TRANSLATION_MODEL, PROMPT_VERSION)
+
+    translated = {lang: segments.with_texts([translations[lang][pos] for pos in range(len(segments))])
+                  for lang in target_langs}
 
     print(f"\n✅ Translation complete!")
-    return translated_segments
-
-def display_translation_review(segments, max_display=5):
+    if tm is not None:
+        tm.report()
+    return segments, translated
+
+def translate_subtitle(srt_content, target_lang, groq_api_key, batch_size=1,
+                       concurrency=4, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, tm=None):
+    """Translate SRT content to one target language (see translate_languages).
+    Returns: (original Segments, translated Segments with the same numbers and timing)
+    """
+    segments, translated = translate_languages(srt_content, [target_lang], groq_api_key,
+                                               batch_size, concurrency, rpm, tpm, tm)
+    return segments, translated[target_lang]
+
+def display_translation_review(segments, translated, max_display=5):
     """Display translation for review"""
     print_header("📝 Translation Review")
     print(f"Showing first {min(max_display, len(segments))} of {len(segments)} segments:\n")
 
-    for i, seg in enumerate(segments[:max_display]):
-        print(f"[{seg['index']}] {seg['timestamp']}")
-        print(f"  EN: {seg['original']}")
-        print(f"  →→: {seg['translated']}")
+    for seg, text in zip(segments[:max_display], translated.texts):
+        print(f"[{seg['number']}] {format_timestamp(seg['start'])} --> {format_timestamp(seg['end'])}")
+        print(f"  EN: {seg['text']}")
+        print(f"  →→: {text}")
         print()
 
     if len(segments) > max_display:
@@ -197,10 +379,7 @@ def display_translation_review(segments, max_display=5):
 
 def save_translated_srt(segments, output_file):
     """Save translated segments to SRT file"""
-    srt_content = ""
-    for seg in segments:
-        srt_content += f"{seg['index']}\n{seg['timestamp']}\n{seg['translated']}\n\n"
-
+    srt_content = segments.to_srt()
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(srt_content)
 
@@ -208,16 +387,36 @@ def save_translated_srt(segments, output_file):
     return srt_content
 
 def main():
-    if len(sys.argv) < 3:
-        print("Usage: video_dubber.py <video_file_or_url> <target_lang> [groq_api_key]")
+    args = sys.argv[1:]
+    tracing.setup(args, starts_run=True)
+    batch_size = pop_option(args, '--batch-size', '20')
+    concurrency = pop_option(args, '--concurrency', '4')
+    rpm = pop_option(args, '--rpm', str(DEFAULT_RPM))
+    tpm = pop_option(args, '--tpm', str(DEFAULT_TPM))
+    tm_path = pop_option(args, '--tm', os.environ.get('TRANSLATION_MEMORY_DB'))
+    ingest = pop_option(args, '--ingest', 'download')
+    numeric = (batch_size, concurrency, rpm, tpm)
+
+    if len(args) < 2 or not args[1].strip(',') or not all(v.isdigit() and int(v) > 0 for v in numeric) \
+            or ingest not in ('download', 'stream'):
+        print("Usage: video_dubber.py <video_file_or_url> <target_lang[,target_lang...]> [groq_api_key] [options]")
         print("Example: video_dubber.py video.mp4 chinese gsk_xxx")
+        print("Example: video_dubber.py video.mp4 chinese,spanish,french gsk_xxx  (transcribe once, translate all)")
         print("Example: video_dubber.py https://youtube.com/watch?v=xxx chinese gsk_xxx")
         print("Supports: Local files (MP4, MP3, WAV, M4A) and URLs (YouTube, Twitter, etc.)")
+        print("  --batch-size N: subtitle lines per translation request (default 20, 1 = one per line)")
+        print("  --concurrency N: transcription chunks / translation requests in flight at once (default 4)")
+        print(f"  --rpm N / --tpm N: API requests/tokens per minute limits (default {DEFAULT_RPM} / {DEFAULT_TPM})")
+        print("  --tm DB|off: translation memory (default $TRANSLATION_MEMORY_DB or ~/.cache/video-processor/);")
+        print("               recorded in {name}_status.json; give generate_tts_and_dub.sh the same")
+        print("               $TRANSLATION_MEMORY_DB so review edits are learned into it")
+        print("  --ingest stream: for URLs, transcribe the audio while it downloads (default: download first)")
+        print("  --trace FILE: record a span per chunk/request, export a Chrome trace and print a summary")
         sys.exit(1)
 
-    input_source = sys.argv[1]
-    target_lang = sys.argv[2]
-    groq_api_key = sys.argv[3] if len(sys.argv) > 3 else os.getenv('GROQ_API_KEY')
+    input_source = args[0]
+    target_langs = list(dict.fromkeys(lang for lang in args[1].split(',') if lang))
+    groq_api_key = args[2] if len(args) > 2 else os.getenv('GROQ_API_KEY')
 
     if not groq_api_key:
         print("❌ Error: GROQ_API_KEY not provided")
@@ -225,43 +424,62 @@ def main():
         sys.exit(1)
 
     # Check if input is URL or local file
-    if is_url(input_source):
-        # Download from URL
-        video_file, file_type = download_from_url(input_source, output_dir=".")
-        print(f"Downloaded {file_type}: {video_file}\n")
+    if is_url(input_source) and ingest == 'stream':
+        # Step 1: Download and transcribe at the same time
+        with tracing.span('transcribe', 'stage', ingest='stream'):
+            video_file, original_srt_content, original_srt_file = transcribe_url(
+                input_source, groq_api_key, concurrency=int(concurrency), need_video=True)
     else:
-        # Local file
-        video_file = input_source
-        if not os.path.exists(video_file):
-            print(f"❌ Error: File not found: {video_file}")
-            sys.exit(1)
+        if is_url(input_source):
+            # Download from URL
+            with tracing.span('download', 'stage'):
+                video_file, file_type = download_from_url(input_source, output_dir=".")
+            print(f"Downloaded {file_type}: {video_file}\n")
+        else:
+            # Local file
+            video_file = input_source
+            if not os.path.exists(video_file):
+                print(f"❌ Error: File not found: {video_file}")
+                sys.exit(1)
+
+        # Step 1: Transcribe
+        with tracing.span('transcribe', 'stage'):
+            original_srt_content, original_srt_file = transcribe_video(
+                video_file, groq_api_key, concurrency=int(concurrency))
 
     base_name = Path(video_file).stem
 
-    # Step 1: Transcribe
-    original_srt_content, original_srt_file = transcribe_video(video_file, groq_api_key)
-
-    # Step 2: Translate
-    translated_segments = translate_subtitle(original_srt_content, target_lang, groq_api_key)
-
-    # Step 3: Review (output for Claude to show user)
-    display_translation_review(translated_segments)
-
-    # Save translated SRT
-    translated_srt_file = f"{base_name}_{target_lang}.srt"
-    save_translated_srt(translated_segments, translated_srt_file)
-
-    # Output status file for Claude to check
+    # Step 2: Translate (all target languages at once, one shared request budget)
+    tm = None if tm_path == 'off' else TranslationMemory(tm_path)
+    with tracing.span('translate', 'stage', target_lang=','.join(target_langs)):
+        original_segments, translated_by_lang = translate_languages(
+            original_srt_content, target_langs, groq_api_key,
+            int(batch_size), int(concurrency), int(rpm), int(tpm), tm)
+
+    translated_srt_files = []
+    for target_lang, translated_segments in translated_by_lang.items():
+        # Step 3: Review (output for Claude to show user)
+        if len(target_langs) > 1:
+            print(f"\n[{target_lang}]")
+        display_translation_review(original_segments, translated_segments)
+
+        # Save translated SRT
+        translated_srt_file = f"{base_name}_{target_lang}.srt"
+        save_translated_srt(translated_segments, translated_srt_file)
+        translated_srt_files.append(translated_srt_file)
+
+    # Output status file for Claude to check; comma-separated lists for several languages,
+    # in the form generate_tts_and_dub.sh takes them
     status = {
         'video_file': video_file,
         'original_srt': original_srt_file,
-        'translated_srt': translated_srt_file,
-        'target_lang': target_lang,
-        'segments': len(translated_segments),
+        'translated_srt': ','.join(translated_srt_files),
+        'target_lang': ','.join(target_langs),
+        'segments': len(original_segments),
+        'translation_memory': tm.db_path if tm else 'off',
         'status': 'awaiting_review'
     }
 
-    import json
     with open(f"{base_name}_status.json", 'w') as f:
         json.dump(status, f, indent=2)
 
@@ -270,7 +488,8 @@ def main():
     print("="*60)
     print(f"\nFiles created:")
     print(f"  • {original_srt_file} (original subtitles)")
-    print(f"  • {translated_srt_file} (translated subtitles)")
+    for translated_srt_file in translated_srt_files:
+        print(f"  • {translated_srt_file} (translated subtitles)")
     print(f"\nNext: Review translation and approve to continue to TTS generation")
 
 if __name__ == "__main__":
@@ -2,34 +2,42 @@
 """
 Generate comprehensive video/audio summary from transcript
 Supports: Local files (MP4, MP3, WAV, M4A) and URLs (YouTube, Twitter, etc.)
-Usage: video_summary.py <video_file_or_url> [target_lang] [groq_api_key]
+Usage: video_summary.py <video_file_or_url> [target_lang] [groq_api_key] [options]
+
+Short transcripts are summarized in one request. Long ones (multi-hour podcasts) are
+summarized map-reduce style: the SRT is split into time windows, the windows are
+summarized concurrently with their timestamps (cached, see summary_cache.py), and the
+chunk summaries are reduced into the final Overview / Key Points / Timestamps summary.
+Re-summarizing the same media in another language only redoes the reduce step.
 """
 import sys
 import os
+import json
+import asyncio
 from pathlib import Path
 
 # Reuse existing transcription function
-from video_dubber import transcribe_video, print_header
+from video_dubber import transcribe_video, transcribe_url, print_header
 from url_helper import is_url, download_from_url
+from cli_helper import pop_option
+from groq_client import get_client, ChatScheduler, DEFAULT_RPM, DEFAULT_TPM
+from summary_cache import SummaryCache
+from segments import parse_srt
+import tracing
 
-def generate_summary(transcript_text, target_lang, groq_api_key):
-    """Generate comprehensive summary from transcript"""
-    from groq import Groq
-
-    print_header("📝 Step 2: Generating Summary")
-    print(f"Language: {target_lang}")
-    print(f"Using: Groq Llama 3.3 70B\n")
+SUMMARY_MODEL = "llama-3.3-70b-versatile"
+PROMPT_VERSION = "1"       # bump when the chunk prompts change, so cached chunk summaries are redone
+DIRECT_MAX_CHARS = 24000   # transcripts up to this size are summarized in a single request
+CHUNK_MINUTES = 10         # map step time window
+CHUNK_MAX_CHARS = 16000    # ... cut earlier if the window holds more text than this
+MARK_EVERY = 30            # seconds between timestamp marks inside a chunk
+REDUCE_MAX_CHARS = 24000   # chunk notes above this are merged in groups before the final reduce
+REDUCE_FANOUT = 8          # chunk notes per intermediate merge
+CHUNK_ATTEMPTS = 3
 
-    client = Groq(api_key=groq_api_key)
+SYSTEM_PROMPT = "You are an expert video content analyst. You create clear, comprehensive summaries that capture the essence of video content. Your summaries are well-structured and easy to scan."
 
-    summary_prompt = f"""Analyze this video transcript and create a comprehensive summary.
-
-TRANSCRIPT:
-{transcript_text}
-
-Generate a summary in {target_lang} with the following structure:
-
-# Video Summary
+SUMMARY_STRUCTURE = """# Video Summary
 
 ## Overview
 [2-3 sentence overview of what the video is about]
@@ -44,60 +52,236 @@ Generate a summary in {target_lang} with the following structure:
 [If specific moments are mentioned or important, list them with descriptions]
 
 ## Action Items
-[If the video suggests actions to take, list them here. Otherwise omit this section]
+[If the video suggests actions to take, list them here. Otherwise omit this section]"""
 
-RULES:
+def summary_rules(target_lang):
+    return f"""RULES:
 - Be concise but comprehensive
 - Focus on the main message and key insights
 - Preserve technical terms and proper nouns
 - Use natural {target_lang} phrasing
-- Include specific examples or statistics mentioned in the video
+- Include specific examples or statistics mentioned in the video"""
+
+def clock(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def split_windows(segments, chunk_seconds=CHUNK_MINUTES * 60, max_chars=CHUNK_MAX_CHARS):
+    """Split segments into time windows (cut early when a window gets too long).
+    Returns [(start, end, text)] where text carries a [HH:MM:SS] mark every MARK_EVERY seconds.
+    """
+    windows = []
+    lines, chars, window_start, last_mark = [], 0, None, None
+    for seg in segments:
+        if lines and (seg['start'] >= window_start + chunk_seconds or chars + len(seg['text']) > max_chars):
+            windows.append((window_start, end, '\n'.join(lines)))
+            lines, chars, window_start, last_mark = [], 0, None, None
+        if window_start is None:
+            window_start = seg['start']
+        if last_mark is None or seg['start'] - last_mark >= MARK_EVERY:
+            lines.append(f"[{clock(seg['start'])}] {seg['text']}")
+            last_mark = seg['start']
+        else:
+            lines.append(seg['text'])
+        chars += len(lines[-1]) + 1
+        end = seg['end']
+    if lines:
+        windows.append((window_start, end, '\n'.join(lines)))
+    return windows
+
+def chunk_prompt(start, end, text):
+    return f"""Summarize this part ({clock(start)} - {clock(end)}) of a long video transcript. Lines marked [HH:MM:SS] start at that time.
+
+TRANSCRIPT PART:
+{text}
+
+Write in the transcript's own language. Keep specific examples, numbers, names and technical terms.
+
+OUTPUT: A JSON object {{"summary": "<one paragraph>", "key_points": ["<point>", ...], "moments": [{{"time": "HH:MM:SS", "description": "<what happens>"}}, ...]}} with 3-5 key points and the notable moments of this part. Nothing else."""
+
+def merge_prompt(notes):
+    return f"""These are consecutive part summaries of a long video, in order. Merge them into one summary of the whole span ({notes[0]['start']} - {notes[-1]['end']}).
+
+PART SUMMARIES (JSON):
+{json.dumps(notes, ensure_ascii=False, indent=1)}
+
+Write in the summaries' own language. Keep the most important points and moments with their exact times.
+
+OUTPUT: A JSON object {{"summary": "<one paragraph>", "key_points": ["<point>", ...], "moments": [{{"time": "HH:MM:SS", "description": "<what happens>"}}, ...]}} with at most 7 key points and 10 moments. Nothing else."""
+
+def parse_notes(content):
+    """Chunk summary dict from a JSON reply, or None if malformed"""
+    try:
+        notes = json.loads(content)
+        notes = {'summary': str(notes['summary']).strip(),
+                 'key_points': [str(p).strip() for p in notes.get('key_points', [])],
+                 'moments': [{'time': str(m['time']), 'description': str(m['description']).strip()}
+                             for m in notes.get('moments', [])]}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+    return notes if notes['summary'] else None
+
+async def summarize_part(scheduler, cache, kind, prompt, start, end):
+    """Map step for one chunk (or one merge of chunk notes), through the cache"""
+    key = cache.key(kind, prompt, SUMMARY_MODEL, PROMPT_VERSION) if cache is not None else None
+    with tracing.span(f'summarize_{kind}', 'summary', start=start, end=end, bytes=len(prompt.encode('utf-8'))) as span:
+        notes = cache.get(key) if cache is not None else None
+        if notes is not None:
+            span.set(cache_hits=1)
+        else:
+            for attempt in range(CHUNK_ATTEMPTS):
+                response = await scheduler.create(
+                    messages=[{"role": "system", "content": SYSTEM_PROMPT},
+                              {"role": "user", "content": prompt}],
+                    model=SUMMARY_MODEL,
+                    temperature=0.3,
+                    response_format={"type": "json_object"}
+                )
+                content = response.choices[0].message.content
+                notes = parse_notes(content)
+                if notes is not None:
+                    if cache is not None:
+                        cache.put(key, notes)
+                    break
+                span.add('retries')
+            else:
+                # Use the raw reply, but don't cache it: a later run (or language) retries the chunk
+                notes = {'summary': content.strip(), 'key_points': [], 'moments': []}
+    return dict(notes, start=start, end=end)
+
+async def map_reduce(client, segments, target_lang, chunk_minutes, concurrency, rpm, tpm, cache):
+    scheduler = ChatScheduler(client, concurrency, rpm, tpm)
+    windows = split_windows(segments, chunk_minutes * 60)
+    print(f"Long transcript: {len(windows)} chunks of up to {chunk_minutes} min, {concurrency} at a time")
+
+    done = 0
+
+    async def run(kind, prompt, start, end, total):
+        nonlocal done
+        notes = await summarize_part(scheduler, cache, kind, prompt, start, end)
+        done += 1
+        print(f"  Summarized {done}/{total} parts...", end='\r')
+        return notes
+
+    notes = await asyncio.gather(*(run('chunk', chunk_prompt(start, end, text), clock(start), clock(end), len(windows))
+                                   for start, end, text in windows))
+    print()
+    # Too much for one reduce request: merge neighbouring chunk notes level by level
+    while len(notes) > 1 and len(json.dumps(notes, ensure_ascii=False)) > REDUCE_MAX_CHARS:
+        groups = [notes[i:i + REDUCE_FANOUT] for i in range(0, len(notes), REDUCE_FANOUT)]
+        print(f"  Merging {len(notes)} chunk summaries into {len(groups)}")
+        done = 0
+        notes = await asyncio.gather(*(run('merge', merge_prompt(group), group[0]['start'], group[-1]['end'], len(groups))
+                                       for group in groups))
+        print()
+
+    reduce_prompt = f"""Below are summaries of consecutive parts of one long video, in order, with the times of notable moments. Combine them into a comprehensive summary of the whole video.
+
+PART SUMMARIES (JSON):
+{json.dumps(notes, ensure_ascii=False, indent=1)}
+
+Generate a summary in {target_lang} with the following structure:
+
+{SUMMARY_STRUCTURE}
+
+{summary_rules(target_lang)}
+- Take the Important Timestamps from the parts' moments, with their exact times
+
+OUTPUT: Only the markdown-formatted summary, nothing else."""
+    print("Combining chunk summaries...")
+    with tracing.span('summarize_reduce', 'summary', parts=len(notes), bytes=len(reduce_prompt.encode('utf-8'))):
+        response = await scheduler.create(
+            messages=[{"role": "system", "content": SYSTEM_PROMPT},
+                      {"role": "user", "content": reduce_prompt}],
+            model=SUMMARY_MODEL,
+            temperature=0.5
+        )
+    return response.choices[0].message.content.strip()
+
+def generate_summary(segments, target_lang, groq_api_key, chunk_minutes=CHUNK_MINUTES, concurrency=4,
+                     rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, cache=None):
+    """Generate comprehensive summary from transcript segments.
+
+    Transcripts up to DIRECT_MAX_CHARS go out in one request; longer ones are
+    split into chunk_minutes windows, summarized concurrently (paced to rpm/tpm,
+    chunk summaries cached in `cache`) and reduced into the final summary.
+    """
+
+    print_header("📝 Step 2: Generating Summary")
+    print(f"Language: {target_lang}")
+    print(f"Using: Groq Llama 3.3 70B\n")
+
+    client = get_client(groq_api_key)
+    transcript_text = '\n'.join(segments.texts)
+
+    if len(transcript_text) > DIRECT_MAX_CHARS:
+        summary = asyncio.run(map_reduce(client, segments, target_lang, chunk_minutes, concurrency, rpm, tpm, cache))
+        if cache is not None:
+            cache.report()
+        return summary
+
+    summary_prompt = f"""Analyze this video transcript and create a comprehensive summary.
+
+TRANSCRIPT:
+{transcript_text}
+
+Generate a summary in {target_lang} with the following structure:
+
+{SUMMARY_STRUCTURE}
+
+{summary_rules(target_lang)}
 
 OUTPUT: Only the markdown-formatted summary, nothing else."""
 
     print("Analyzing transcript and generating summary...")
 
-    response = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": f"You are an expert video content analyst. You create clear, comprehensive summaries that capture the essence of video content. Your summaries are well-structured and easy to scan."
-            },
-            {
-                "role": "user",
-                "content": summary_prompt
-            }
-        ],
-        model="llama-3.3-70b-versatile",
-        temperature=0.5
-    )
+    with tracing.span('summarize_direct', 'summary', bytes=len(summary_prompt.encode('utf-8'))):
+        response = client.chat.completions.create(
+            messages=[
+                {
+                    "role": "system",
+                    "content": SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": summary_prompt
+                }
+            ],
+            model=SUMMARY_MODEL,
+            temperature=0.5
+        )
 
     summary = response.choices[0].message.content.strip()
     return summary
 
-def extract_plain_text_from_srt(srt_content):
-    """Convert SRT to plain text transcript"""
-    lines = []
-    for block in srt_content.strip().split('\n\n'):
-        block_lines = block.split('\n')
-        if len(block_lines) >= 3:
-            # Skip index and timestamp, take text
-            text = '\n'.join(block_lines[2:])
-            lines.append(text.strip())
-    return '\n'.join(lines)
-
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: video_summary.py <video_file_or_url> [target_lang] [groq_api_key]")
+    args = sys.argv[1:]
+    tracing.setup(args, starts_run=True)
+    chunk_minutes = pop_option(args, '--chunk-minutes', str(CHUNK_MINUTES))
+    concurrency = pop_option(args, '--concurrency', '4')
+    rpm = pop_option(args, '--rpm', str(DEFAULT_RPM))
+    tpm = pop_option(args, '--tpm', str(DEFAULT_TPM))
+    cache_dir = pop_option(args, '--summary-cache')
+    ingest = pop_option(args, '--ingest', 'download')
+    numeric = (chunk_minutes, concurrency, rpm, tpm)
+
+    if len(args) < 1 or not all(v.isdigit() and int(v) > 0 for v in numeric) or ingest not in ('download', 'stream'):
+        print("Usage: video_summary.py <video_file_or_url> [target_lang] [groq_api_key] [options]")
         print("Example: video_summary.py video.mp4")
         print("Example: video_summary.py video.mp4 chinese gsk_xxx")
         print("Example: video_summary.py https://youtube.com/watch?v=xxx chinese gsk_xxx")
         print("Supports: Local files (MP4, MP3, WAV, M4A) and URLs (YouTube, Twitter, etc.)")
+        print(f"  --chunk-minutes N: time window per chunk summary for long transcripts (default {CHUNK_MINUTES})")
+        print("  --concurrency N: transcription chunks / summary requests in flight at once (default 4)")
+        print(f"  --rpm N / --tpm N: API requests/tokens per minute limits (default {DEFAULT_RPM} / {DEFAULT_TPM})")
+        print("  --ingest stream: for URLs, transcribe the audio while it downloads (default: download first)")
+        print("  --summary-cache DIR|off: chunk summary cache (default $SUMMARY_CACHE_DIR or ~/.cache/video-processor/summaries)")
+        print("  --trace FILE: record a span per request, export a Chrome trace and print a summary")
         sys.exit(1)
 
-    input_source = sys.argv[1]
-    target_lang = sys.argv[2] if len(sys.argv) > 2 else "English"
-    groq_api_key = sys.argv[3] if len(sys.argv) > 3 else os.getenv('GROQ_API_KEY')
+    input_source = args[0]
+    target_lang = args[1] if len(args) > 1 else "English"
+    groq_api_key = args[2] if len(args) > 2 else os.getenv('GROQ_API_KEY')
 
     if not groq_api_key:
         print("❌ Error: GROQ_API_KEY not provided")
@@ -105,27 +289,35 @@ def main():
         sys.exit(1)
 
     # Check if input is URL or local file
-    if is_url(input_source):
-        # Download from URL
-        video_file, file_type = download_from_url(input_source, output_dir=".")
-        print(f"Downloaded {file_type}: {video_file}\n")
+    if is_url(input_source) and ingest == 'stream':
+        # Step 1: Download the audio and transcribe it at the same time
+        with tracing.span('transcribe', 'stage', ingest='stream'):
+            video_file, srt_content, srt_file = transcribe_url(input_source, groq_api_key, source_lang='en',
+                                                               concurrency=int(concurrency))
     else:
-        # Local file
-        video_file = input_source
-        if not os.path.exists(video_file):
-            print(f"❌ Error: File not found: {video_file}")
-            sys.exit(1)
+        if is_url(input_source):
+            # Download from URL (only the audio is needed for a summary)
+            video_file, file_type = download_from_url(input_source, output_dir=".", mode='audio')
+            print(f"Downloaded {file_type}: {video_file}\n")
+        else:
+            # Local file
+            video_file = input_source
+            if not os.path.exists(video_file):
+                print(f"❌ Error: File not found: {video_file}")
+                sys.exit(1)
 
-    base_name = Path(video_file).stem
-
-    # Step 1: Transcribe video
-    srt_content, srt_file = transcribe_video(video_file, groq_api_key, source_lang='en')
+        # Step 1: Transcribe video
+        with tracing.span('transcribe', 'stage'):
+            srt_content, srt_file = transcribe_video(video_file, groq_api_key, source_lang='en',
+                                                     concurrency=int(concurrency))
 
-    # Convert SRT to plain text
-    transcript_text = extract_plain_text_from_srt(srt_content)
+    base_name = Path(video_file).stem
 
-    # Step 2: Generate summary
-    summary = generate_summary(transcript_text, target_lang, groq_api_key)
+    # Step 2: Generate summary (map-reduce over time windows for long transcripts)
+    cache = None if cache_dir == 'off' else SummaryCache(cache_dir)
+    with tracing.span('summarize', 'stage', target_lang=target_lang):
+        summary = generate_summary(parse_srt(srt_content), target_lang, groq_api_key,
+                                   int(chunk_minutes), int(concurrency), int(rpm), int(tpm), cache)
 
     # Save summary
     summary_file = f"{base_name}_summary.md"
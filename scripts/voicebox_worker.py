@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Warm voicebox session.
+Runs inside the voicebox skill's environment (resolved once per session, not once per line),
+imports voicebox.py a single time so its libraries, model and voice profile stay loaded,
+and generates one segment per request straight into a caller-chosen output path.
+
+Usage (session): voicebox_worker.py <voicebox_script> <voice_profile> [--quality high]
+Clients (sync_tts.py) start `jobs` sessions and feed them segments from a shared queue.
+
+Environment: $VOICEBOX_PYTHON runs sessions with that interpreter directly;
+otherwise `uv run --with-requirements <voicebox_script>` provides the skill's dependencies.
+
+Protocol: newline-delimited JSON over the session's stdin/stdout.
+  request:  {"index": 0, "text": "...", "output": "/work/raw_0000.wav"}
+  replies:  {"index": 0, "ok": true, "elapsed": seconds} or {"index": 0, "error": "..."}
+Anything voicebox prints goes to stderr, which clients send to a per-session log.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+VOICEBOX_SCRIPT = os.path.expanduser("~/.claude/skills/voicebox/scripts/voicebox.py")
+OUTPUT_NAME = 'voicebox_output.wav'
+LEGACY_OUTPUT = os.path.join('/tmp', OUTPUT_NAME)
+
+
+# ============================================================
+# Session (runs in the voicebox env)
+# ============================================================
+
+def serve(voicebox_script, voice_profile, quality='high'):
+    # Keep the protocol on a private copy of stdout; voicebox's own output goes to stderr
+    proto = os.fdopen(os.dup(1), 'w', encoding='utf-8', buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    # A private temp dir per session, so sessions never share an output file
+    scratch = tempfile.mkdtemp(prefix='voicebox_session_')
+    os.environ['TMPDIR'] = scratch
+    tempfile.tempdir = scratch
+
+    import fcntl
+    import contextlib
+    import importlib.util
+    spec = importlib.util.spec_from_file_location('voicebox', voicebox_script)
+    voicebox = importlib.util.module_from_spec(spec)
+    sys.modules['voicebox'] = voicebox
+    spec.loader.exec_module(voicebox)
+
+    def run_cli(text):
+        sys.argv = [voicebox_script, 'generate', voice_profile, text, '--quality', quality]
+        try:
+            voicebox.main()
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                raise RuntimeError(f"voicebox exited with code {e.code}")
+
+    def produce(text):
+        """Run voicebox; returns the path it wrote"""
+        private = os.path.join(scratch, OUTPUT_NAME)
+        if os.path.exists(private):
+            os.remove(private)
+        started = time.time()
+        run_cli(text)
+        if os.path.exists(private):
+            return private
+        if os.path.exists(LEGACY_OUTPUT) and os.path.getmtime(LEGACY_OUTPUT) >= started:
+            return LEGACY_OUTPUT
+        raise RuntimeError("voicebox produced no audio")
+
+    @contextlib.contextmanager
+    def legacy_lock():
+        # Versions that hard-code /tmp share one output file across the host:
+        # hold an exclusive lock from generation until the file is moved away
+        with open(LEGACY_OUTPUT + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def generate(text, output, locked):
+        if locked:
+            with legacy_lock():
+                shutil.move(produce(text), output + '.part.wav')
+        else:
+            shutil.move(produce(text), output + '.part.wav')
+        os.replace(output + '.part.wav', output)
+
+    # The warm-up loads the model and profile, and shows where this voicebox writes its output
+    t0 = time.time()
+    with legacy_lock():
+        locked = produce('Warm up.') == LEGACY_OUTPUT
+        if locked:
+            os.remove(LEGACY_OUTPUT)
+    print(f"voicebox session ready: profile={voice_profile} in {time.time() - t0:.1f}s"
+          + (" (shared /tmp output, sessions serialized)" if locked else ""), flush=True)
+
+    try:
+        for line in sys.stdin:
+            request = json.loads(line)
+            t0 = time.time()
+            try:
+                generate(request['text'], request['output'], locked)
+                reply = {'index': request['index'], 'ok': True, 'elapsed': time.time() - t0}
+            except Exception as e:
+                reply = {'index': request['index'], 'error': f"{type(e).__name__}: {e}"}
+            proto.write(json.dumps(reply, ensure_ascii=False) + '\n')
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+# ============================================================
+# Client (runs in the main env)
+# ============================================================
+
+def session_command(voicebox_script, voice_profile, quality='high'):
+    args = [os.path.abspath(__file__), voicebox_script, voice_profile, '--quality', quality]
+    python = os.environ.get('VOICEBOX_PYTHON')
+    if python:
+        return [python] + args
+    if not shutil.which('uv'):
+        raise RuntimeError("uv not found (needed to run the voicebox skill); set $VOICEBOX_PYTHON instead")
+    return ['uv', 'run', '--quiet', '--with-requirements', voicebox_script, 'python'] + args
+
+
+def generate_concurrent(segments, voice_profile, out_path_for, jobs=1, log_dir=None,
+                        voicebox_script=VOICEBOX_SCRIPT, quality='high'):
+    """Generate segments on `jobs` warm sessions pulling from one queue.
+    Yields (index, error) as segments finish; error is None on success.
+    """
+    import queue
+    import threading
+    import tracing
+
+    if not os.path.exists(voicebox_script):
+        raise RuntimeError(f"voicebox skill not found: {voicebox_script}")
+    cmd = session_command(voicebox_script, voice_profile, quality)
+    log_dir = log_dir or tempfile.gettempdir()
+
+    todo = queue.Queue()
+    for seg in segments:
+        todo.put(seg)
+    results = queue.Queue()
+    DONE = object()
+
+    def run_session(n):
+        log_path = os.path.join(log_dir, f"voicebox_session_{n}.log")
+        proc = None
+        try:
+            with open(log_path, 'a') as log:
+                proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=log,
+                                        text=True, encoding='utf-8', bufsize=1)
+            while True:
+                try:
+                    seg = todo.get_nowait()
+                except queue.Empty:
+                    break
+                request = {'index': seg['index'], 'text': seg['text'], 'output': out_path_for(seg)}
+                started = time.time()
+                try:
+                    proc.stdin.write(json.dumps(request, ensure_ascii=False) + '\n')
+                    proc.stdin.flush()
+                    line = proc.stdout.readline()
+                except (BrokenPipeError, OSError):
+                    line = ''
+                if not line:
+                    # Session died; report this segment and hand the rest to the other sessions
+                    results.put((seg['index'], f"session {n} exited with code {proc.wait()}, see {log_path}"))
+                    break
+                reply = json.loads(line)
+                error = reply.get('error')
+                tracing.record('voicebox_segment', 'tts', started, time.time() - started, segment=seg['index'],
+                               session=n, chars=len(seg['text']), **({'error': error} if error else {}))
+                results.put((seg['index'], error))
+        except OSError as e:
+            results.put((None, f"session {n} could not start: {e}"))
+        finally:
+            if proc is not None and proc.poll() is None:
+                proc.stdin.close()
+                proc.wait()
+            results.put(DONE)
+
+    jobs = max(1, min(jobs, len(segments)))
+    for n in range(jobs):
+        threading.Thread(target=run_session, args=(n,), daemon=True).start()
+
+    remaining = jobs
+    while remaining:
+        item = results.get()
+        if item is DONE:
+            remaining -= 1
+        elif item[0] is None:
+            print(f"  voicebox: {item[1]}")
+        else:
+            yield item
+
+    # Every session died: nothing will pick up what is left in the queue
+    while not todo.empty():
+        yield todo.get_nowait()['index'], "no voicebox session available"
+
+
+if __name__ == "__main__":
+    from cli_helper import pop_option
+
+    args = sys.argv[1:]
+    quality = pop_option(args, '--quality', 'high')
+    if len(args) < 2:
+        print("Usage: voicebox_worker.py <voicebox_script> <voice_profile> [--quality high]")
+        sys.exit(1)
+    serve(args[0], args[1], quality)